@@ -1,4 +1,10 @@
 from parsers.sig import *
+from parsers.services.bulk import parse_file, parse_stream, SIG_FIELD, CHUNK_SIZE
+from parsers.services.compression import open_text_input, open_text_output
+from parsers.services.fhir import export_dosage_ndjson
+from parsers.services.import_profile import profile_imports
+from parsers.services.report import report_file, TOP
+import os
 import sys
 import json
 
@@ -34,6 +40,18 @@ def get_input():
                 return 3
             elif sys.argv[1] == "--r":
                 return 4
+            elif sys.argv[1] == "--fhir":
+                input_file, output_file = sys.argv[2], sys.argv[3]
+                return 5
+            elif sys.argv[1] == "--stdin":
+                return 6
+            elif sys.argv[1] == "--profile-imports":
+                return 7
+            elif sys.argv[1] == "--sequence":
+                return 8
+            elif sys.argv[1] == "--report":
+                input_file = sys.argv[2]
+                return 9
             else:
                 return 1
         except IndexError:
@@ -64,6 +82,13 @@ def print_usage_instructions():
             + bcolors.ENDC
             + "advanced_sig_parser.py --r <RxCUI> your sig goes here"
         ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "\n  Multi-step sig usage: "
+            + bcolors.ENDC
+            + "advanced_sig_parser.py --sequence your sig goes here"
+        ),
         (
             bcolors.BOLD
             + bcolors.WHITE
@@ -71,11 +96,47 @@ def print_usage_instructions():
             + bcolors.ENDC
             + " advanced_sig_parser.py --b input.csv output.csv\n"
         ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "  Bulk NDJSON usage: "
+            + bcolors.ENDC
+            + " advanced_sig_parser.py --b input.ndjson output.ndjson [--verbose] [--sig-field sig] [--workers 4] [--compress gzip|zstd] [--checkpoint] [--resume] [--dead-letter errors.ndjson] [--slow-ms 100] [--slow-log slow.ndjson] [--slow-limit 100]\n"
+        ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "  FHIR Dosage export usage: "
+            + bcolors.ENDC
+            + " advanced_sig_parser.py --fhir input.csv output.ndjson [--workers 4] [--compress gzip|zstd] [--checkpoint] [--resume] [--dead-letter errors.ndjson] [--slow-ms 100] [--slow-log slow.ndjson]\n"
+        ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "  Pipe usage: "
+            + bcolors.ENDC
+            + " cat sigs.txt | advanced_sig_parser.py --stdin [--format text|csv|ndjson] [--output ndjson|csv] [--verbose] [--chunk-size 1000] [--workers 4] [--compress gzip|zstd] [--dead-letter errors.ndjson] [--slow-ms 100] [--slow-log slow.ndjson]\n"
+        ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "  Import profile usage: "
+            + bcolors.ENDC
+            + " advanced_sig_parser.py --profile-imports [--repeat 3] [--snapshot] [--output profile.json]\n"
+        ),
+        (
+            bcolors.BOLD
+            + bcolors.WHITE
+            + "  Corpus report usage: "
+            + bcolors.ENDC
+            + " advanced_sig_parser.py --report input.csv [--output report.json] [--sig-field sig] [--workers 4] [--top 20]\n"
+        ),
         (
             "   Bulk sig instructions: \n      > Place your input file in the /csv directory.\n"
             "      > Input files are read from the /csv directory.\n"
             "      > Output files are written to the /csv/output directory.\n"
             "      > Enter the input file name (input.csv as default) and output file name (output.csv as default), separated by a space.\n"
+            "      > Files can be .csv, .ndjson or .jsonl, optionally gzip / zstd compressed (.gz / .zst). File names with a directory (i.e. ./input.ndjson) are used as is.\n"
         ),
     ]
     for instruction in instructions:
@@ -90,11 +151,9 @@ def generate_output(n):
     elif n == 2:
         try:
             input_file, output_file = sys.argv[2], sys.argv[3]
-            if input_file.endswith(".csv") and output_file.endswith(".csv"):
-                SigParser().parse_sig_csv(input_file, output_file)
-                print(f"Output written to {output_file}.")
-            else:
-                print("Both files must end with .csv. Please try again.")
+            verbose = "--verbose" in sys.argv[4:]
+            summary = parse_file(get_input_path(input_file), get_output_path(output_file), get_sig_parser(), verbose=verbose, sig_field=get_option("--sig-field", SIG_FIELD), workers=int(get_option("--workers", 0)), compression=get_option("--compress"), checkpoint="--checkpoint" in sys.argv, resume="--resume" in sys.argv, dead_letter_file=get_option("--dead-letter"), slow_log_file=get_option("--slow-log"))
+            print_summary(output_file, summary)
         except ValueError as e:
             print(f"Error: {e}")
             import traceback
@@ -111,6 +170,102 @@ def generate_output(n):
         results['parsed'] = SigParser().parse(" ".join(sys.argv[3:]))
         results['inferred'] = SigParser().infer(results['parsed'], rxcui=sys.argv[2]) 
         print(json.dumps(results, indent=4))
+    elif n == 5:
+        try:
+            input_file, output_file = sys.argv[2], sys.argv[3]
+            summary = export_dosage_ndjson(get_input_path(input_file), get_output_path(output_file), get_sig_parser(), sig_field=get_option("--sig-field", SIG_FIELD), workers=int(get_option("--workers", 0)), compression=get_option("--compress"), checkpoint="--checkpoint" in sys.argv, resume="--resume" in sys.argv, dead_letter_file=get_option("--dead-letter"), slow_log_file=get_option("--slow-log"))
+            print_summary(output_file, summary)
+        except ValueError as e:
+            print(f"Error: {e}")
+        except FileNotFoundError:
+            print("Input file not found. Please try again.")
+    elif n == 6:
+        # reads sigs from stdin and streams results to stdout, a chunk at a time
+        # gzip / zstd input is detected automatically, and --compress compresses the output
+        # sigs that raise are written as unparsable, with their errors on stderr (or in the --dead-letter file)
+        # with --slow-ms / --slow-log, slow sigs go to the --slow-log file (or stderr)
+        try:
+            stdin = open_text_input(sys.stdin.buffer)
+            stdout = open_text_output(sys.stdout.buffer, get_option("--compress"), closefd=False)
+            sig_parser = get_sig_parser()
+            dead_letter = open(get_option("--dead-letter"), "w", encoding="utf-8") if get_option("--dead-letter") else sys.stderr
+            slow_log = None
+            if sig_parser.slow_ms is not None:
+                slow_log = open(get_option("--slow-log"), "w", encoding="utf-8") if get_option("--slow-log") else sys.stderr
+            try:
+                parse_stream(stdin, stdout, get_option("--format", "text"), get_option("--output", "ndjson"), sig_parser, verbose="--verbose" in sys.argv, sig_field=get_option("--sig-field", SIG_FIELD), chunk_size=int(get_option("--chunk-size", CHUNK_SIZE)), workers=int(get_option("--workers", 0)), dead_letter=dead_letter, slow_log=slow_log)
+            finally:
+                for f in (dead_letter, slow_log):
+                    if f is not None and f is not sys.stderr:
+                        f.close()
+            stdout.close()
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        except BrokenPipeError:
+            # the reader went away (i.e. piped into head) - stop quietly
+            os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            sys.exit(1)
+    elif n == 7:
+        # import time / memory / pattern sizes per module, as JSON (see parsers/services/import_profile.py)
+        profile = profile_imports(repeat=int(get_option("--repeat", 3)), snapshot="--snapshot" in sys.argv)
+        if get_option("--output"):
+            with open(get_option("--output"), "w", encoding="utf-8") as f:
+                json.dump(profile, f, indent=4)
+            print(f"Import profile written to {get_option('--output')}.")
+        else:
+            print(json.dumps(profile, indent=4))
+    elif n == 8:
+        # parses each step of a multi-step sig (i.e. a taper) on its own (see SigParser.parse_sequence)
+        print(json.dumps(SigParser().parse_sequence(" ".join(sys.argv[2:])), indent=4))
+    elif n == 9:
+        # unparsable rates per guardrail, field distributions and the most frequent unparsable sigs, in one pass
+        # over the input (see parsers/services/report.py) - the progress bar only shows when writing to a file
+        try:
+            report = report_file(get_input_path(sys.argv[2]), sig_field=get_option("--sig-field", SIG_FIELD), top=int(get_option("--top", TOP)), workers=int(get_option("--workers", 0)), progress=bool(get_option("--output")))
+        except ValueError as e:
+            print(f"Error: {e}")
+            return
+        except FileNotFoundError:
+            print("Input file not found. Please try again.")
+            return
+        if get_option("--output"):
+            with open(get_option("--output"), "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=4)
+            print(f"\nCorpus report written to {get_option('--output')}.")
+        else:
+            print(json.dumps(report, indent=4))
+
+
+def print_summary(output_file, summary):
+    print(f"Output written to {output_file}.")
+    if summary["errors"]:
+        print(f"{summary['errors']} sig(s) couldn't be parsed - errors written to {summary['dead_letter_file']}.")
+    if summary.get("slow"):
+        print(f"{summary['slow']} slow sig(s) written to {summary['slow_log_file']}.")
+
+
+# a SigParser with the slow sig log turned on if --slow-ms or --slow-log was passed (see SigParser.check_slow_sig)
+def get_sig_parser():
+    if get_option("--slow-ms") or get_option("--slow-log"):
+        return SigParser(slow_ms=float(get_option("--slow-ms", SLOW_MS)), slow_limit=int(get_option("--slow-limit", SLOW_LIMIT)))
+    return SigParser()
+
+
+# value of an optional flag (i.e. --workers 4)
+def get_option(name, default=None):
+    if name in sys.argv[:-1]:
+        return sys.argv[sys.argv.index(name) + 1]
+    return default
+
+
+# file names on their own are read from the /csv directory and written to the /csv/output directory
+def get_input_path(file_name):
+    return file_name if os.path.dirname(file_name) else "csv/" + file_name
+
+
+def get_output_path(file_name):
+    return file_name if os.path.dirname(file_name) else "csv/output/" + file_name
 
 if __name__ == "__main__":
     main()
@@ -51,12 +51,7 @@ class AdditionalInfoParser(Parser):
             # remove white space
             additional_info_readable = additional_info_readable.strip()
         return self.generate_match({'additional_info': additional_info, 'additional_info_text_start': additional_info_text_start, 'additional_info_text_end': additional_info_text_end, 'additional_info_text': additional_info_text, 'additional_info_readable': additional_info_readable})
-    def parse(self, sig):
-        matches = []
-        for match in re.finditer(self.pattern, sig):
-            normalized_match = self.normalize_match(match)
-            if normalized_match:
-                matches.append(normalized_match)
+    def finalize_matches(self, matches, sig):
         # once we have matched on all the possible patterns,
         # we take the list of matches and pass it to a special normalize_multiple_matches method
         # which then overwrites the list of matches with one final match that combines all the matches
@@ -64,7 +59,6 @@ class AdditionalInfoParser(Parser):
             normalized_match = self.normalize_multiple_matches(matches, sig)
             if normalized_match:
                 matches = [(normalized_match)]
-        self.matches = matches
         return matches
 
 parsers = [
@@ -0,0 +1,73 @@
+# compact record for a single parser match
+# each parser type gets its own subclass with the parser's match_keys as __slots__ (see get_match_type),
+# so a match is one small object instead of a copy of the parser's match dict
+# the dict-like methods below keep existing code (m['dose'], m.get('dose'), m.items(), ...) working,
+# and to_dict() converts a match to a plain dict at the output boundary
+class Match:
+    __slots__ = ()
+    parser_type = ''
+
+    def __init__(self, **match_fields):
+        for k in self.__slots__:
+            setattr(self, k, match_fields.pop(k, None))
+        for k in match_fields:
+            raise ValueError(k + ' is not a valid match key for the ' + self.parser_type + ' parser')
+
+    def __getitem__(self, key):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.__slots__
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self):
+        return len(self.__slots__)
+
+    def __eq__(self, other):
+        if isinstance(other, (Match, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return type(self).__name__ + '(' + repr(self.to_dict()) + ')'
+
+    def get(self, key, default=None):
+        return getattr(self, key, default) if key in self.__slots__ else default
+
+    def keys(self):
+        return list(self.__slots__)
+
+    def values(self):
+        return [getattr(self, k) for k in self.__slots__]
+
+    def items(self):
+        return [(k, getattr(self, k)) for k in self.__slots__]
+
+    def copy(self):
+        match = object.__new__(type(self))
+        for k in self.__slots__:
+            setattr(match, k, getattr(self, k))
+        return match
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+# one match type per parser type / match keys, created on first use
+match_types = {}
+
+def get_match_type(parser_type, match_keys):
+    key = (parser_type, tuple(match_keys))
+    if key not in match_types:
+        name = ''.join(p.capitalize() for p in parser_type.split('_')) + 'Match'
+        match_types[key] = type(name, (Match,), {'__slots__': tuple(match_keys), 'parser_type': parser_type})
+    return match_types[key]
@@ -1,7 +1,17 @@
 import re
 import collections
+import functools
+import time
+from bisect import bisect_left, bisect_right
+try:
+    from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+    # python < 3.11
+    import sre_parse, sre_constants
+from .match import get_match_type
 from ..services.normalize import *
 from ..services.infer import *
+from ..services.snapshot import pattern_snapshot
 
 
 class Parser:
@@ -10,9 +20,27 @@ class Parser:
     match_keys = []
     match_dict = {}
     matches = []
+    # parser types whose matches this parser needs - a parser with anchor types is run by SigParser after them with
+    # parse_anchored(sig, component_matches, tokens) instead of parse (see dose.DoseOnlyParser)
+    anchor_types = []
     def __init__(self):
         self.pattern = self.normalize_pattern()
         self.match_dict = dict.fromkeys(self.match_keys)
+        self.match_type = get_match_type(self.parser_type, self.match_keys)
+        self.offset_keys = [k for k in self.match_keys if k.endswith('_text_start') or k.endswith('_text_end')]
+        self.template_safe, self.prefilter, self.batch_safe = get_pattern_info(self.pattern)
+        self.compiled_batch_pattern = None
+        self.edit_reach = None
+
+    # pattern used by parse_batch, or None if the pattern has to be run on each sig separately
+    # compiled the first time it's used, since most runs never parse in batches
+    @property
+    def batch_pattern(self):
+        if not self.batch_safe:
+            return None
+        if self.compiled_batch_pattern is None:
+            self.compiled_batch_pattern = re.compile(self.pattern.pattern, self.pattern.flags | re.M)
+        return self.compiled_batch_pattern
 
     def get_parser_type(self):
         return self.parser_type
@@ -29,13 +57,9 @@ class Parser:
     def get_readable(self, match):
         return ''
 
+    # matches are slotted records (see match.py) - use to_dict() to get a plain dict
     def generate_match(self, match_fields):
-        for k, v in match_fields.items():
-            if k not in self.match_dict:
-                raise ValueError(k + ' is not a valid match key for the ' + self.parser_type + ' parser')
-        match_dict = dict(self.match_dict)
-        match_dict.update(match_fields)
-        return match_dict
+        return self.match_type(**match_fields)
 
     def normalize_pattern(self):
         return re.compile(self.pattern, flags = re.I)
@@ -43,11 +67,440 @@ class Parser:
     def normalize_match(self, match):
         return match
 
+    # hook for parsers that combine all of their matches in a sig into one (see route.py / additional_info.py)
+    # sig is the text the match offsets refer to
+    def finalize_matches(self, matches, sig):
+        return matches
+
     def parse(self, sig):
         matches = []
-        for match in re.finditer(self.pattern, sig):
+        for match in self.finditer(self.pattern, sig):
             normalized_match = self.normalize_match(match)
             if normalized_match:
                 matches.append(normalized_match)
+        matches = self.finalize_matches(matches, sig)
+        self.matches = matches
+        return matches
+
+    # every match of pattern (self.pattern or self.batch_pattern) in sig from pos on, the same as pattern.finditer(sig, pos)
+    # parsers can override this to only try the pattern where it can start (see frequency.FrequencyCountParser)
+    def finditer(self, pattern, sig, pos=0):
+        return pattern.finditer(sig, pos)
+
+    # returns False if the pattern can't match sig, without running it (see get_prefilter)
+    # sig_has_digit comes from the lexer tokens (see lexer.has_digits)
+    # NOTE: re.I can match some non-ascii characters that lower() doesn't map to ascii, so those sigs always run
+    def may_match(self, sig, sig_has_digit):
+        if self.prefilter is None or not sig.isascii():
+            return True
+        needs_digit, literals = self.prefilter
+        if needs_digit and sig_has_digit:
+            return True
+        return any(literal in sig for literal in literals)
+
+    # like parse, but returns the span of every pattern match along with its normalized match (or None
+    # if normalize_match dropped it), so the matches can be reused for other sigs with the same template
+    # NOTE: only for template_safe parsers (see SigParser.get_template_matches)
+    def parse_spans(self, sig):
+        spans = []
+        for match in self.finditer(self.pattern, sig):
+            spans.append((match.start(), match.end(), self.normalize_match(match)))
+        return spans
+
+    # rebuild the matches for sig from the spans of a sig with the same template
+    # changed is the list of positions where the digits of the two sigs differ - a template safe pattern
+    # matches the same spans in both sigs, so only matches with a changed digit are matched / normalized again
+    def parse_from_spans(self, sig, spans, changed):
+        matches = []
+        for start, end, normalized_match in spans:
+            if any(start <= i < end for i in changed):
+                normalized_match = self.normalize_match(self.pattern.match(sig, start))
+            elif normalized_match:
+                normalized_match = normalized_match.copy()
+            if normalized_match:
+                matches.append(normalized_match)
+        matches = self.finalize_matches(matches, sig)
         self.matches = matches
-        return matches
\ No newline at end of file
+        return matches
+
+    # reach of the pattern (see get_reach), worked out the first time a sig is edited (see parse_edit)
+    # False if every edit has to be parsed in full (i.e. parsers whose matches depend on more than their pattern)
+    def get_edit_reach(self):
+        if self.edit_reach is None:
+            self.edit_reach = get_reach(self.pattern)
+        return self.edit_reach
+
+    # spans (see parse_spans) for sig, an edit of old_sig with spans old_spans - the first prefix and the last suffix
+    # characters of the two sigs are the same (see services/session.py)
+    # the matches before the edit that the pattern can't have seen it from are kept, and the pattern is only run from
+    # there until the scan is back in step with the old matches after the edit, which are kept with their offsets
+    # shifted - so the spans are always the same as parse_spans(sig)
+    def parse_edit(self, sig, old_sig, old_spans, prefix, suffix):
+        reach = self.get_edit_reach()
+        if not reach:
+            return self.parse_spans(sig)
+        ahead, behind = reach
+        ahead = get_reach_chars(ahead, self.pattern.flags, old_sig)
+        behind = get_reach_chars(behind, self.pattern.flags, sig)
+        spans = []
+        position = 0
+        # a search from any position up to a match's start can't have looked past start + ahead - so those matches
+        # are the same, and so is every search from a position up to prefix - ahead that didn't find one
+        for span in old_spans:
+            if span[0] + ahead > prefix:
+                break
+            spans.append(span)
+            position = span[1]
+        position = max(position, prefix - ahead + 1)
+        # nothing to keep on either side of the edit (i.e. typing at the end of a short sig) - a full scan is quicker
+        if position <= 0 and suffix <= behind:
+            return self.parse_spans(sig)
+        shift = len(sig) - len(old_sig)
+        old_starts = [span[0] for span in old_spans]
+        in_step = get_in_step_position(old_spans, old_starts, max(position, len(sig) - suffix + behind), shift)
+        for match in self.finditer(self.pattern, sig, position):
+            if match.start() >= in_step:
+                break
+            spans.append((match.start(), match.end(), self.normalize_match(match)))
+            in_step = get_in_step_position(old_spans, old_starts, max(match.end(), len(sig) - suffix + behind), shift)
+        for start, end, normalized_match in old_spans[bisect_left(old_starts, in_step - shift):]:
+            if normalized_match:
+                normalized_match = normalized_match.copy()
+                for k in self.offset_keys:
+                    if normalized_match[k] is not None:
+                        normalized_match[k] += shift
+            spans.append((start + shift, end + shift, normalized_match))
+        return spans
+
+    # parse many sigs joined by BATCH_SEPARATOR with one scan of the pattern over the whole buffer
+    # starts / ends are the buffer offsets of each sig
+    # returns a list of matches for each sig, with offsets relative to that sig (same as parse(sig))
+    # sig_seconds (a list with a number per sig) turns on timing - the time spent on each sig is added to it (see
+    # time_matches - it's an upper bound, since a scan over several sigs without a match counts for all of them)
+    def parse_batch(self, buffer, starts, ends, sig_seconds=None):
+        if self.batch_pattern is None:
+            return [self.parse_timed(buffer[start:end], sig_seconds, i) for i, (start, end) in enumerate(zip(starts, ends))]
+        sig_matches = [[] for start in starts]
+        # sigs with a match that ran over the separator have to be parsed on their own
+        crossed = set()
+        matches = self.finditer(self.batch_pattern, buffer)
+        if sig_seconds is not None:
+            matches = time_matches(matches, starts, len(buffer), sig_seconds)
+        for match in matches:
+            match_start, match_end = match.span()
+            i = bisect_right(starts, match_start) - 1
+            if match_end > ends[i]:
+                crossed.update(range(i, bisect_right(starts, match_end)))
+                continue
+            normalized_match = self.normalize_match(match)
+            if normalized_match:
+                sig_matches[i].append(normalized_match)
+        results = []
+        for i, matches in enumerate(sig_matches):
+            if i in crossed:
+                results.append(self.parse_timed(buffer[starts[i]:ends[i]], sig_seconds, i))
+                continue
+            matches = self.finalize_matches(matches, buffer)
+            if starts[i]:
+                for match in matches:
+                    for k in self.offset_keys:
+                        if match[k] is not None:
+                            match[k] -= starts[i]
+            results.append(matches)
+        return results
+
+    # parse, adding the time it took to sig_seconds[i] (if sig_seconds isn't None, see parse_batch)
+    def parse_timed(self, sig, sig_seconds, i):
+        if sig_seconds is None:
+            return self.parse(sig)
+        start = time.perf_counter()
+        matches = self.parse(sig)
+        sig_seconds[i] += time.perf_counter() - start
+        return matches
+
+# yields the matches of a scan over a batch buffer, and adds the time it took to find each one (and the time after
+# the last one) to sig_seconds of every sig the scan went over since the match before
+# starts are the buffer offsets of each sig (see Parser.parse_batch)
+def time_matches(matches, starts, buffer_end, sig_seconds):
+    position = 0
+    while True:
+        scan_start = time.perf_counter()
+        match = next(matches, None)
+        seconds = time.perf_counter() - scan_start
+        end = match.end() if match is not None else buffer_end
+        for i in range(bisect_right(starts, position) - 1, bisect_right(starts, max(end - 1, position))):
+            sig_seconds[i] += seconds
+        if match is None:
+            return
+        position = end
+        yield match
+
+# sigs are joined with a newline for batch parsing - normalized sigs never contain one
+BATCH_SEPARATOR = '\n'
+
+# yields (op, av, in_lookaround) for every element of a parsed pattern (see sre_parse.parse)
+def iter_pattern(data, in_lookaround=False):
+    for op, av in data:
+        yield op, av, in_lookaround
+        if op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            yield from iter_pattern(av[1], True)
+        elif op is sre_constants.SUBPATTERN:
+            yield from iter_pattern(av[-1], in_lookaround)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', None)):
+            yield from iter_pattern(av[2], in_lookaround)
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            yield from iter_pattern(av, in_lookaround)
+        elif op is sre_constants.BRANCH:
+            for branch in av[1]:
+                yield from iter_pattern(branch, in_lookaround)
+        elif op is sre_constants.GROUPREF_EXISTS:
+            for branch in av[1:]:
+                if branch:
+                    yield from iter_pattern(branch, in_lookaround)
+
+# returns True if a single pattern element (LITERAL / IN / ...) can match char
+def matches_char(op, av, flags, char):
+    if op is sre_constants.LITERAL:
+        return av == ord(char)
+    if op is sre_constants.NOT_LITERAL:
+        return av != ord(char)
+    if op is sre_constants.ANY:
+        return char != '\n' or bool(flags & re.S)
+    if op is sre_constants.RANGE:
+        return av[0] <= ord(char) <= av[1]
+    if op is sre_constants.CATEGORY:
+        return re.match(category_escape(av), char) is not None
+    if op is sre_constants.IN:
+        negate = bool(av) and av[0][0] is sre_constants.NEGATE
+        items = av[1:] if negate else av
+        return any(matches_char(o, a, flags, char) for o, a in items) != negate
+    return False
+
+# \d / \s / \w ... escape for a category, so it can be tested against a char
+def category_escape(category):
+    for escape, (op, av) in sre_parse.CATEGORIES.items():
+        if op is sre_constants.IN and av[0][1] is category:
+            return escape
+    return '(?!)'
+
+# returns False if a sig in a batch buffer could be matched differently than the same sig on its own
+# ^ / $ are fine since the batch pattern is compiled with re.M, and a match that consumes the separator
+# is caught in parse_batch - but a lookaround that can see the separator (e.g. (?!\s?pain)) can't be caught
+def is_batch_safe(data, flags):
+    for op, av, in_lookaround in iter_pattern(data):
+        if op is sre_constants.AT and av in (sre_constants.AT_BEGINNING_STRING, sre_constants.AT_END_STRING):
+            return False
+        if in_lookaround and (op is sre_constants.GROUPREF or matches_char(op, av, flags, BATCH_SEPARATOR)):
+            return False
+    return True
+
+# returns True if swapping any digit in a sig for another digit can't change where the pattern matches -
+# i.e. every element matches either all of the digits or none of them (so \d+ is fine, but 24 or [0-5] isn't),
+# there are no backreferences, and no groups inside lookarounds (they could capture outside of the match)
+def get_template_safe(pattern):
+    if not isinstance(pattern, re.Pattern):
+        return False
+    try:
+        data = sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return False
+    for op, av, in_lookaround in iter_pattern(data):
+        if op is sre_constants.GROUPREF:
+            return False
+        if op is sre_constants.SUBPATTERN and in_lookaround and av[0] is not None:
+            return False
+        digits = [matches_char(op, av, pattern.flags, d) for d in '0123456789']
+        if any(digits) and not all(digits):
+            return False
+    return True
+
+# returns True if a single pattern element only matches digits (i.e. 5, \d or [0-9])
+def matches_digit_only(op, av):
+    if op is sre_constants.LITERAL:
+        return chr(av).isdigit()
+    if op is sre_constants.RANGE:
+        return ord('0') <= av[0] and av[1] <= ord('9')
+    if op is sre_constants.CATEGORY:
+        return av is sre_constants.CATEGORY_DIGIT
+    if op is sre_constants.IN:
+        return bool(av) and all(matches_digit_only(o, a) for o, a in av)
+    return False
+
+# works out what a sig has to contain for a parsed pattern to match it
+# returns (needs_digit, literals) - the sig has to contain a digit (if needs_digit) or one of the literals -
+# or None if there's nothing useful to check for
+def get_requirement(data, flags):
+    requirements = []
+    literal = ''
+    for op, av in list(data) + [(None, None)]:
+        if op is sre_constants.LITERAL and not chr(av).isdigit():
+            literal += chr(av).lower() if flags & re.I else chr(av)
+            continue
+        if literal:
+            requirements.append((False, frozenset([literal])))
+            literal = ''
+        requirement = None
+        if op is sre_constants.SUBPATTERN:
+            requirement = get_requirement(av[-1], flags)
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', None)):
+            if av[0] > 0:
+                requirement = get_requirement(av[2], flags)
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            requirement = get_requirement(av, flags)
+        elif op is sre_constants.ASSERT:
+            # a lookahead / lookbehind isn't part of the match, but it still has to be in the sig
+            requirement = get_requirement(av[1], flags)
+        elif op is sre_constants.BRANCH:
+            branches = [get_requirement(branch, flags) for branch in av[1]]
+            if all(branches):
+                requirement = (any(b[0] for b in branches), frozenset().union(*[b[1] for b in branches]))
+        elif op is not None and matches_digit_only(op, av):
+            requirement = (True, frozenset())
+        if requirement:
+            requirements.append(requirement)
+    if not requirements:
+        return None
+    # prefer the requirement with the longest shortest literal (a digit on its own is best)
+    return max(requirements, key=lambda r: (min([len(l) for l in r[1]], default=float('inf')), -len(r[1])))
+
+# prefilter for Parser.may_match, or None if the pattern can't be prefiltered
+def get_prefilter(pattern):
+    if not isinstance(pattern, re.Pattern):
+        return None
+    try:
+        return get_requirement(sre_parse.parse(pattern.pattern, pattern.flags), pattern.flags)
+    except Exception:
+        return None
+
+# returns True if the pattern can be run over a batch buffer (see Parser.batch_pattern / Parser.parse_batch)
+def get_batch_safe(pattern):
+    if not isinstance(pattern, re.Pattern):
+        return False
+    try:
+        return is_batch_safe(sre_parse.parse(pattern.pattern, pattern.flags), pattern.flags)
+    except Exception:
+        return False
+
+# (template_safe, prefilter, batch_safe) for a pattern - kept in the pattern snapshot, since working them out is most
+# of the time it takes to create the parsers (see snapshot.py)
+def get_pattern_info(pattern):
+    if not isinstance(pattern, re.Pattern):
+        return False, None, False
+    return pattern_snapshot.get(pattern, lambda pattern: (get_template_safe(pattern), get_prefilter(pattern), get_batch_safe(pattern)))
+
+# past an edit (and whatever a lookbehind can see of it), a search from a position that the scan of the old sig also
+# searched from - i.e. one that isn't inside an old match - finds the same matches as the old scan did from there
+# returns the first of those positions from position on, with old_spans shifted by shift
+def get_in_step_position(old_spans, old_starts, position, shift):
+    i = bisect_left(old_starts, position - shift)
+    if i > 0 and old_spans[i - 1][1] > position - shift:
+        return old_spans[i - 1][1] + shift
+    return position
+
+# elements that match a single character
+SINGLE_CHAR_OPS = (sre_constants.LITERAL, sre_constants.NOT_LITERAL, sre_constants.ANY, sre_constants.IN, sre_constants.RANGE, sre_constants.CATEGORY)
+REPEAT_OPS = (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT, getattr(sre_constants, 'POSSESSIVE_REPEAT', None))
+
+# element keys (see get_widths) -> [(op, av), ...]
+reach_elements = {}
+
+# widths of a parsed pattern, as counters of '' (characters), '*' (the length of the sig) and element keys (the
+# longest run in the sig of characters one of the elements matches - for unbounded repeats like \s+ or (?:to)+)
+# returns (width, lookahead, lookbehind) - the most the pattern consumes, and the most its lookarounds add
+def get_widths(data):
+    width = collections.Counter()
+    lookahead = collections.Counter()
+    lookbehind = collections.Counter()
+    for op, av in data:
+        if op in SINGLE_CHAR_OPS:
+            width[''] += 1
+            continue
+        if op is sre_constants.SUBPATTERN:
+            parts = [get_widths(av[-1])]
+        elif op is getattr(sre_constants, 'ATOMIC_GROUP', None):
+            parts = [get_widths(av)]
+        elif op is sre_constants.BRANCH:
+            parts = [get_widths(branch) for branch in av[1]]
+        elif op is sre_constants.GROUPREF_EXISTS:
+            parts = [get_widths(branch or []) for branch in av[1:]]
+        elif op in REPEAT_OPS:
+            body_width, body_lookahead, body_lookbehind = get_widths(av[2])
+            if av[1] < sre_constants.MAXREPEAT:
+                body_width = collections.Counter({k: v * av[1] for k, v in body_width.items()})
+            else:
+                # the repeat can only consume characters that one of the elements in it matches
+                elements = [(o, a) for o, a, in_lookaround in iter_pattern(av[2]) if o in SINGLE_CHAR_OPS and not in_lookaround]
+                if any(o is sre_constants.GROUPREF for o, a, in_lookaround in iter_pattern(av[2])):
+                    body_width = collections.Counter({'*': 1})
+                else:
+                    key = repr(elements)
+                    reach_elements[key] = elements
+                    body_width = collections.Counter({key: 1})
+            parts = [(body_width, body_lookahead, body_lookbehind)]
+        elif op in (sre_constants.ASSERT, sre_constants.ASSERT_NOT):
+            # a lookaround can be anywhere in the match, so it adds its whole width to what the pattern can see
+            body_width, body_lookahead, body_lookbehind = get_widths(av[1])
+            if av[0] == 1:
+                parts = [(collections.Counter(), body_width + body_lookahead, body_lookbehind)]
+            else:
+                parts = [(collections.Counter(), body_lookahead, body_width + body_lookbehind)]
+        elif op is sre_constants.GROUPREF:
+            parts = [(collections.Counter({'*': 1}), collections.Counter(), collections.Counter())]
+        else:
+            # AT (^, $, \b ...) - the one character either side of it is added to every reach
+            continue
+        # the widest branch, counted element by element
+        branch_width = collections.Counter()
+        for part in parts:
+            branch_width |= part[0]
+            lookahead |= part[1]
+            lookbehind |= part[2]
+        width += branch_width
+    return width, lookahead, lookbehind
+
+# how far a search of the pattern from a position can look at the sig, for Parser.parse_edit
+# returns (ahead, behind) - counters (see get_widths) of the characters after and before the position - or False if
+# the pattern can match an empty string or can't be parsed
+def get_reach(pattern):
+    if not isinstance(pattern, re.Pattern):
+        return False
+    try:
+        data = sre_parse.parse(pattern.pattern, pattern.flags)
+        if data.getwidth()[0] == 0:
+            return False
+        width, lookahead, lookbehind = get_widths(data)
+    except Exception:
+        return False
+    return width + lookahead + collections.Counter({'': 1}), lookbehind + collections.Counter({'': 1})
+
+# a reach counter (see get_widths) in characters of sig
+def get_reach_chars(reach, flags, sig):
+    chars = 0
+    for key, count in reach.items():
+        if key == '':
+            chars += count
+        elif key == '*':
+            chars += count * len(sig)
+        else:
+            chars += count * get_longest_run(key, flags, sig)
+    return chars
+
+# longest run of characters in sig that one of the elements of key (see get_widths) matches
+# every parser is checked against the same sig after an edit, so the last few sigs are cached
+@functools.lru_cache(maxsize=256)
+def get_longest_run(key, flags, sig):
+    chars = set(sig)
+    run_chars = ''.join(char for char in chars if run_matches_char(key, flags, char))
+    if len(run_chars) == len(chars):
+        return len(sig)
+    if not run_chars:
+        return 0
+    return max(len(run) for run in re.findall('[' + re.escape(run_chars) + ']+', sig))
+
+# NOTE: case folding and non-ascii characters are counted as matching, which can only make a run longer
+@functools.lru_cache(maxsize=None)
+def run_matches_char(key, flags, char):
+    if not char.isascii():
+        return True
+    chars = set([char, char.lower(), char.upper()] if flags & re.I else [char])
+    return any(matches_char(op, av, flags, c) for op, av in reach_elements[key] for c in chars)
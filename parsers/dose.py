@@ -1,4 +1,6 @@
 from .classes.parser import *
+from .services.lexer import NUMBER_KINDS, tokenize
+from . import method, route, frequency
 
 class DoseParser(Parser):
     parser_type = 'dose'
@@ -52,7 +54,62 @@ class DoseParser(Parser):
         readable = readable.strip()
         return readable
 
+# a bare number is only a dose when a method, route or frequency starts right after it (i.e. "take 1 po qd",
+# "one by mouth daily") - like parseLoneNumericDose below - or a method ends right before it (i.e. "take 2"), or when
+# it's the whole sig (i.e. "1.5")
+# so numbers that belong to something else (i.e. "on day 1 then", "every 4-6 hours") aren't picked up as doses
+# the anchors are the method / route / frequency matches SigParser has already found (see parse_anchored), and the
+# pattern is only tried at the numbers in the sig (see lexer.tokenize) - not scanned over the whole sig
 class DoseOnlyParser(DoseParser):
+    # parser types whose matches are the anchors - SigParser parses them first (see SigParser.get_parse_order)
+    anchor_types = ['method', 'route', 'frequency']
+    anchor_parsers = {'method': method.parsers, 'route': route.parsers, 'frequency': frequency.parsers}
+    def __init__(self):
+        super().__init__()
+        # the matches depend on the anchors as well as the pattern, so they can't come from another sig's spans or
+        # from a scan over a batch buffer
+        self.template_safe = False
+        self.batch_safe = False
+    # on its own (i.e. outside of SigParser), the anchor parsers are run here first
+    def parse(self, sig):
+        anchor_matches = {parser_type: [m for p in parsers for m in p.parse(sig)] for parser_type, parsers in self.anchor_parsers.items()}
+        return self.parse_anchored(sig, anchor_matches)
+    # anchor_matches has the matches for each of the anchor_types in sig, and tokens are the lexer tokens for sig
+    # (tokenized here if they haven't been worked out)
+    def parse_anchored(self, sig, anchor_matches, tokens=None):
+        anchor_starts = set()
+        for parser_type in self.anchor_types:
+            for match in anchor_matches.get(parser_type, []):
+                anchor_starts.add(match[parser_type + '_text_start'])
+        method_ends = set(match['method_text_end'] for match in anchor_matches.get('method', []))
+        if tokens is None:
+            tokens = tokenize(sig)
+        matches = []
+        end = 0
+        for token in tokens:
+            # a number inside the last match (i.e. the "2" of "one or 2") is part of it
+            if token.kind not in NUMBER_KINDS or token.start < end:
+                continue
+            match = self.pattern.match(sig, token.start)
+            if not match:
+                continue
+            end = match.end()
+            if self.is_anchored(sig, match.start(), end, anchor_starts, method_ends):
+                normalized_match = self.normalize_match(match)
+                if normalized_match:
+                    matches.append(normalized_match)
+        self.matches = matches
+        return matches
+    def is_anchored(self, sig, start, end, anchor_starts, method_ends):
+        while start > 0 and sig[start - 1] == ' ':
+            start -= 1
+        if start in method_ends:
+            return True
+        while end < len(sig) and sig[end] == ' ':
+            end += 1
+        if end == len(sig):
+            return start == 0
+        return end in anchor_starts
     def normalize_pattern(self):
         method_patterns = []
         strength_unit_patterns = []
@@ -28,6 +28,46 @@ class FrequencyParser(Parser):
 		readable += ' on ' + ', '.join(day_of_week.split('|')) if day_of_week != None else ''
 		return readable
 
+# the frequency count at the start of FrequencyXTimesPerDay / FrequencyXTimesDaily (i.e. 1-2 times, 3x, twice)
+RE_FREQUENCY_COUNT = RE_RANGE + r'\s?(?:time(?:s)?|x|nights|days)|once|twice'
+# a frequency count always has one of these in it
+FREQUENCY_COUNT_WORDS = ('time', 'x', 'night', 'day', 'once', 'twice')
+
+# finds where the frequency counts in a sig start, once for all of the parsers that start with a count
+# the number range is the slow part of those patterns, since it's tried at every position of the sig - this way it's
+# only scanned for once, and the parsers only try their pattern where a count starts (see FrequencyCountParser)
+# the parsers run one after the other on the same sig (or batch buffer), so the last scan is kept for the next one
+class FrequencyCountScanner:
+	pattern = re.compile(r'(?=' + RE_FREQUENCY_COUNT + r')', flags = re.I)
+	def __init__(self):
+		self.text = None
+		self.starts = []
+
+	def get_starts(self, text):
+		if text != self.text:
+			# NOTE: re.I can match some non-ascii characters that lower() doesn't map to ascii, so those are always scanned
+			if text.isascii() and not any(word in text.lower() for word in FREQUENCY_COUNT_WORDS):
+				starts = []
+			else:
+				starts = [match.start() for match in self.pattern.finditer(text)]
+			self.text, self.starts = text, starts
+		return self.starts
+
+count_scanner = FrequencyCountScanner()
+
+# parser whose pattern starts with a frequency count (RE_FREQUENCY_COUNT, or part of it)
+# finds the same matches as pattern.finditer, without trying the pattern where there's no count
+class FrequencyCountParser(FrequencyParser):
+	def finditer(self, pattern, sig, pos=0):
+		end = pos
+		for start in count_scanner.get_starts(sig):
+			if start < end:
+				continue
+			match = pattern.match(sig, start)
+			if match:
+				end = match.end()
+				yield match
+
 # bid | tid | qid
 # bid-tid, bid or tid
 # TODO: account for bid-tid being min 2 and max 3 times per day - currently it only finds the max of 3
@@ -71,7 +111,7 @@ class FrequencyEveryXDay(FrequencyParser):
 # frequency = a[0], frequencyMax = a[1], period = 1, periodUnit = b (normalize to d, wk, mo, yr)
 # frequency = a (1 if once, 2 if twice), period = 1, periodUnit = b (normalize to d, wk, mo, yr)
 # NOTE: 'daily' won't match this pattern because it requires specific times *per* day
-class FrequencyXTimesPerDay(FrequencyParser):
+class FrequencyXTimesPerDay(FrequencyCountParser):
 	pattern = r'(?P<frequency>' + RE_RANGE + r'\s?(?:time(?:s)?|x|nights|days)|once|twice)\s?(?:per|a|each|every|\/)\s?(?P<period_unit>day|week|wk\b|month|year|d\b|w\b|mon|m\b|yr)'
 	def normalize_match(self, match):
 		frequency = frequency_max = match.group('frequency')
@@ -94,7 +134,7 @@ class FrequencyXTimesPerDay(FrequencyParser):
 # (a: remove 'times' or 'x')
 # frequency = a[0], frequencyMax = a[1], period = 1, periodUnit = b (normalize to d, wk, mo, yr)
 # frequency = a (1 if once, 2 if twice, 1 if null), period = 1, periodUnit = b (normalize to d, wk, mo, yr)
-class FrequencyXTimesDaily(FrequencyParser):
+class FrequencyXTimesDaily(FrequencyCountParser):
 	pattern = r'(?:(?P<frequency>' + RE_RANGE + r'\s?(?:time(?:s)?|x)|once|twice)(?: \ba\b| per)?\s?)(?P<period_unit>day|d\b|daily|dialy|weekly|monthly|yearly|\bhs\b)'
 	def normalize_match(self, match):
 		frequency = frequency_max = match.group('frequency')
@@ -97,12 +97,7 @@ class TopicalRouteParser(RouteParser):
         # for now, set route to 'topically' for systems that can't handle specific sites
         route = 'topically'
         return self.generate_match({'route': route, 'route_text_start': route_text_start, 'route_text_end': route_text_end, 'route_text': route_text, 'route_readable': route_readable})
-    def parse(self, sig):
-        matches = []
-        for match in re.finditer(self.pattern, sig):
-            normalized_match = self.normalize_match(match)
-            if normalized_match:
-                matches.append(normalized_match)
+    def finalize_matches(self, matches, sig):
         # once we have matched on all the possible patterns,
         # we take the list of matches and pass it to a special normalize_multiple_matches method
         # which then overwrites the list of matches with one final match that combines all the matches
@@ -110,7 +105,6 @@ class TopicalRouteParser(RouteParser):
             normalized_match = self.normalize_multiple_matches(matches, sig)
             if normalized_match:
                 matches = [(normalized_match)]
-        self.matches = matches
         return matches
 
 
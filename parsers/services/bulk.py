@@ -0,0 +1,547 @@
+import contextlib
+import csv
+import json
+import mmap
+import multiprocessing
+from multiprocessing import resource_tracker
+import os
+import shutil
+import tempfile
+import traceback
+from parsers.sig import SigParser, print_progress_bar
+from .compression import split_compression, get_compression, open_input, open_output
+from .records import ResultRecords, encode_records, from_shared_memory
+
+# streaming bulk parsing
+# sigs are read, parsed and written a chunk at a time, so memory use is bounded by the chunk size (and the number of
+# chunks in flight when parsing in parallel) instead of growing with the size of the input file
+# NOTE: parse_sig_csv collects every parsed sig before writing, which is fine for small files but not for millions of rows
+#
+# formats (by file extension):
+#   csv    - input is one sig per row (first column), output is one column per output field
+#   ndjson - one JSON object per line (.ndjson or .jsonl); input objects have the sig in SIG_FIELD, and every other
+#            field is passed through to the output, with the parse result (verbose or not) in RESULT_FIELD
+#   text   - input only, one sig per line (i.e. piped in on stdin)
+# any of these can be gzip / zstd compressed (i.e. input.ndjson.gz) - see compression.py
+
+CHUNK_SIZE = 1000
+# chunks queued per worker - enough to keep every worker busy while the main process writes results
+CHUNKS_PER_WORKER = 2
+# byte ranges per worker when a large file is split between workers (see parse_ranges) - more ranges than workers
+# evens out ranges that take longer to parse, and ranges are never smaller than MIN_RANGE_SIZE
+RANGES_PER_WORKER = 4
+MIN_RANGE_SIZE = 16 << 20
+# bytes per read when counting quotes to find csv record boundaries
+SCAN_SIZE = 16 << 20
+
+FILE_FORMATS = {
+    '.csv': 'csv',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+INPUT_FORMATS = ['csv', 'ndjson', 'text']
+OUTPUT_FORMATS = ['csv', 'ndjson']
+SIG_FIELD = 'sig'
+RESULT_FIELD = 'parsed'
+
+# the SigParser for each worker process (see init_worker)
+worker_parser = None
+
+def get_file_format(file_name):
+    extension = os.path.splitext(split_compression(file_name)[0])[1].lower()
+    if extension not in FILE_FORMATS:
+        raise ValueError('unsupported file type: ' + file_name + ' (expected ' + ', '.join(FILE_FORMATS) + ')')
+    return FILE_FORMATS[extension]
+
+# lines of a binary stream, keeping track of the byte offset of the next line (for checkpoints)
+# end stops reading at that byte offset (the end of a byte range, see parse_ranges)
+class LineReader:
+    def __init__(self, binary_stream, offset=0, end=None):
+        self.stream = binary_stream
+        self.offset = offset
+        self.end = end
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.end is not None and self.offset >= self.end:
+            raise StopIteration
+        line = self.stream.readline()
+        if not line:
+            raise StopIteration
+        self.offset += len(line)
+        return line.decode('utf-8')
+
+# yields (sig, record, offset) for each line of input
+# record is the JSON object for ndjson (passed through to the output), or None for csv / text
+# offset is the input byte offset just after the record if in_file is a LineReader, or None
+def iter_records(in_file, file_format, sig_field=SIG_FIELD):
+    get_offset = lambda: getattr(in_file, 'offset', None)
+    if file_format == 'csv':
+        for row in csv.reader(in_file, delimiter=','):
+            yield (row[0] if row else ''), None, get_offset()
+        return
+    if file_format == 'text':
+        for line in in_file:
+            yield line.rstrip('\r\n'), None, get_offset()
+        return
+    for line_number, line in enumerate(in_file, 1):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if not isinstance(record, dict):
+            raise ValueError('line ' + str(line_number) + ': expected a JSON object')
+        yield (record.get(sig_field) or ''), record, get_offset()
+
+def count_records(input_file, file_format):
+    with open_input(input_file) as in_file:
+        if file_format == 'csv':
+            return sum(1 for row in csv.reader(in_file, delimiter=','))
+        return sum(1 for line in in_file if line.strip())
+
+# returns write(result, record) for the output format
+# transform (if any) has already been applied to result
+# header=False leaves out the csv header (i.e. when appending to a resumed run)
+def get_writer(out_file, file_format, fields=None, passthrough=True, header=True):
+    if file_format == 'csv':
+        writer = csv.DictWriter(out_file, fieldnames=fields if fields is not None else SigParser.OUTPUT_KEYS)
+        if header:
+            writer.writeheader()
+        return lambda result, record: writer.writerow(result)
+    def write(result, record):
+        if passthrough and record is not None:
+            record = dict(record)
+            record[RESULT_FIELD] = result
+            result = record
+        out_file.write(json.dumps(result, default=str) + '\n')
+    return write
+
+def iter_chunks(items, chunk_size=CHUNK_SIZE):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+# keyword arguments to build the same SigParser in a worker process
+# NOTE: SigParser itself can't be pickled (match record classes are created at runtime), but its class can
+def get_parser_kwargs(sig_parser):
+    return {'template_cache_size': sig_parser.template_cache_size, 'excluded_dose_units': sig_parser.excluded_dose_units, 'slow_ms': sig_parser.slow_ms, 'slow_limit': sig_parser.slow_limit}
+
+def init_worker(parser_class, parser_kwargs):
+    global worker_parser
+    worker_parser = parser_class(**parser_kwargs)
+
+# transform(result) for the sig it was parsed from - a verbose result gets the sig as it was written in
+# original_sig_text first (the parse result leaves it empty), i.e. for the text of a FHIR Dosage
+def apply_transform(transform, result, sig, verbose):
+    if verbose and result.get('original_sig_text') is None:
+        result['original_sig_text'] = sig
+    return transform(result)
+
+# returns (results, errors) for a chunk of sigs
+# transform is applied in the worker (i.e. fhir.get_dosage_instruction), so only the transformed results are sent back
+# it has to be a module level function so it can be pickled
+# if the chunk raises, each sig is parsed on its own, and a sig that still raises gets an unparsable result (see
+# SigParser.get_unparsable) and an error (see get_error) instead of stopping the run
+def parse_chunk(sig_parser, sigs, verbose=False, fields=None, transform=None):
+    try:
+        results = sig_parser.parse_batch(sigs, verbose=verbose, fields=fields)
+        if transform is not None:
+            results = [apply_transform(transform, result, sig, verbose) for result, sig in zip(results, sigs)]
+        return results, []
+    except Exception:
+        pass
+    results = []
+    errors = []
+    for index, sig in enumerate(sigs):
+        try:
+            result = sig_parser.parse(sig, verbose=verbose, fields=fields)
+            # a slow sig parsed on its own doesn't know where it was in the chunk
+            for slow_sig in sig_parser.slow_sigs:
+                if slow_sig['index'] is None:
+                    slow_sig['index'] = index
+            if transform is not None:
+                result = apply_transform(transform, result, sig, verbose)
+        except Exception as e:
+            errors.append(get_error(index, sig, e))
+            result = sig_parser.get_unparsable(sig, verbose, fields)
+            if transform is not None:
+                result = apply_transform(transform, result, sig, verbose)
+        results.append(result)
+    return results, errors
+
+# index is the sig's index in its chunk until parse_stream turns it into a row number
+def get_error(index, sig, exception):
+    return {'row': index, 'sig': sig, 'error': type(exception).__name__ + ': ' + str(exception), 'traceback': traceback.format_exc()}
+
+# shared=True sends non-verbose results back through shared memory (see records.py) instead of pickling them
+# returns (results, errors, slow sigs) - see SigParser.check_slow_sig
+def parse_worker_chunk(sigs, verbose=False, fields=None, transform=None, shared=False):
+    results, errors = parse_chunk(worker_parser, sigs, verbose, fields, transform)
+    if shared:
+        try:
+            results = encode_records(results).to_shared_memory()
+        except TypeError:
+            pass
+    return results, errors, worker_parser.get_slow_sigs()
+
+# results from parse_worker_chunk - a list of dicts, or a shared memory handle for a ResultRecords
+def get_worker_results(results):
+    if isinstance(results, list):
+        return results
+    return from_shared_memory(results)
+
+# yields (items, results, errors) for each chunk of items, in input order (see parse_chunk)
+# get_sig gets the sig from an item (items are sigs by default) - only the sigs are sent to the workers
+# workers > 0 parses chunks in that many processes, with at most CHUNKS_PER_WORKER chunks per worker in flight
+# on_slow(slow_sigs) is called with the slow sigs of each chunk (with their index in the chunk) before it's yielded, if
+# sig_parser has a slow_ms (see SigParser.check_slow_sig)
+# NOTE: non-verbose results from workers come back as a ResultRecords (iterates the same dicts, see records.py)
+def parse_chunks(items, sig_parser=None, verbose=False, fields=None, transform=None, chunk_size=CHUNK_SIZE, workers=0, get_sig=None, on_slow=None):
+    if sig_parser is None:
+        sig_parser = SigParser()
+    chunks = iter_chunks(items, chunk_size)
+    get_sigs = (lambda chunk: chunk) if get_sig is None else (lambda chunk: [get_sig(item) for item in chunk])
+    if workers <= 0:
+        for chunk in chunks:
+            results, errors = parse_chunk(sig_parser, get_sigs(chunk), verbose, fields, transform)
+            if on_slow is not None and sig_parser.slow_sigs:
+                on_slow(sig_parser.get_slow_sigs())
+            yield chunk, results, errors
+        return
+    shared = not verbose and transform is None
+    if shared:
+        # workers started after this share the main process's resource tracker, which cleans up any shared memory
+        # left behind if the run dies (otherwise each worker starts its own, which warns about blocks it didn't remove)
+        resource_tracker.ensure_running()
+    with multiprocessing.Pool(workers, initializer=init_worker, initargs=(type(sig_parser), get_parser_kwargs(sig_parser))) as pool:
+        pending = []
+        try:
+            for chunk in chunks:
+                pending.append((chunk, pool.apply_async(parse_worker_chunk, (get_sigs(chunk), verbose, fields, transform, shared))))
+                if len(pending) >= workers * CHUNKS_PER_WORKER:
+                    chunk, result = pending.pop(0)
+                    results, errors, slow_sigs = result.get()
+                    if on_slow is not None and slow_sigs:
+                        on_slow(slow_sigs)
+                    yield chunk, get_worker_results(results), errors
+            while pending:
+                chunk, result = pending.pop(0)
+                results, errors, slow_sigs = result.get()
+                if on_slow is not None and slow_sigs:
+                    on_slow(slow_sigs)
+                yield chunk, get_worker_results(results), errors
+        finally:
+            # removes the shared memory for chunks that were parsed but never read (i.e. the run was stopped)
+            for chunk, result in pending:
+                try:
+                    get_worker_results(result.get()[0])
+                except Exception:
+                    pass
+
+# validates formats and fields before anything is written
+def check_options(sig_parser, input_format, output_format, verbose=False, fields=None, transform=None, slow_log=None):
+    if slow_log is not None and sig_parser.slow_ms is None:
+        raise ValueError('a slow log needs a SigParser with slow_ms set')
+    if input_format not in INPUT_FORMATS:
+        raise ValueError('unsupported input format: ' + str(input_format) + ' (expected ' + ', '.join(INPUT_FORMATS) + ')')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError('unsupported output format: ' + str(output_format) + ' (expected ' + ', '.join(OUTPUT_FORMATS) + ')')
+    if output_format == 'csv' and (verbose or transform is not None):
+        raise ValueError('verbose and transformed output need ndjson output')
+    sig_parser.get_projection(None if verbose else fields)
+
+# parses sigs from in_file (an open text file, or any iterable of lines) into out_file, one line of output per line of input
+# out_file is flushed after every chunk, so results come out in batches when streaming through a pipe
+# verbose output and transform (a function of each parse result, i.e. fhir.get_dosage_instruction) need ndjson output
+# passthrough=False writes just the results to ndjson, without the input record's other fields
+# row_total turns on the progress bar
+# on_chunk(rows, input_offset) is called after each chunk is flushed (see parse_file checkpoints)
+# rows_done / header are for picking up where a previous run left off
+# a sig that raises an exception is written as unparsable, and its error goes to dead_letter (see write_error)
+# sigs slower than sig_parser's slow_ms go to slow_log, up to its slow_limit (see write_slow_sig)
+# returns {'rows': sigs written (including rows_done), 'errors': sigs that raised}, and 'slow': sigs written to slow_log
+# if there is one
+def parse_stream(in_file, out_file, input_format, output_format, sig_parser=None, verbose=False, fields=None, transform=None, passthrough=True, sig_field=SIG_FIELD, chunk_size=CHUNK_SIZE, workers=0, row_total=None, on_chunk=None, rows_done=0, header=True, dead_letter=None, slow_log=None):
+    if sig_parser is None:
+        sig_parser = SigParser()
+    check_options(sig_parser, input_format, output_format, verbose, fields, transform, slow_log)
+    row_count = rows_done
+    error_count = 0
+    slow_count = 0
+    slow_sigs = []
+    write = get_writer(out_file, output_format, fields, passthrough, header)
+    csv_fields = fields if fields is not None else SigParser.OUTPUT_KEYS
+    records = iter_records(in_file, input_format, sig_field)
+    for chunk, results, errors in parse_chunks(records, sig_parser, verbose, fields, transform, chunk_size, workers, get_sig=lambda item: item[0], on_slow=slow_sigs.extend if slow_log is not None else None):
+        if output_format == 'csv' and isinstance(results, ResultRecords) and results.fields == csv_fields:
+            # same as the DictWriter in get_writer, without a dict per row
+            csv.writer(out_file).writerows(results.rows())
+        else:
+            for (sig, record, offset), result in zip(chunk, results):
+                write(result, record)
+        for error in errors:
+            write_error(dead_letter, error, row_count, chunk[error['row']][1] if input_format == 'ndjson' else None)
+        # each worker keeps up to slow_limit, so there can be more than that in all
+        for slow_sig in slow_sigs[:max(sig_parser.slow_limit - slow_count, 0)]:
+            write_slow_sig(slow_log, slow_sig, row_count)
+            slow_count += 1
+        del slow_sigs[:]
+        out_file.flush()
+        row_count += len(chunk)
+        error_count += len(errors)
+        if on_chunk is not None:
+            on_chunk(row_count, chunk[-1][2])
+        if row_total:
+            print_progress_bar(row_count, row_total)
+    if slow_log is not None:
+        slow_log.flush()
+        return {'rows': row_count, 'errors': error_count, 'slow': slow_count}
+    return {'rows': row_count, 'errors': error_count}
+
+# dead letter files
+# one NDJSON line per sig that raised: the row number in the input (counting from 1, not counting the csv header),
+# the sig, the error, the traceback and (for ndjson input) the input record, so failures can be looked into and
+# rerun without stopping a bulk run
+def get_dead_letter_file(output_file):
+    return split_compression(output_file)[0] + '.errors.ndjson'
+
+def write_error(dead_letter, error, rows_done, record=None):
+    if dead_letter is None:
+        return
+    error = dict(error, row=rows_done + error['row'] + 1)
+    if record is not None:
+        error['record'] = record
+    dead_letter.write(json.dumps(error) + '\n')
+
+# slow sig logs
+# one NDJSON line per sig that took longer than the parser's slow_ms: its row number (as in the dead letter file), the
+# sig, the time it took on its own in ms, and the time each component parser took in ms (see SigParser.check_slow_sig)
+# - for finding the rare inputs that make a pattern backtrack without profiling a whole run
+def get_slow_log_file(output_file):
+    return split_compression(output_file)[0] + '.slow.ndjson'
+
+def write_slow_sig(slow_log, slow_sig, rows_done):
+    slow_sig = dict(slow_sig)
+    index = slow_sig.pop('index')
+    slow_log.write(json.dumps(dict({'row': rows_done + index + 1 if index is not None else None}, **slow_sig)) + '\n')
+
+# byte ranges
+# with workers > 0, a large uncompressed input file is split into byte ranges that each start and end on a record
+# boundary, and each worker memory maps the file and parses its own ranges into a part file, which the main process
+# copies to the output in order - so the main process never reads, pickles or sends a single row
+# NOTE: the part files are written next to the output file, so this needs as much free space again as the output
+
+# the number of '"' in mm[start:end], a block at a time
+def count_quotes(mm, start, end):
+    count = 0
+    for block_start in range(start, end, SCAN_SIZE):
+        count += mm[block_start:min(block_start + SCAN_SIZE, end)].count(b'"')
+    return count
+
+# splits mm into about parts byte ranges, [(start, end), ...], that end just after a newline
+# a csv newline is only a record boundary outside quotes (i.e. not in "take 1 tab\nby mouth") - there is an even
+# number of quotes before it (an escaped quote is "", so it doesn't change that), counting from the previous boundary
+# ndjson can't have a newline inside a record, so every newline is a boundary
+def get_ranges(mm, parts, file_format):
+    size = len(mm)
+    ranges = []
+    start = 0
+    for part in range(1, parts):
+        position = max(size * part // parts, start)
+        in_quotes = file_format == 'csv' and count_quotes(mm, start, position) % 2 == 1
+        while True:
+            newline = mm.find(b'\n', position)
+            if newline < 0:
+                break
+            if file_format == 'csv':
+                in_quotes ^= count_quotes(mm, position, newline) % 2 == 1
+            position = newline + 1
+            if not in_quotes:
+                break
+        if newline < 0 or position >= size:
+            break
+        ranges.append((start, position))
+        start = position
+    ranges.append((start, size))
+    return ranges
+
+# byte ranges for parse_ranges, or None if input_file should be read as a stream (compressed, or too small to split)
+def split_input(input_file, file_format, workers):
+    parts = min(workers * RANGES_PER_WORKER, os.path.getsize(input_file) // MIN_RANGE_SIZE)
+    if parts < 2:
+        return None
+    with open(input_file, 'rb') as f:
+        if get_compression(f) is not None:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = get_ranges(mm, parts, file_format)
+    return ranges if len(ranges) > 1 else None
+
+def get_part_files(part_dir, index):
+    part_file = os.path.join(part_dir, 'part-' + str(index))
+    return part_file, part_file + '.errors', part_file + '.slow'
+
+# parses one byte range of input_file (in a worker process) into its part files, with parse_stream
+# returns parse_stream's summary (dead letter and slow log rows are counted from the start of the range)
+def parse_range(input_file, start, end, part_dir, index, input_format, output_format, verbose, fields, transform, passthrough, sig_field, chunk_size):
+    part_file, error_file, slow_file = get_part_files(part_dir, index)
+    with open(input_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+            open(part_file, 'w', encoding='utf-8', newline='') as out_file, open(error_file, 'w', encoding='utf-8') as dead_letter, \
+            open(slow_file, 'w', encoding='utf-8') as slow_log:
+        mm.seek(start)
+        return parse_stream(LineReader(mm, start, end), out_file, input_format, output_format, worker_parser, verbose, fields, transform, passthrough, sig_field, chunk_size, header=index == 0, dead_letter=dead_letter, slow_log=slow_log if worker_parser.slow_ms is not None else None)
+
+# parses the byte ranges of input_file (from split_input) in workers, and copies each range's output to out_file, its
+# errors to dead_letter and its slow sigs to slow_log (with row numbers counted from the start of the file), in order
+def parse_ranges(input_file, ranges, out_file, input_format, output_format, sig_parser=None, verbose=False, fields=None, transform=None, passthrough=True, sig_field=SIG_FIELD, chunk_size=CHUNK_SIZE, workers=1, progress=True, dead_letter=None, part_dir=None, slow_log=None):
+    if sig_parser is None:
+        sig_parser = SigParser()
+    check_options(sig_parser, input_format, output_format, verbose, fields, transform, slow_log)
+    row_count = 0
+    error_count = 0
+    slow_count = 0
+    with tempfile.TemporaryDirectory(dir=part_dir) as part_dir, \
+            multiprocessing.Pool(workers, initializer=init_worker, initargs=(type(sig_parser), get_parser_kwargs(sig_parser))) as pool:
+        pending = [pool.apply_async(parse_range, (input_file, start, end, part_dir, index, input_format, output_format, verbose, fields, transform, passthrough, sig_field, chunk_size)) for index, (start, end) in enumerate(ranges)]
+        for index, result in enumerate(pending):
+            summary = result.get()
+            part_file, error_file, slow_file = get_part_files(part_dir, index)
+            out_file.flush()
+            with open(part_file, 'rb') as f:
+                shutil.copyfileobj(f, out_file.buffer)
+            with open(error_file, encoding='utf-8') as f:
+                for line in f:
+                    error = json.loads(line)
+                    error['row'] += row_count
+                    if dead_letter is not None:
+                        dead_letter.write(json.dumps(error) + '\n')
+            with open(slow_file, encoding='utf-8') as f:
+                for line in f:
+                    if slow_log is None or slow_count >= sig_parser.slow_limit:
+                        break
+                    slow_sig = json.loads(line)
+                    if slow_sig['row'] is not None:
+                        slow_sig['row'] += row_count
+                    slow_log.write(json.dumps(slow_sig) + '\n')
+                    slow_count += 1
+            os.remove(part_file)
+            os.remove(error_file)
+            os.remove(slow_file)
+            row_count += summary['rows']
+            error_count += summary['errors']
+            if progress:
+                print_progress_bar(index + 1, len(ranges))
+    out_file.flush()
+    if slow_log is not None:
+        slow_log.flush()
+        return {'rows': row_count, 'errors': error_count, 'slow': slow_count}
+    return {'rows': row_count, 'errors': error_count}
+
+# checkpoints
+# with checkpoint=True, parse_file writes OUTPUT_FILE.checkpoint after every chunk with the input byte offset, the
+# rows done and the output byte offset (the output is flushed and synced to disk first)
+# resume=True picks up from the checkpoint - the input skips to the offset, the output is truncated to the offset
+# (dropping anything written after the checkpoint) and appended to, so no sig is parsed or written twice
+# the checkpoint is removed when the run finishes, and resuming without one starts from the beginning
+# NOTE: checkpointed output can't be compressed (a compressed stream can't be truncated and appended to)
+
+def get_checkpoint_file(output_file):
+    return output_file + '.checkpoint'
+
+def read_checkpoint(checkpoint_file):
+    if not os.path.exists(checkpoint_file):
+        return None
+    with open(checkpoint_file, encoding='utf-8') as f:
+        return json.load(f)
+
+# written to a temporary file and renamed, so a run killed mid-write still leaves the previous checkpoint
+def write_checkpoint(checkpoint_file, checkpoint):
+    temp_file = checkpoint_file + '.tmp'
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_file, checkpoint_file)
+
+def skip_bytes(binary_stream, size):
+    if binary_stream.seekable():
+        binary_stream.seek(size)
+        return
+    while size > 0:
+        block = binary_stream.read(min(size, 1 << 20))
+        if not block:
+            raise ValueError('input is shorter than the checkpoint offset')
+        size -= len(block)
+
+# parses a csv / ndjson file of sigs into a csv / ndjson file (formats by file extension, see parse_stream)
+# compressed input is detected automatically, and output is compressed by extension or with compression='gzip' / 'zstd'
+# checkpoint / resume - see above
+# with workers > 0, a large uncompressed input file is split between the workers by byte range (see parse_ranges)
+# sigs that raise are written to dead_letter_file (OUTPUT_FILE.errors.ndjson by default), which is removed if empty
+# returns {'rows': ..., 'errors': ..., 'dead_letter_file': ...} (dead_letter_file is None if there were no errors)
+# with a sig_parser that has a slow_ms, slow sigs are written to slow_log_file (OUTPUT_FILE.slow.ndjson by default), and
+# the summary has 'slow' and 'slow_log_file' too (the same way as errors)
+def parse_file(input_file, output_file, sig_parser=None, verbose=False, fields=None, transform=None, passthrough=True, sig_field=SIG_FIELD, chunk_size=CHUNK_SIZE, workers=0, progress=True, compression=None, checkpoint=False, resume=False, dead_letter_file=None, slow_log_file=None):
+    input_format = get_file_format(input_file)
+    output_format = get_file_format(output_file)
+    checkpoint_file = get_checkpoint_file(output_file)
+    previous = read_checkpoint(checkpoint_file) if resume else None
+    if (checkpoint or resume) and (compression is not None or split_compression(output_file)[1] is not None):
+        raise ValueError('checkpoints need uncompressed output')
+    if previous is not None and previous['input_file'] != os.path.abspath(input_file):
+        raise ValueError('checkpoint is for a different input file: ' + previous['input_file'])
+    if dead_letter_file is None:
+        dead_letter_file = get_dead_letter_file(output_file)
+    if sig_parser is None:
+        sig_parser = SigParser()
+    if sig_parser.slow_ms is not None and slow_log_file is None:
+        slow_log_file = get_slow_log_file(output_file)
+    ranges = split_input(input_file, input_format, workers) if workers > 0 and not (checkpoint or resume) else None
+    row_total = count_records(input_file, input_format) if progress and ranges is None else None
+    with open_input(input_file) as in_file, open_output(output_file, compression, append_at=previous['output_offset'] if previous else None) as out_file, \
+            open_output(dead_letter_file, append_at=previous.get('dead_letter_offset', 0) if previous else None) as dead_letter, \
+            (open_output(slow_log_file, append_at=previous.get('slow_log_offset') if previous else None) if slow_log_file is not None else contextlib.nullcontext()) as slow_log:
+        if ranges is not None:
+            summary = parse_ranges(input_file, ranges, out_file, input_format, output_format, sig_parser, verbose, fields, transform, passthrough, sig_field, chunk_size, workers, progress, dead_letter, os.path.dirname(os.path.abspath(output_file)), slow_log)
+        elif not (checkpoint or resume):
+            summary = parse_stream(in_file, out_file, input_format, output_format, sig_parser, verbose, fields, transform, passthrough, sig_field, chunk_size, workers, row_total, dead_letter=dead_letter, slow_log=slow_log)
+        else:
+            # lines are read from the binary stream under the text stream, to keep track of byte offsets
+            lines = LineReader(in_file.buffer)
+            if previous:
+                skip_bytes(in_file.buffer, previous['input_offset'])
+                lines.offset = previous['input_offset']
+            def on_chunk(rows, input_offset):
+                for f in (out_file, dead_letter) + ((slow_log,) if slow_log is not None else ()):
+                    f.flush()
+                    os.fsync(f.buffer.fileno())
+                checkpoint_values = {'input_file': os.path.abspath(input_file), 'rows': rows, 'input_offset': input_offset, 'output_offset': out_file.buffer.tell(), 'dead_letter_offset': dead_letter.buffer.tell()}
+                if slow_log is not None:
+                    checkpoint_values['slow_log_offset'] = slow_log.buffer.tell()
+                write_checkpoint(checkpoint_file, checkpoint_values)
+            summary = parse_stream(lines, out_file, input_format, output_format, sig_parser, verbose, fields, transform, passthrough, sig_field, chunk_size, workers, row_total, on_chunk, previous['rows'] if previous else 0, previous is None, dead_letter, slow_log)
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+    # errors from before a resume are still in the dead letter file, so they're counted from it
+    if os.path.getsize(dead_letter_file):
+        with open(dead_letter_file, encoding='utf-8') as f:
+            summary['errors'] = sum(1 for line in f)
+        summary['dead_letter_file'] = dead_letter_file
+    else:
+        os.remove(dead_letter_file)
+        summary['dead_letter_file'] = None
+    if slow_log_file is not None:
+        if os.path.getsize(slow_log_file):
+            with open(slow_log_file, encoding='utf-8') as f:
+                summary['slow'] = sum(1 for line in f)
+            summary['slow_log_file'] = slow_log_file
+        else:
+            os.remove(slow_log_file)
+            summary['slow_log_file'] = None
+    return summary
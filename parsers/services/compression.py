@@ -0,0 +1,173 @@
+import gzip
+import io
+import os
+import queue
+import threading
+
+# transparent gzip / zstd for bulk input and output
+# compressed input is detected by its magic bytes (so a misnamed file still works), and output is compressed by
+# file extension or by asking for it explicitly
+# decompression runs on a background thread that reads ahead into a bounded queue, so it overlaps with parsing
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.zst': 'zstd',
+}
+MAGIC_BYTES = {
+    'gzip': b'\x1f\x8b',
+    'zstd': b'\x28\xb5\x2f\xfd',
+}
+# bytes per read on the read ahead thread, and how many reads can be queued up
+READ_AHEAD_SIZE = 1 << 20
+READ_AHEAD_BLOCKS = 8
+
+# input.csv.gz -> ('input.csv', 'gzip')
+def split_compression(file_name):
+    base, extension = os.path.splitext(file_name)
+    if extension.lower() in COMPRESSION_EXTENSIONS:
+        return base, COMPRESSION_EXTENSIONS[extension.lower()]
+    return file_name, None
+
+def get_compression(binary_stream):
+    head = binary_stream.peek(4)[:4]
+    for compression, magic in MAGIC_BYTES.items():
+        if head.startswith(magic):
+            return compression
+    return None
+
+def check_compression(compression):
+    if compression not in (None, 'gzip', 'zstd'):
+        raise ValueError('unsupported compression: ' + str(compression) + ' (expected gzip or zstd)')
+    if compression == 'zstd' and zstandard is None:
+        raise ValueError('zstd compression needs the zstandard package (pip install zstandard)')
+
+# GzipFile only closes files it opened itself - this also closes the stream it wraps
+class GzipStream(gzip.GzipFile):
+    def __init__(self, stream, mode):
+        super().__init__(fileobj=stream, mode=mode)
+        self.stream = stream
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self.stream.close()
+
+# a binary output stream that's flushed but left open when closed (i.e. stdout, which has to be closed to finish
+# writing a gzip / zstd stream)
+class UnclosedStream(io.BufferedIOBase):
+    def __init__(self, stream):
+        self.stream = stream
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.stream.write(data)
+
+    def flush(self):
+        if not self.closed:
+            self.stream.flush()
+
+# reads from source on a background thread, READ_AHEAD_SIZE bytes at a time
+class ReadAheadReader(io.RawIOBase):
+    def __init__(self, source):
+        self.source = source
+        self.blocks = queue.Queue(READ_AHEAD_BLOCKS)
+        self.block = b''
+        self.done = False
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.read_ahead, daemon=True)
+        self.thread.start()
+
+    def read_ahead(self):
+        try:
+            while not self.stopped.is_set():
+                block = self.source.read(READ_AHEAD_SIZE)
+                self.put(block)
+                if not block:
+                    break
+        except Exception as e:
+            # raised again on the reading thread
+            self.put(e)
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.blocks.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if not self.block and not self.done:
+            block = self.blocks.get()
+            if isinstance(block, Exception):
+                raise block
+            if not block:
+                self.done = True
+            self.block = block
+        size = min(len(buffer), len(self.block))
+        buffer[:size] = self.block[:size]
+        self.block = self.block[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            self.stopped.set()
+            self.thread.join()
+            self.source.close()
+        super().close()
+
+def get_decompressed(binary_stream, compression):
+    if compression == 'gzip':
+        return GzipStream(binary_stream, 'rb')
+    return zstandard.ZstdDecompressor().stream_reader(binary_stream, read_across_frames=True)
+
+# text stream for a binary stream that may be compressed
+def open_text_input(binary_stream):
+    if not hasattr(binary_stream, 'peek'):
+        binary_stream = io.BufferedReader(binary_stream)
+    compression = get_compression(binary_stream)
+    check_compression(compression)
+    if compression is not None:
+        binary_stream = io.BufferedReader(ReadAheadReader(get_decompressed(binary_stream, compression)), READ_AHEAD_SIZE)
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+def open_input(file_name):
+    return open_text_input(open(file_name, 'rb'))
+
+# text stream for writing to a binary stream, compressed if compression is gzip / zstd
+# closefd=False leaves binary_stream open when the text stream is closed
+def open_text_output(binary_stream, compression=None, closefd=True):
+    check_compression(compression)
+    if not closefd:
+        binary_stream = UnclosedStream(binary_stream)
+    if compression == 'gzip':
+        binary_stream = GzipStream(binary_stream, 'wb')
+    elif compression == 'zstd':
+        binary_stream = zstandard.ZstdCompressor().stream_writer(binary_stream)
+    return io.TextIOWrapper(binary_stream, encoding='utf-8', newline='')
+
+# compression defaults to the file extension (i.e. output.ndjson.gz)
+# append_at truncates an existing (uncompressed) file to that byte offset and appends to it
+def open_output(file_name, compression=None, append_at=None):
+    if compression is None:
+        compression = split_compression(file_name)[1]
+    check_compression(compression)
+    if append_at is None:
+        return open_text_output(open(file_name, 'wb'), compression)
+    if compression is not None:
+        raise ValueError('compressed output can\'t be appended to')
+    binary_stream = open(file_name, 'r+b')
+    binary_stream.truncate(append_at)
+    binary_stream.seek(append_at)
+    return open_text_output(binary_stream)
@@ -0,0 +1,230 @@
+import re
+from .normalize import DAY_OF_WEEK, get_normalized
+from .bulk import CHUNK_SIZE, SIG_FIELD, parse_file
+
+# FHIR R4 Dosage for a parsed sig - https://www.hl7.org/fhir/dosage.html
+# get_dosage takes the verbose match dict from SigParser.parse(sig_text, verbose=True)
+# the frequency parsers already produce FHIR Timing shaped fields, so most of this is renaming
+
+UCUM_SYSTEM = 'http://unitsofmeasure.org'
+
+# https://www.hl7.org/fhir/valueset-units-of-time.html
+UNITS_OF_TIME = {
+    'second': 's',
+    'minute': 'min',
+    'hour': 'h',
+    'day': 'd',
+    'week': 'wk',
+    'month': 'mo',
+    'year': 'a',
+}
+
+# https://www.hl7.org/fhir/valueset-days-of-week.html
+DAYS_OF_WEEK = {
+    'monday': 'mon',
+    'tuesday': 'tue',
+    'wednesday': 'wed',
+    'thursday': 'thu',
+    'friday': 'fri',
+    'saturday': 'sat',
+    'sunday': 'sun',
+}
+
+# https://www.hl7.org/fhir/valueset-event-timing.html
+# NOTE: when values without a code (i.e. before transfusion) are left in the dosage text
+EVENT_TIMING = {
+    'in the morning': ['MORN'],
+    'in the morning with breakfast': ['CM'],
+    'in the afternoon': ['AFT'],
+    'in the evening at bedtime': ['HS'],
+    'in the evening': ['EVE'],
+    'at night': ['NIGHT'],
+    'at bedtime': ['HS'],
+    'with meal': ['C'],
+    'with breakfast and lunch': ['CM', 'CD'],
+    'with breakfast and dinner': ['CM', 'CV'],
+    'with breakfast': ['CM'],
+    'with lunch': ['CD'],
+    'with dinner': ['CV'],
+    'before meal': ['AC'],
+    'before breakfast': ['ACM'],
+    'before lunch': ['ACD'],
+    'before dinner': ['ACV'],
+    'after meal': ['PC'],
+    'after breakfast and dinner': ['PCM', 'PCV'],
+    'after breakfast': ['PCM'],
+    'after lunch': ['PCD'],
+    'after dinner': ['PCV'],
+    'while awake': ['WAKE'],
+    'before each meal and at bedtime': ['AC', 'HS'],
+}
+
+# UCUM codes for strength units
+UCUM_UNITS = {
+    'mg': 'mg',
+    'mcg': 'ug',
+    'g': 'g',
+    'mL': 'mL',
+    'L': 'L',
+    'international unit': '[iU]',
+    'unit': '[U]',
+    'mEq': 'meq',
+}
+
+RE_DAY_OF_WEEK_SEPARATOR = re.compile(r'[^a-z]+|\band\b', flags = re.I)
+
+def get_quantity(value, unit=None, ucum=False):
+    quantity = {'value': value}
+    if unit:
+        quantity['unit'] = unit
+        if ucum and unit in UCUM_UNITS:
+            quantity['system'] = UCUM_SYSTEM
+            quantity['code'] = UCUM_UNITS[unit]
+    return quantity
+
+def get_duration(value, unit):
+    duration = {'value': value}
+    if unit in UNITS_OF_TIME:
+        duration.update({'unit': unit, 'system': UCUM_SYSTEM, 'code': UNITS_OF_TIME[unit]})
+    return duration
+
+# monday wednesdays and fridays -> ['mon', 'wed', 'fri']
+def get_days_of_week(day_of_week):
+    days = []
+    for word in RE_DAY_OF_WEEK_SEPARATOR.split(day_of_week.lower()):
+        if word == 'mwf':
+            names = ['monday', 'wednesday', 'friday']
+        else:
+            names = [get_normalized(DAY_OF_WEEK, word)] if word else []
+        for name in names:
+            if name in DAYS_OF_WEEK and DAYS_OF_WEEK[name] not in days:
+                days.append(DAYS_OF_WEEK[name])
+    return days
+
+def get_timing(match_dict):
+    repeat = {}
+    for key, fhir_key in (('frequency', 'frequency'), ('frequency_max', 'frequencyMax'), ('period', 'period'), ('period_max', 'periodMax'), ('count', 'count'), ('offset', 'offset')):
+        if match_dict.get(key) is not None:
+            repeat[fhir_key] = match_dict[key]
+    if 'period' in repeat and match_dict.get('period_unit') in UNITS_OF_TIME:
+        repeat['periodUnit'] = UNITS_OF_TIME[match_dict['period_unit']]
+    # time_duration is how long each administration lasts (i.e. "over 2 hours")
+    if match_dict.get('time_duration') is not None and match_dict.get('time_duration_unit') in UNITS_OF_TIME:
+        repeat['duration'] = match_dict['time_duration']
+        repeat['durationUnit'] = UNITS_OF_TIME[match_dict['time_duration_unit']]
+    # duration is how long the medication is taken for (i.e. "for 7-10 days")
+    if match_dict.get('duration') is not None:
+        if match_dict.get('duration_max') is not None:
+            repeat['boundsRange'] = {'low': get_duration(match_dict['duration'], match_dict.get('duration_unit')), 'high': get_duration(match_dict['duration_max'], match_dict.get('duration_unit'))}
+        else:
+            repeat['boundsDuration'] = get_duration(match_dict['duration'], match_dict.get('duration_unit'))
+    if match_dict.get('day_of_week'):
+        days = get_days_of_week(match_dict['day_of_week'])
+        if days:
+            repeat['dayOfWeek'] = days
+    if match_dict.get('time_of_day'):
+        repeat['timeOfDay'] = match_dict['time_of_day'].split('|')
+    if match_dict.get('when') in EVENT_TIMING:
+        repeat['when'] = EVENT_TIMING[match_dict['when']]
+    return {'repeat': repeat} if repeat else None
+
+def get_dose_and_rate(match_dict):
+    # strength is used as the dose when there's no dose (i.e. "take 500 mg")
+    if match_dict.get('dose') is not None:
+        value, value_max, unit, ucum = match_dict['dose'], match_dict.get('dose_max'), match_dict.get('dose_unit'), False
+    elif match_dict.get('strength') is not None:
+        value, value_max, unit, ucum = match_dict['strength'], match_dict.get('strength_max'), match_dict.get('strength_unit'), True
+    else:
+        return None
+    if value_max is not None:
+        return [{'doseRange': {'low': get_quantity(value, unit, ucum), 'high': get_quantity(value_max, unit, ucum)}}]
+    return [{'doseQuantity': get_quantity(value, unit, ucum)}]
+
+def get_max_dose_per_period(match_dict):
+    if match_dict.get('max_numerator_value') is None or match_dict.get('max_denominator_value') is None:
+        return None
+    unit = match_dict.get('max_numerator_unit') or match_dict.get('dose_unit')
+    return {
+        'numerator': get_quantity(match_dict['max_numerator_value'], unit, unit in UCUM_UNITS),
+        'denominator': get_duration(match_dict['max_denominator_value'], match_dict.get('max_denominator_unit')),
+    }
+
+# the sig as it was written if it's there (see bulk.parse_chunk), otherwise the normalized sig
+def get_text(match_dict):
+    return match_dict.get('original_sig_text') or match_dict.get('sig_text')
+
+# (dose, frequency) pairs of a compound sig (i.e. "take 1 tab in the morning and 2 tabs at bedtime") as match dicts
+# with the dose fields from mdd_components and the timing fields from pair_frequencies - see SigParser.get_mdd_components
+# NOTE: the mdd_components frequencies have the days of week folded in (i.e. 3/7 a day for monday wednesday friday),
+# so the timing comes from pair_frequencies, which has each pair's frequency as written and its days of week
+def get_pairs(match_dict):
+    components = match_dict.get('mdd_components') or {}
+    pairs = []
+    for (dose, dose_max, dose_unit, *_), pair_frequency in zip(components.get('pairs') or [], match_dict.get('pair_frequencies') or []):
+        # a strength is only used as the dose when there's no dose (see get_dose_and_rate)
+        dose_keys = ('strength', 'strength_max', 'strength_unit') if components.get('ignore_exclusion') else ('dose', 'dose_max', 'dose_unit')
+        pair = dict(zip(dose_keys, (dose, dose_max, dose_unit)))
+        pair.update(pair_frequency)
+        pairs.append(pair)
+    return pairs
+
+# the Dosages for a sig - a list, like MedicationRequest.dosageInstruction
+# a compound sig gets one Dosage per (dose, frequency) pair, each with its own dose and timing, and the same sequence
+# since they're taken at the same time (Dosages with the same sequence are concurrent) - the rest of the sig (route,
+# as needed, duration, ...) is in each of them
+def get_dosage_instruction(match_dict):
+    pairs = get_pairs(match_dict) if match_dict.get('Is_Sig_Parsable', True) else []
+    if len(pairs) < 2:
+        return [get_dosage(match_dict)]
+    dosages = []
+    for pair in pairs:
+        dosage = get_dosage(match_dict, pair)
+        dosage['sequence'] = 1
+        dosages.append(dosage)
+    return dosages
+
+# the fields get_timing uses for one pair of a compound sig - the pair's frequency, days of week and when, and the
+# duration of the whole sig
+def get_pair_timing_dict(match_dict, pair):
+    timing_dict = {k: match_dict.get(k) for k in ('duration', 'duration_max', 'duration_unit', 'time_duration', 'time_duration_unit')}
+    timing_dict.update(pair)
+    return timing_dict
+
+# unparsable sigs only get the sig text, the same way the non-verbose output nulls everything but sig_text
+# a compound sig can't be one Dosage, so it only gets the text too - see get_dosage_instruction
+# pair is one of get_pairs(match_dict), for the dose and timing of one Dosage of a compound sig
+def get_dosage(match_dict, pair=None):
+    dosage = {'text': get_text(match_dict)}
+    if not match_dict.get('Is_Sig_Parsable', True):
+        return dosage
+    if pair is None and len(get_pairs(match_dict)) > 1:
+        return dosage
+    if match_dict.get('sig_readable'):
+        dosage['patientInstruction'] = match_dict['sig_readable']
+    if match_dict.get('additional_info'):
+        dosage['additionalInstruction'] = [{'text': match_dict['additional_info']}]
+    timing = get_timing(match_dict if pair is None else get_pair_timing_dict(match_dict, pair))
+    if timing:
+        dosage['timing'] = timing
+    # NOTE: Dosage has nowhere to put a chronic indication (as_needed is false), so that stays in the text
+    if match_dict.get('as_needed') and match_dict.get('indication'):
+        dosage['asNeededCodeableConcept'] = {'text': match_dict['indication']}
+    elif match_dict.get('as_needed'):
+        dosage['asNeededBoolean'] = True
+    if match_dict.get('route'):
+        dosage['route'] = {'text': match_dict['route']}
+    if match_dict.get('method'):
+        dosage['method'] = {'text': match_dict['method']}
+    dose_and_rate = get_dose_and_rate(match_dict if pair is None else pair)
+    if dose_and_rate:
+        dosage['doseAndRate'] = dose_and_rate
+    max_dose_per_period = get_max_dose_per_period(match_dict)
+    if max_dose_per_period:
+        dosage['maxDosePerPeriod'] = max_dose_per_period
+    return dosage
+
+# streams a csv / ndjson file of sigs to an NDJSON file with the list of Dosages for each input row (see
+# get_dosage_instruction), in input order
+# workers > 0 parses in that many processes
+def export_dosage_ndjson(input_file, output_file, sig_parser=None, sig_field=SIG_FIELD, chunk_size=CHUNK_SIZE, workers=0, progress=True, compression=None, checkpoint=False, resume=False, dead_letter_file=None, slow_log_file=None):
+    return parse_file(input_file, output_file, sig_parser, verbose=True, transform=get_dosage_instruction, passthrough=False, sig_field=sig_field, chunk_size=chunk_size, workers=workers, progress=progress, compression=compression, checkpoint=checkpoint, resume=resume, dead_letter_file=dead_letter_file, slow_log_file=slow_log_file)
@@ -0,0 +1,128 @@
+import importlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# measures what importing the parsers costs, module by module - wall time, memory allocated, and the number and size
+# of the compiled patterns each module ends up with - so new dictionary entries / patterns that slow down cold starts
+# show up (i.e. in CI, by comparing the JSON from profile_imports / advanced_sig_parser.py --profile-imports)
+#
+# each run is a fresh python process (the parsers can only be imported once per process), importing the modules in
+# PROFILE_STEPS order - a module's dependencies are always earlier in the list, so each step is only that module's own
+# cost. timing and memory are measured in separate runs, since tracing allocations slows the imports down
+
+PROFILE_STEPS = [
+    'parsers.services.normalize',
+    'parsers.services.infer',
+    # infer.py reads its csv tables on first use
+    'parsers.services.infer:tables',
+    'parsers.classes.parser',
+    'parsers.method',
+    'parsers.route',
+    'parsers.frequency',
+    'parsers.dose',
+    'parsers.strength',
+    'parsers.when',
+    'parsers.duration',
+    'parsers.indication',
+    'parsers.max',
+    'parsers.additional_info',
+    'parsers.sig',
+    'parsers.sig:SigParser',
+]
+
+def run_step(step):
+    module_name, _, action = step.partition(':')
+    module = importlib.import_module(module_name)
+    if action == 'tables':
+        for file_name in ('package_ndc_to_dose_form_rxcui', 'product_rxcui_to_dose_form_rxcui', 'dose_form_rxcui_to_method_dose_unit_and_route'):
+            module.get_csv_table(file_name)
+    elif action == 'SigParser':
+        module.SigParser()
+    return module
+
+# compiled patterns a module holds - module level ones, and the patterns of its parsers
+def get_patterns(module):
+    patterns = {}
+    for value in list(vars(module).values()):
+        if isinstance(value, re.Pattern):
+            patterns[id(value)] = value
+    for parser in getattr(module, 'parsers', None) or []:
+        if isinstance(getattr(parser, 'pattern', None), re.Pattern):
+            patterns[id(parser.pattern)] = parser.pattern
+    return list(patterns.values())
+
+# runs in the profiling process - returns a dict per step
+def measure_steps(steps=None, memory=False):
+    if memory:
+        tracemalloc.start()
+    results = []
+    # patterns are only counted for the first module that has them, since modules star import each other's
+    seen_patterns = set()
+    for step in steps or PROFILE_STEPS:
+        if memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        module = run_step(step)
+        seconds = time.perf_counter() - start
+        result = {'step': step, 'seconds': seconds}
+        if memory:
+            current, peak = tracemalloc.get_traced_memory()
+            result['allocated_bytes'] = current - before
+            result['peak_bytes'] = peak - before
+        elif ':' not in step:
+            patterns = [pattern for pattern in get_patterns(module) if id(pattern) not in seen_patterns]
+            seen_patterns.update(id(pattern) for pattern in patterns)
+            result['patterns'] = len(patterns)
+            result['pattern_bytes'] = sum(sys.getsizeof(pattern) for pattern in patterns)
+            result['parsers'] = len(getattr(module, 'parsers', None) or [])
+        results.append(result)
+    return results
+
+# snapshot_dir is where the pattern snapshot goes, or '' to turn it off (see snapshot.py)
+def run_profile_process(steps, memory, snapshot_dir):
+    env = dict(os.environ)
+    env['SIG_PARSER_SNAPSHOT_DIR'] = snapshot_dir
+    # the parsers read their csv tables relative to the project directory
+    project_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    command = [sys.executable, '-m', 'parsers.services.import_profile'] + (['--memory'] if memory else []) + list(steps)
+    output = subprocess.run(command, cwd=project_dir, env=env, stdout=subprocess.PIPE, check=True).stdout
+    return json.loads(output)
+
+# profiles the imports - the fastest of repeat timing runs, and one memory run
+# steps defaults to PROFILE_STEPS - a different list has to keep dependencies before the modules that import them
+# snapshot=False turns the pattern snapshot off (see snapshot.py), so it's the cost of a cold start with nothing cached
+# snapshot=True imports once first, so the snapshot is there, and then measures with it - the snapshot goes in a
+# temporary directory that's removed afterwards
+def profile_imports(repeat=3, snapshot=False, steps=None):
+    steps = steps or PROFILE_STEPS
+    with tempfile.TemporaryDirectory() as temp_dir:
+        snapshot_dir = os.path.join(temp_dir, 'snapshot') if snapshot else ''
+        if snapshot:
+            run_profile_process(steps, False, snapshot_dir)
+        runs = [run_profile_process(steps, False, snapshot_dir) for i in range(max(repeat, 1))]
+        memory_run = run_profile_process(steps, True, snapshot_dir)
+    results = []
+    for i, result in enumerate(runs[0]):
+        result = dict(result)
+        result['seconds'] = round(min(run[i]['seconds'] for run in runs), 6)
+        result['allocated_bytes'] = memory_run[i]['allocated_bytes']
+        result['peak_bytes'] = memory_run[i]['peak_bytes']
+        results.append(result)
+    return {
+        'python': '%d.%d.%d' % sys.version_info[:3],
+        'snapshot': snapshot,
+        'repeat': max(repeat, 1),
+        'seconds': round(sum(result['seconds'] for result in results), 6),
+        'allocated_bytes': sum(result['allocated_bytes'] for result in results),
+        'steps': results,
+    }
+
+if __name__ == '__main__':
+    json.dump(measure_steps([arg for arg in sys.argv[1:] if arg != '--memory'], memory='--memory' in sys.argv), sys.stdout)
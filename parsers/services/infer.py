@@ -11,23 +11,28 @@ def csv_to_dict_list(file_name):
             csv_dict_list.append(row)
     return csv_dict_list
 
-PACKAGE_NDC_TO_DOSE_FORM_RXCUI = csv_to_dict_list('package_ndc_to_dose_form_rxcui')
-PRODUCT_RXCUI_TO_DOSE_FORM_RXCUI = csv_to_dict_list('product_rxcui_to_dose_form_rxcui')
-DOSE_FORM_RXCUI_TO_METHOD_DOSE_UNIT_AND_ROUTE = csv_to_dict_list('dose_form_rxcui_to_method_dose_unit_and_route')
+# the csv files are only read the first time they're needed, since most runs never infer anything
+# (reading them was a good part of the time it took to import the parsers)
+csv_tables = {}
+
+def get_csv_table(file_name):
+    if file_name not in csv_tables:
+        csv_tables[file_name] = csv_to_dict_list(file_name)
+    return csv_tables[file_name]
 
 def product_id_to_dose_form_rxcui(ndc=None, rxcui=None):
     if ndc:
-        result = [df for df in PACKAGE_NDC_TO_DOSE_FORM_RXCUI if df['ndc'] == ndc]
+        result = [df for df in get_csv_table('package_ndc_to_dose_form_rxcui') if df['ndc'] == ndc]
         if len(result) > 0:
             return result[0]['dose_form_rxcui']
     elif rxcui:
-        result = [r for r in PRODUCT_RXCUI_TO_DOSE_FORM_RXCUI if r['clinical_product_rxcui'] == rxcui]
+        result = [r for r in get_csv_table('product_rxcui_to_dose_form_rxcui') if r['clinical_product_rxcui'] == rxcui]
         if len(result) > 0:
             return result[0]['dose_form_rxcui']
 
 def dose_form_rxcui_to_sig_element(dose_form_rxcui, sig_element):
     if sig_element in ('method', 'dose_unit', 'route'):
-        result = [r for r in DOSE_FORM_RXCUI_TO_METHOD_DOSE_UNIT_AND_ROUTE if r['dose_form_rxcui'] == dose_form_rxcui]
+        result = [r for r in get_csv_table('dose_form_rxcui_to_method_dose_unit_and_route') if r['dose_form_rxcui'] == dose_form_rxcui]
         if len(result) > 0 and result[0][sig_element] != '':
             return result[0][sig_element]
 
@@ -0,0 +1,67 @@
+import collections
+import re
+from .normalize import RE_WRITTEN_NUMBERS
+
+# one pass over a sig that normalizes it and splits it into typed tokens with character offsets
+# the component parsers still run their own patterns, but the tokens let SigParser skip parsers that can't
+# match, and give the guardrails / template cache one place to find the numbers in a sig
+
+Token = collections.namedtuple('Token', ['kind', 'text', 'start', 'end'])
+
+# token kinds that contain a number
+NUMBER_KINDS = ('NUMBER', 'RANGE', 'TIME')
+
+# removes:
+# . if not bordered by a number (i.e. don't want to convert 2.5 to 25 or 0.5 to 05)
+# : if not bordered by a number (i.e. not 5:00 or 1:10000)
+# , ; # * " ' ( ) \t [ ] :
+# and replaces @ with at
+RE_PUNCTUATION = re.compile(r'(?:(?<![0-9])\.(?![0-9])|,|;|#|\*|\"|\'|\(|\)|\t|\[|\]|(?<![0-9]):(?![0-9])|@)')
+
+# rewrites that need to happen before parsing, in order of precedence when they overlap
+# "one and a half" -> 1.5
+# typo "tablet1" -> "tablet 1"
+# typo "half a day" -> "0.5 tablet" (likely OCR error for half a tab)
+RE_REWRITES = re.compile(r'(?P<one_and_a_half>\bone\s+and\s+a\s+half\b)|(?P<dose_unit_number>(?:tablet|capsule|pill)\d+)|(?P<half_a_day>\bhalf\s+a\s+day\b)', flags = re.I)
+
+TOKEN_PATTERN = re.compile(
+    r'(?P<TIME>\d{1,2}:\d{2}(?:\s?(?:am|pm|a|p)\b)?|\d{1,2}\s?(?:am|pm|a|p)\b)'
+    r'|(?P<RANGE>(?:\d*[./])?\d+\s*(?:-|to)\s*(?:\d*[./])?\d+)'
+    r'|(?P<NUMBER>(?:\d*[./])?\d+|\b(?:' + RE_WRITTEN_NUMBERS + r')\b)'
+    r'|(?P<DAY>\b(?:mondays?|tuesdays?|wednesdays?|thursdays?|fridays?|saturdays?|sundays?|mon|tues?|wed|thu(?:rs?)?|fri|sat|sun|mwf)\b)'
+    r'|(?P<WORD>[a-z]+)'
+    r'|(?P<PUNCT>\S)', flags = re.I)
+
+RE_DIGITS = re.compile(r'\d+')
+
+def replace_punctuation(match):
+    return ' at ' if match[0] == '@' else ''
+
+def replace_rewrite(match):
+    if match.group('one_and_a_half'):
+        return '1.5'
+    if match.group('dose_unit_number'):
+        return re.sub(r'(tablet|capsule|pill)(\d+)', r'\1 \2', match[0], flags = re.I)
+    return '0.5 tablet'
+
+# lower case, remove punctuation and extra white space, and apply the rewrites above
+def normalize_sig_text(sig_text):
+    sig_text = RE_PUNCTUATION.sub(replace_punctuation, sig_text.lower())
+    sig_text = ' '.join(sig_text.split())
+    return RE_REWRITES.sub(replace_rewrite, sig_text)
+
+# splits a normalized sig into tokens - every digit in the sig ends up in a NUMBER / RANGE / TIME token
+def tokenize(sig_text):
+    return [Token(match.lastgroup, match[0], match.start(), match.end()) for match in TOKEN_PATTERN.finditer(sig_text)]
+
+def has_digits(tokens):
+    return any(token.kind in NUMBER_KINDS and RE_DIGITS.search(token.text) for token in tokens)
+
+# (start, end) of every run of digits in the sig
+def get_digit_spans(tokens):
+    spans = []
+    for token in tokens:
+        if token.kind in NUMBER_KINDS:
+            for match in RE_DIGITS.finditer(token.text):
+                spans.append((token.start + match.start(), token.start + match.end()))
+    return spans
@@ -0,0 +1,194 @@
+from .normalize import EXCLUDED_MDD_DOSE_UNITS
+
+# max dose per day (MDD) calculation
+# SigParser.get_mdd_components pulls everything the calculation needs out of a parsed sig, and the functions below
+# turn those components into max_dose_per_day - either one sig at a time, or a whole batch at once on numpy columns
+# the components are plain lists / dicts, so they can be stored with the parsed sigs and used to recalculate MDD
+# (i.e. when EXCLUDED_MDD_DOSE_UNITS changes) without parsing the sigs again
+#
+# components:
+#   ambiguous        - True if the doses / frequencies are separated by an "or" (MDD is None)
+#   pairs            - [dose, dose_max, dose_unit, frequency, frequency_max, period, period_unit] for each
+#                      dose / frequency pair in a compound sig ("1 tablet in the morning and 2 at night")
+#   ignore_exclusion - True if the pairs use strengths as doses (excluded dose units don't apply)
+#   fallback         - same as a pair, from the sig's primary dose and frequency (used if the pairs don't add up)
+#   max              - [max_numerator_value, max_denominator_value, max_denominator_unit] from the max parser
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# numerator / multiplier for period per day (i.e. every 2 weeks -> 1 / (7 * 2))
+PERIOD_PER_DAY = {
+    'hour': (24, 1),
+    'day': (1, 1),
+    'week': (1, 7),
+    'month': (1, 30),
+}
+
+def get_period_per_day(period, period_unit):
+    if not period:
+        return None
+    if period_unit == 'hour':
+        return 24 / period
+    elif period_unit == 'day':
+        return 1 / period
+    elif period_unit == 'week':
+        return 1 / (7 * period)
+    elif period_unit == 'month':
+        return 1 / (30 * period)
+    else:
+        return None
+
+# max dose per day for a single dose / frequency pair
+def calculate_component(component, excluded_dose_units=EXCLUDED_MDD_DOSE_UNITS, ignore_exclusion=False):
+    dose, dose_max, dose_unit, frequency, frequency_max, period, period_unit = component
+    frequency = frequency_max or frequency
+    period_per_day = get_period_per_day(period, period_unit)
+    dose = dose_max or dose
+    if not ignore_exclusion and dose_unit in excluded_dose_units:
+        return None
+    if frequency and period_per_day and dose:
+        return frequency * period_per_day * dose
+    return None
+
+# max dose per day from an explicit max (i.e. "max 4 tablets per day")
+def calculate_explicit_max(max_component):
+    dose_max, period_max, period_unit_max = max_component
+    frequency_max = 1
+    period_per_day_max = get_period_per_day(period_max, period_unit_max)
+    if frequency_max and period_per_day_max and dose_max:
+        return frequency_max * period_per_day_max * dose_max
+    return None
+
+def calculate_max_dose_per_day(components, excluded_dose_units=EXCLUDED_MDD_DOSE_UNITS):
+    if components['ambiguous']:
+        return None
+    calculated_max_dose = None
+    if components['pairs']:
+        total = 0
+        for pair in components['pairs']:
+            value = calculate_component(pair, excluded_dose_units, components['ignore_exclusion'])
+            if value is None:
+                total = None
+                break
+            total += value
+        calculated_max_dose = total
+    # fall back to the primary dose / frequency if the pairs didn't add up
+    if calculated_max_dose is None:
+        calculated_max_dose = calculate_component(components['fallback'], excluded_dose_units)
+    # an explicit max always takes precedence
+    max_constraint = calculate_explicit_max(components['max'])
+    return max_constraint or calculated_max_dose
+
+# same as calculate_max_dose_per_day for a list of components
+# NOTE: this is one sig at a time - turning the components into numpy columns takes longer than the calculation
+# itself, so the columns are only worth it when they're kept and recalculated (see get_mdd_columns)
+def calculate_max_doses_per_day(components_list, excluded_dose_units=EXCLUDED_MDD_DOSE_UNITS):
+    return [calculate_max_dose_per_day(components, excluded_dose_units) for components in components_list]
+
+# batch MDD on numpy columns (needs numpy - get_mdd_columns and calculate_max_doses_per_day_columns raise an
+# ImportError without it)
+# the columns are built once from a list of components, and kept (i.e. np.savez along with the parsed sigs), and
+# calculate_max_doses_per_day_columns recalculates MDD for all of them on whole arrays - i.e. each time the excluded
+# dose units change, with the same rules as calculate_max_dose_per_day
+# a dict of arrays:
+#   ambiguous / ignore_exclusion                          - one bool per sig
+#   pair_sig                                              - the index of the sig each pair came from
+#   dose / dose_max / frequency / frequency_max / period  - one float per pair (nan for None)
+#   dose_unit / period_unit                               - one str per pair ('' for None)
+#   fallback_dose, fallback_dose_max, ...                 - the same for each sig's fallback
+#   max_dose / max_period / max_period_unit               - the explicit max of each sig
+# NOTE: this is the only per-sig loop - building the lists the arrays come from
+def get_mdd_columns(components_list):
+    if np is None:
+        raise ImportError('get_mdd_columns needs numpy (pip install numpy)')
+    pairs = [pair for components in components_list for pair in components['pairs']]
+    columns = {
+        'ambiguous': np.array([bool(components['ambiguous']) for components in components_list], dtype=bool),
+        'ignore_exclusion': np.array([bool(components['ignore_exclusion']) for components in components_list], dtype=bool),
+        'pair_sig': np.repeat(np.arange(len(components_list), dtype=np.intp), [len(components['pairs']) for components in components_list]),
+    }
+    for prefix, rows in (('', pairs), ('fallback_', [components['fallback'] for components in components_list])):
+        rows = get_object_array(rows, 7)
+        for key, i in (('dose', 0), ('dose_max', 1), ('frequency', 3), ('frequency_max', 4), ('period', 5)):
+            columns[prefix + key] = get_float_column(rows[:, i])
+        for key, i in (('dose_unit', 2), ('period_unit', 6)):
+            columns[prefix + key] = get_str_column(rows[:, i])
+    rows = get_object_array([components['max'] for components in components_list], 3)
+    columns['max_dose'] = get_float_column(rows[:, 0])
+    columns['max_period'] = get_float_column(rows[:, 1])
+    columns['max_period_unit'] = get_str_column(rows[:, 2])
+    return columns
+
+# max_dose_per_day for every sig in columns (see get_mdd_columns), as a float array with nan for None
+# (get_max_dose_list turns it into calculate_max_doses_per_day's list)
+def calculate_max_doses_per_day_columns(columns, excluded_dose_units=EXCLUDED_MDD_DOSE_UNITS):
+    if np is None:
+        raise ImportError('calculate_max_doses_per_day_columns needs numpy (pip install numpy)')
+    n = len(columns['ambiguous'])
+    excluded_dose_units = list(excluded_dose_units)
+    pair_sig = columns['pair_sig']
+    pair_excluded = ~columns['ignore_exclusion'][pair_sig] & np.isin(columns['dose_unit'], excluded_dose_units)
+    pair_values = calculate_component_columns(columns['dose'], columns['dose_max'], columns['frequency'], columns['frequency_max'], columns['period'], columns['period_unit'], pair_excluded)
+    # np.add.at adds in order, so the sums come out the same as adding them up one by one
+    total = np.zeros(n)
+    np.add.at(total, pair_sig, pair_values)
+    pair_counts = np.bincount(pair_sig, minlength=n)
+    invalid_counts = np.bincount(pair_sig, weights=np.isnan(pair_values), minlength=n)
+    calculated = np.where((pair_counts > 0) & (invalid_counts == 0), total, np.nan)
+    # fall back to the primary dose / frequency if the pairs didn't add up
+    fallback_excluded = np.isin(columns['fallback_dose_unit'], excluded_dose_units)
+    fallback_values = calculate_component_columns(columns['fallback_dose'], columns['fallback_dose_max'], columns['fallback_frequency'], columns['fallback_frequency_max'], columns['fallback_period'], columns['fallback_period_unit'], fallback_excluded)
+    calculated = np.where(np.isnan(calculated), fallback_values, calculated)
+    # an explicit max always takes precedence
+    max_values = calculate_component_columns(columns['max_dose'], None, np.ones(n), None, columns['max_period'], columns['max_period_unit'], np.zeros(n, dtype=bool))
+    max_doses = np.where(is_truthy(max_values), max_values, calculated)
+    max_doses[columns['ambiguous']] = np.nan
+    return max_doses
+
+# max doses from calculate_max_doses_per_day_columns as a list, with None for nan
+def get_max_dose_list(max_doses):
+    return [None if max_dose != max_dose else max_dose for max_dose in max_doses.tolist()]
+
+# calculate_component on columns - dose_max / frequency_max can be None if there aren't any
+def calculate_component_columns(dose, dose_max, frequency, frequency_max, period, period_unit, excluded):
+    if frequency_max is not None:
+        frequency = np.where(is_truthy(frequency_max), frequency_max, frequency)
+    if dose_max is not None:
+        dose = np.where(is_truthy(dose_max), dose_max, dose)
+    period_per_day = get_period_per_day_columns(period, period_unit)
+    valid = is_truthy(frequency) & is_truthy(period_per_day) & is_truthy(dose) & ~excluded
+    with np.errstate(invalid='ignore', over='ignore'):
+        values = frequency * period_per_day * dose
+    return np.where(valid, values, np.nan)
+
+# get_period_per_day on columns, with nan for None
+def get_period_per_day_columns(period, period_unit):
+    numerator = np.full(len(period), np.nan)
+    multiplier = np.full(len(period), np.nan)
+    for unit, (unit_numerator, unit_multiplier) in PERIOD_PER_DAY.items():
+        is_unit = period_unit == unit
+        numerator[is_unit] = unit_numerator
+        multiplier[is_unit] = unit_multiplier
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        period_per_day = numerator / (multiplier * period)
+    return np.where(is_truthy(period), period_per_day, np.nan)
+
+# the numpy version of a python truth test on a number, with nan for None
+def is_truthy(values):
+    return ~np.isnan(values) & (values != 0)
+
+# rows (lists of width values) as a 2d object array - np.array would make a 1d array of lists out of no rows
+def get_object_array(rows, width):
+    array = np.empty((len(rows), width), dtype=object)
+    if rows:
+        array[:] = rows
+    return array
+
+def get_float_column(values):
+    return np.where(np.equal(values, None), np.nan, values).astype(float)
+
+def get_str_column(values):
+    return np.where(np.equal(values, None), '', values).astype(str)
@@ -1,6 +1,12 @@
 import collections
+import functools
 import re
 from fractions import Fraction
+try:
+  from re import _parser as sre_parse, _constants as sre_constants
+except ImportError:
+  # python < 3.11
+  import sre_parse, sre_constants
 
 RE_WRITTEN_NUMBERS = r'one(?:\s|-)?(?:quarter|half)|quarter|half|one point (?:one|two|three|four|five|six|seven|eight|nine)|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|thirteen|fourteen|fifteen|sixteen|seventeen|eighteen|nineteen|twenty(?:\s|-)?(?:one|two|three|four|five|six|seven|eight|nine)|twenty|thirty(?:\s|-)?five|thirty|forty|fifty'
 #one (?:and |& )one(?:-|\s)half| 
@@ -885,11 +891,40 @@ INDICATIONS = {
   'blood pressure': [],
 }
 
+# returns the character a pattern has to start with, or None if it can start with more than one (i.e. [ab]c, a?b, ab|cd)
+def get_first_char(pattern, flags=0):
+  try:
+    data = sre_parse.parse(pattern, flags)
+  except Exception:
+    return None
+  for op, av in data:
+    # \b, ^ etc. don't use up a character
+    if op is sre_constants.AT:
+      continue
+    return chr(av) if op is sre_constants.LITERAL else None
+  return None
+
+# matches the same as r'|'.join(patterns), but each pattern is only tried where the sig has the character it starts with
+# the patterns are grouped by their first character (keeping their order), so at each position of the sig only one
+# group is tried instead of every pattern - for long lists like INDICATIONS, where trying every pattern is slow
+# NOTE: patterns without a first character (see get_first_char) go in every group, so they can't have named groups
+def get_indexed_alternation(patterns, flags=0):
+  first_chars = [get_first_char(p, flags) for p in patterns]
+  if flags & re.I:
+    first_chars = [c.lower() if c is not None else None for c in first_chars]
+  groups = []
+  for key in dict.fromkeys(c for c in first_chars if c is not None):
+    groups.append('(?=' + re.escape(key) + ')(?:' + r'|'.join(p for p, c in zip(patterns, first_chars) if c is None or c == key) + ')')
+  unindexed = [p for p, c in zip(patterns, first_chars) if c is None]
+  if unindexed:
+    groups.append('(?:' + r'|'.join(unindexed) + ')')
+  return r'|'.join(groups)
+
 RE_INDICATION = []
 for n, p in INDICATIONS.items():
   p.append(n)
   RE_INDICATION.append(r'|'.join(p))        
-INDICATION_PATTERN = re.compile(r'(?P<indication>' + r'|'.join(RE_INDICATION) + r')', flags = re.I)
+INDICATION_PATTERN = re.compile(r'(?P<indication>' + get_indexed_alternation([v for p in INDICATIONS.values() for v in p], re.I) + r')', flags = re.I)
 
 ADDITIONAL_INFO = {
   # take
@@ -954,6 +989,8 @@ def split_frequency_range(text):
 # once IndicationParser returns a string of text following "as needed for", this tries to parse a specific indication
 # it first tries to find a pain-related indication, and then looks for more general indications
 # TODO: expand the pain-type search to blood glucose levels (i.e. prn BG > 120) and other specific types of indications
+# NOTE: cached since "as needed for x" is also matched as "for x" by ChronicIndicationParser, with the same text
+@functools.lru_cache(maxsize=1024)
 def get_indication(indication_text):
   indication = []
   if re.search(RE_BASIC_PAIN, indication_text) != None:
@@ -1022,7 +1059,27 @@ def number_text_to_int(textnum):
 # normalizes text using constant pattern groups
 # pattern groups are tuples with the following format:
 # (name, [pattern,...])
+# get_normalized results for each patterns dict, by text - only a few distinct texts (i.e. tab, tabs, tablet) come up,
+# and working them out means building and running a regex for each name in patterns, which doesn't fit in re's cache
+# NOTE: assumes a patterns dict doesn't change once it's been used (they're all filled in when the parsers are created)
+NORMALIZED_CACHE_SIZE = 10000
+normalized_cache = {}
+# cache miss marker, so a None result is cached too
+MISSING = object()
+
 def get_normalized(patterns, text):
+  # keyed on id, with the dict kept alongside so the id can't be reused by another dict
+  cache = normalized_cache.get(id(patterns))
+  if cache is None or cache[0] is not patterns:
+    cache = normalized_cache[id(patterns)] = (patterns, {})
+  normalized = cache[1].get(text, MISSING)
+  if normalized is MISSING:
+    if len(cache[1]) >= NORMALIZED_CACHE_SIZE:
+      cache[1].clear()
+    normalized = cache[1][text] = get_normalized_text(patterns, text)
+  return normalized
+
+def get_normalized_text(patterns, text):
   # trim whitespace from beginning and end of string
   normalized = text.strip()
   for n, p in patterns.items():
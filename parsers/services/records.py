@@ -0,0 +1,303 @@
+import array
+from multiprocessing import shared_memory
+
+# compact, fixed schema records for non-verbose parse results (SigParser.OUTPUT_KEYS, or a subset of them)
+# ResultRecords keeps each field in its own typed column instead of a dict per sig, which takes a fraction of the
+# memory for large batches (see SigParser.parse_records) and converts straight to numpy / pandas
+# parallel bulk parsing also sends these from the workers through shared memory instead of pickling a dict per sig,
+# and csv output is written straight from the rows without building a dict per sig again (see bulk.parse_stream)
+#
+# each field is stored in its own column, by type:
+#   number   - float values (0 for None) and a kind per value (NUMBER_NONE / NUMBER_INT / NUMBER_FLOAT), so ints
+#              come back as ints
+#   category - int codes into a list of the distinct values (-1 for None)
+#   bool     - -1 for None, 0 / 1
+#   text     - every value in one utf-8 byte string, with the byte offset of each value and a null flag
+# results that don't fit the schema (i.e. a string dose) raise TypeError, and are sent as they are instead
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
+
+FIELD_TYPES = {
+    'original_sig_text': 'text',
+    'sig_text': 'text',
+    'sig_readable': 'text',
+    'max_dose_per_day': 'number',
+    'dose': 'number',
+    'frequency': 'number',
+    'dose_unit': 'category',
+    'strength_unit': 'category',
+    'strength': 'number',
+    'Is_Sig_Parsable': 'bool',
+}
+
+NUMBER_NONE = 0
+NUMBER_INT = 1
+NUMBER_FLOAT = 2
+# ints beyond this can't make the round trip through a float
+MAX_INT = 2 ** 53
+
+# array typecodes for the parts of each column type (text also has the byte string itself)
+COLUMN_TYPECODES = {
+    'number': ['d', 'b'],
+    'category': ['i'],
+    'bool': ['b'],
+    'text': ['q', 'b'],
+}
+
+def encode_number(value):
+    if value is None:
+        return 0.0, NUMBER_NONE
+    if type(value) is int and -MAX_INT <= value <= MAX_INT:
+        return float(value), NUMBER_INT
+    if type(value) is float:
+        return value, NUMBER_FLOAT
+    raise TypeError('not a number: ' + repr(value))
+
+# a column of one field, appended to a batch of values at a time
+class Column:
+    def __init__(self, field_type, parts=None, categories=None):
+        self.field_type = field_type
+        if parts is None:
+            parts = [array.array(typecode) for typecode in COLUMN_TYPECODES[field_type]]
+            if field_type == 'text':
+                parts[0].append(0)
+                parts.append(bytearray())
+        self.parts = parts
+        self.categories = list(categories or [])
+        self.category_codes = {category: code for code, category in enumerate(self.categories)}
+
+    # checks every value before anything is appended, so a TypeError leaves the column as it was
+    def extend(self, values):
+        if self.field_type == 'number':
+            encoded = [encode_number(value) for value in values]
+            self.parts[0].extend(value for value, kind in encoded)
+            self.parts[1].extend(kind for value, kind in encoded)
+        elif self.field_type == 'category':
+            for value in values:
+                if value is not None and type(value) is not str:
+                    raise TypeError('not a category: ' + repr(value))
+            codes = self.parts[0]
+            for value in values:
+                if value is None:
+                    codes.append(-1)
+                    continue
+                if value not in self.category_codes:
+                    self.category_codes[value] = len(self.categories)
+                    self.categories.append(value)
+                codes.append(self.category_codes[value])
+        elif self.field_type == 'bool':
+            for value in values:
+                if value is not None and type(value) is not bool:
+                    raise TypeError('not a bool: ' + repr(value))
+            self.parts[0].extend(-1 if value is None else int(value) for value in values)
+        else:
+            for value in values:
+                if value is not None and type(value) is not str:
+                    raise TypeError('not text: ' + repr(value))
+            offsets, nulls, text = self.parts
+            for value in values:
+                if value is not None:
+                    text += value.encode('utf-8')
+                offsets.append(len(text))
+                nulls.append(value is None)
+
+    def __len__(self):
+        return len(self.parts[0]) - (1 if self.field_type == 'text' else 0)
+
+    # drops everything after the first size values (new categories are kept, they just aren't used)
+    def truncate(self, size):
+        if self.field_type == 'text':
+            offsets, nulls, text = self.parts
+            del text[offsets[size]:]
+            del offsets[size + 1:]
+            del nulls[size:]
+            return
+        for part in self.parts:
+            del part[size:]
+
+    def get_value(self, i):
+        if self.field_type == 'number':
+            kind = self.parts[1][i]
+            return None if kind == NUMBER_NONE else (int(self.parts[0][i]) if kind == NUMBER_INT else self.parts[0][i])
+        if self.field_type == 'category':
+            code = self.parts[0][i]
+            return self.categories[code] if code >= 0 else None
+        if self.field_type == 'bool':
+            value = self.parts[0][i]
+            return None if value < 0 else value == 1
+        offsets, nulls, text = self.parts
+        return None if nulls[i] else text[offsets[i]:offsets[i + 1]].decode('utf-8')
+
+    # every value, as a list
+    def get_values(self):
+        if self.field_type == 'number':
+            return [None if kind == NUMBER_NONE else (int(value) if kind == NUMBER_INT else value) for value, kind in zip(*self.parts)]
+        if self.field_type == 'category':
+            categories = self.categories
+            return [categories[code] if code >= 0 else None for code in self.parts[0]]
+        if self.field_type == 'bool':
+            return [None if value < 0 else value == 1 for value in self.parts[0]]
+        offsets, nulls, text = self.parts
+        # byte offsets are character offsets in ascii text, so it can be decoded all at once
+        if text.isascii():
+            text = text.decode('ascii')
+            return [None if nulls[i] else text[offsets[i]:offsets[i + 1]] for i in range(len(nulls))]
+        return [None if nulls[i] else text[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(nulls))]
+
+    # numbers are float64 with nan for None, categories are int32 codes (-1 for None, see categories), bools are
+    # bool (None is False), and text is an object array of str / None
+    def to_numpy(self):
+        if self.field_type == 'number':
+            values = np.frombuffer(self.parts[0], dtype=np.float64).copy()
+            values[np.frombuffer(self.parts[1], dtype=np.int8) == NUMBER_NONE] = np.nan
+            return values
+        if self.field_type == 'category':
+            return np.frombuffer(self.parts[0], dtype=np.int32).copy()
+        if self.field_type == 'bool':
+            return np.frombuffer(self.parts[0], dtype=np.int8) == 1
+        return np.array(self.get_values(), dtype=object)
+
+    def get_nbytes(self):
+        return sum(len(part) * (part.itemsize if isinstance(part, array.array) else 1) for part in self.parts)
+
+class ResultRecords:
+    def __init__(self, fields=None, columns=None, size=0):
+        self.fields = list(fields) if fields is not None else None
+        # columns is {field: Column}
+        self.columns = columns if columns is not None else {}
+        self.size = size
+
+    # appends a list of non-verbose parse results (dicts with the same keys, all in FIELD_TYPES)
+    # raises TypeError, and leaves the records as they were, if they don't fit the schema
+    def extend(self, results):
+        if not results:
+            return self
+        fields = list(results[0])
+        if self.fields is None:
+            self.fields = fields
+        if fields != self.fields:
+            raise TypeError('results have different fields')
+        for field in fields:
+            if field not in FIELD_TYPES:
+                raise TypeError('not a fixed schema field: ' + field)
+        for result in results:
+            if list(result) != fields:
+                raise TypeError('results have different fields')
+        if not self.columns:
+            self.columns = {field: Column(FIELD_TYPES[field]) for field in fields}
+        extended = []
+        try:
+            for field in fields:
+                self.columns[field].extend([result[field] for result in results])
+                extended.append(field)
+        except TypeError:
+            # a column doesn't append anything if a value doesn't fit, so only the columns before it need undoing
+            for field in extended:
+                self.columns[field].truncate(self.size)
+            raise
+        self.size += len(results)
+        return self
+
+    def append(self, result):
+        return self.extend([result])
+
+    def __len__(self):
+        return self.size
+
+    def get_column(self, field):
+        return self.columns[field].get_values()
+
+    # tuples of values in fields order
+    def rows(self):
+        if not self.size:
+            return iter([])
+        return zip(*[self.get_column(field) for field in self.fields])
+
+    # the same dicts that were added, built one at a time
+    def __iter__(self):
+        for i in range(self.size):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self.size
+        if not 0 <= i < self.size:
+            raise IndexError('record index out of range')
+        return {field: self.columns[field].get_value(i) for field in self.fields}
+
+    # distinct values of a category field, in code order
+    def get_categories(self, field):
+        return list(self.columns[field].categories)
+
+    # bytes used by the columns
+    def get_nbytes(self):
+        return sum(column.get_nbytes() for column in self.columns.values())
+
+    # {field: numpy array} (see Column.to_numpy)
+    def to_numpy(self):
+        if np is None:
+            raise ImportError('to_numpy needs numpy (pip install numpy)')
+        return {field: self.columns[field].to_numpy() for field in self.fields or []}
+
+    # DataFrame with a column per field - numbers are float64 (nan for None), categories are pandas categoricals,
+    # bools are bool and text is object
+    def to_pandas(self):
+        if pd is None or np is None:
+            raise ImportError('to_pandas needs pandas (pip install pandas)')
+        data = {}
+        for field in self.fields or []:
+            column = self.columns[field]
+            if column.field_type == 'category':
+                data[field] = pd.Categorical.from_codes(column.to_numpy(), categories=column.categories)
+            else:
+                data[field] = column.to_numpy()
+        return pd.DataFrame(data, columns=self.fields)
+
+    # copies the records to a new shared memory block, and returns a handle for from_shared_memory
+    # the block is left for whoever calls from_shared_memory to remove
+    def to_shared_memory(self):
+        parts = [part for field in self.fields for part in self.columns[field].parts]
+        part_sizes = [len(part) * (part.itemsize if isinstance(part, array.array) else 1) for part in parts]
+        block = shared_memory.SharedMemory(create=True, size=max(sum(part_sizes), 1))
+        try:
+            position = 0
+            for part, part_size in zip(parts, part_sizes):
+                block.buf[position:position + part_size] = part if isinstance(part, bytearray) else part.tobytes()
+                position += part_size
+        finally:
+            block.close()
+        return block.name, self.fields, [self.columns[field].categories for field in self.fields], part_sizes, self.size
+
+def encode_records(results):
+    if not results:
+        raise TypeError('no results to encode')
+    return ResultRecords().extend(results)
+
+# reads the records from a handle from ResultRecords.to_shared_memory, and removes the shared memory block
+def from_shared_memory(handle):
+    name, fields, categories, part_sizes, size = handle
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        parts = []
+        position = 0
+        for part_size in part_sizes:
+            parts.append(bytes(block.buf[position:position + part_size]))
+            position += part_size
+    finally:
+        block.close()
+        block.unlink()
+    columns = {}
+    for field, field_categories in zip(fields, categories):
+        column = [array.array(typecode, parts.pop(0)) for typecode in COLUMN_TYPECODES[FIELD_TYPES[field]]]
+        if FIELD_TYPES[field] == 'text':
+            column.append(bytearray(parts.pop(0)))
+        columns[field] = Column(FIELD_TYPES[field], column, field_categories)
+    return ResultRecords(fields, columns, size)
@@ -0,0 +1,196 @@
+import collections
+import hashlib
+from parsers.sig import SigParser, print_progress_bar
+from .lexer import NUMBER_KINDS, tokenize
+from .bulk import CHUNK_SIZE, SIG_FIELD, get_file_format, iter_records, count_records, parse_chunks
+from .compression import open_input
+
+# corpus report
+# one streaming pass over a file of sigs that collects what we look at after a new extract, without keeping the
+# results around: the unparsable rate per guardrail (see SigParser.UNPARSABLE_REASONS), the distribution of
+# dose_unit / route / frequency shapes, the words next to numbers no parser covered, and the most frequent
+# unparsable sigs
+# the last two can have as many distinct values as there are sigs, so they're counted in a count-min sketch and only
+# the top few are kept (see HeavyHitters) - memory stays the same whatever the size of the file
+# NOTE: counts from a sketch are estimates - never lower than the real count, and higher by at most about
+# 2 / width of the total count (with a high probability, depending on depth)
+
+TOP = 20
+SKETCH_WIDTH = 2048
+SKETCH_DEPTH = 4
+
+# count-min sketch - depth rows of width counters, each key adds to one counter per row and its count is the
+# smallest of those counters
+# keys are hashed with blake2b instead of hash(), so the same file gives the same report in every process
+class CountMinSketch:
+    def __init__(self, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.width = width
+        self.depth = depth
+        self.rows = [[0] * width for i in range(depth)]
+        self.total = 0
+
+    def get_indices(self, key):
+        digest = hashlib.blake2b(key.encode('utf-8', 'surrogatepass'), digest_size=8 * self.depth).digest()
+        return [int.from_bytes(digest[i * 8:(i + 1) * 8], 'little') % self.width for i in range(self.depth)]
+
+    # adds count to key, and returns key's new estimate
+    def add(self, key, count=1):
+        self.total += count
+        estimate = None
+        for row, index in zip(self.rows, self.get_indices(key)):
+            row[index] += count
+            if estimate is None or row[index] < estimate:
+                estimate = row[index]
+        return estimate
+
+    def get(self, key):
+        return min(row[index] for row, index in zip(self.rows, self.get_indices(key)))
+
+# the size most frequent keys, by their count-min sketch estimate
+# a key that isn't tracked replaces the least frequent tracked key once its estimate is higher
+class HeavyHitters:
+    def __init__(self, size=TOP, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.size = size
+        self.sketch = CountMinSketch(width, depth)
+        self.top = {}
+        # a lower bound on the smallest count in top once it's full - keys at or below it are skipped without a scan
+        self.min_count = 0
+
+    def add(self, key, count=1):
+        estimate = self.sketch.add(key, count)
+        if key in self.top or len(self.top) < self.size:
+            self.top[key] = estimate
+        elif estimate > self.min_count:
+            min_key = min(self.top, key=self.top.get)
+            if estimate > self.top[min_key]:
+                del self.top[min_key]
+                self.top[key] = estimate
+            self.min_count = min(self.top.values())
+
+    # [(key, estimate), ...], most frequent first
+    def most_common(self, n=None):
+        counts = sorted(((key, self.sketch.get(key)) for key in self.top), key=lambda item: (-item[1], item[0]))
+        return counts[:n] if n is not None else counts
+
+    @property
+    def total(self):
+        return self.sketch.total
+
+# '%g' without the exponent for the numbers frequencies have (i.e. 1.0 -> 1, 0.5 -> 0.5)
+def format_number(number):
+    return '%g' % number if isinstance(number, float) else str(number)
+
+# the shape of a parsed frequency, frequency[-frequency_max]/period[-period_max] period_unit (i.e. 1/4-6 hour for
+# q4-6h, 2/1 day for bid), with as needed on the end for prn - or None if the sig has no frequency
+def get_frequency_shape(result):
+    if result.get('frequency') is None and result.get('period') is None:
+        return None
+    shape = ''
+    for key in ('frequency', 'period'):
+        value = format_number(result[key]) if result.get(key) is not None else '?'
+        if result.get(key + '_max') is not None:
+            value += '-' + format_number(result[key + '_max'])
+        shape += ('/' if key == 'period' else '') + value
+    if result.get('period_unit'):
+        shape += ' ' + result['period_unit']
+    if result.get('as_needed'):
+        shape += ' as needed'
+    return shape
+
+# the words just before and after each uncovered number (see SigParser.get_uncovered_digits), once per sig
+def get_uncovered_tokens(sig_text, uncovered_digits):
+    if not uncovered_digits:
+        return []
+    tokens = [token for token in tokenize(sig_text) if token.kind != 'PUNCT']
+    uncovered_tokens = []
+    for start, end in uncovered_digits:
+        for index, token in enumerate(tokens):
+            if token.start <= start and end <= token.end:
+                for neighbour in tokens[max(index - 1, 0):index] + tokens[index + 1:index + 2]:
+                    if neighbour.kind not in NUMBER_KINDS and neighbour.text not in uncovered_tokens:
+                        uncovered_tokens.append(neighbour.text)
+                break
+    return uncovered_tokens
+
+# the parts of a verbose parse result the report uses - small enough to send back from a worker process
+# it has to be a module level function so it can be pickled (see bulk.parse_chunks)
+def get_report_record(result):
+    parsable = result.get('Is_Sig_Parsable', True)
+    return {
+        'sig_text': None if parsable else result.get('sig_text'),
+        'Is_Sig_Parsable': parsable,
+        'unparsable_reasons': result.get('unparsable_reasons') or [],
+        'dose_unit': result.get('dose_unit'),
+        'route': result.get('route'),
+        'frequency_shape': get_frequency_shape(result),
+        'uncovered_tokens': get_uncovered_tokens(result.get('sig_text') or '', result.get('uncovered_digits')),
+    }
+
+class CorpusReport:
+    def __init__(self, top=TOP, width=SKETCH_WIDTH, depth=SKETCH_DEPTH):
+        self.top = top
+        self.sigs = 0
+        self.unparsable = 0
+        self.reasons = collections.Counter()
+        # these have as many values as the parsers normalize to, so they're counted exactly
+        self.dose_units = collections.Counter()
+        self.routes = collections.Counter()
+        self.frequency_shapes = collections.Counter()
+        self.uncovered_tokens = HeavyHitters(top, width, depth)
+        self.unparsable_sigs = HeavyHitters(top, width, depth)
+
+    # record is from get_report_record
+    def add(self, record):
+        self.sigs += 1
+        if not record['Is_Sig_Parsable']:
+            self.unparsable += 1
+            self.reasons.update(record['unparsable_reasons'])
+            self.unparsable_sigs.add(record['sig_text'] or '')
+        for counter, key in ((self.dose_units, 'dose_unit'), (self.routes, 'route'), (self.frequency_shapes, 'frequency_shape')):
+            if record[key] is not None:
+                counter[record[key]] += 1
+        for token in record['uncovered_tokens']:
+            self.uncovered_tokens.add(token)
+
+    # result is from SigParser.parse(sig_text, verbose=True)
+    def add_result(self, result):
+        self.add(get_report_record(result))
+
+    def get_rate(self, count):
+        return round(count / self.sigs, 6) if self.sigs else 0.0
+
+    def to_dict(self):
+        reasons = SigParser.UNPARSABLE_REASONS + sorted(reason for reason in self.reasons if reason not in SigParser.UNPARSABLE_REASONS)
+        return {
+            'sigs': self.sigs,
+            'unparsable': self.unparsable,
+            'unparsable_rate': self.get_rate(self.unparsable),
+            # a sig can be caught by more than one guardrail, so these can add up to more than unparsable
+            'unparsable_reasons': {reason: {'sigs': self.reasons[reason], 'rate': self.get_rate(self.reasons[reason])} for reason in reasons},
+            'dose_units': dict(self.dose_units.most_common()),
+            'routes': dict(self.routes.most_common()),
+            'frequency_shapes': dict(self.frequency_shapes.most_common()),
+            'uncovered_tokens': [{'token': token, 'count': count} for token, count in self.uncovered_tokens.most_common(self.top)],
+            'unparsable_sigs': [{'sig_text': sig_text, 'count': count} for sig_text, count in self.unparsable_sigs.most_common(self.top)],
+        }
+
+# reports on an iterable of sigs - parsed a chunk at a time (in workers processes if workers > 0) and counted as
+# they come back, so nothing but the report is kept
+# row_total turns on the progress bar
+def report_sigs(sigs, sig_parser=None, top=TOP, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, chunk_size=CHUNK_SIZE, workers=0, row_total=None):
+    report = CorpusReport(top, width, depth)
+    for chunk, records, errors in parse_chunks(sigs, sig_parser, verbose=True, transform=get_report_record, chunk_size=chunk_size, workers=workers):
+        for record in records:
+            report.add(record)
+        if row_total:
+            print_progress_bar(report.sigs, row_total)
+    return report
+
+# reports on a csv / ndjson file of sigs (optionally compressed, see compression.py) - returns the report dict
+def report_file(input_file, sig_parser=None, sig_field=SIG_FIELD, top=TOP, width=SKETCH_WIDTH, depth=SKETCH_DEPTH, chunk_size=CHUNK_SIZE, workers=0, progress=True):
+    input_format = get_file_format(input_file)
+    row_total = count_records(input_file, input_format) if progress else None
+    with open_input(input_file) as in_file:
+        sigs = (sig for sig, record, offset in iter_records(in_file, input_format, sig_field))
+        report = report_sigs(sigs, sig_parser, top, width, depth, chunk_size, workers, row_total)
+    return report.to_dict()
@@ -0,0 +1,62 @@
+from parsers.sig import SigParser
+from parsers.services.lexer import tokenize, has_digits
+
+# parses a sig as it's being typed (i.e. on every keystroke in a prescriber's sig entry form)
+# the session keeps the last sig it parsed and the match spans of every component parser, so after an edit each
+# parser only runs around the edit, and the matches before / after it are reused (see Parser.parse_edit)
+# the result is always the same as SigParser.parse(sig_text, verbose, fields)
+class SigSession:
+    def __init__(self, sig_parser=None, verbose=True, fields=None):
+        self.sig_parser = sig_parser or SigParser()
+        self.verbose = verbose
+        self.fields = fields
+        self.reset()
+
+    # forget the last sig, so the next one is parsed in full
+    def reset(self):
+        self.sig_text = None
+        self.spans = {}
+
+    def parse(self, sig_text):
+        sig_parser = self.sig_parser
+        sig_text = sig_parser.get_normalized_sig_text(sig_text)
+        tokens = tokenize(sig_text)
+        parser_types, guardrails, readable = sig_parser.get_projection(None if self.verbose else self.fields)
+        if not guardrails:
+            return sig_parser.parse_preprocessed(sig_text, self.verbose, self.fields, tokens=tokens)
+        old_sig_text = self.sig_text
+        if old_sig_text is not None:
+            prefix, suffix = get_common_ends(old_sig_text, sig_text)
+        sig_has_digit = has_digits(tokens)
+        spans = {}
+        component_matches = {}
+        for parser_type in sig_parser.get_parse_order(parser_types):
+            matches = []
+            for i, parser in enumerate(sig_parser.parsers[parser_type]):
+                if not parser.may_match(sig_text, sig_has_digit):
+                    parser_spans = []
+                elif parser.anchor_types:
+                    # only tried at the numbers next to the anchors, so there's nothing to reuse
+                    matches += parser.parse_anchored(sig_text, component_matches, tokens)
+                    continue
+                elif old_sig_text is None or (parser_type, i) not in self.spans:
+                    parser_spans = parser.parse_spans(sig_text)
+                else:
+                    parser_spans = parser.parse_edit(sig_text, old_sig_text, self.spans[(parser_type, i)], prefix, suffix)
+                spans[(parser_type, i)] = parser_spans
+                matches += parser.parse_from_spans(sig_text, parser_spans, [])
+            component_matches[parser_type] = matches
+        self.sig_text = sig_text
+        self.spans = spans
+        return sig_parser.parse_preprocessed(sig_text, self.verbose, self.fields, component_matches, tokens)
+
+# lengths of the longest common prefix and suffix of two strings, without overlapping in the shorter one
+def get_common_ends(a, b):
+    limit = min(len(a), len(b))
+    prefix = 0
+    while prefix < limit and a[prefix] == b[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and a[-1 - suffix] == b[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
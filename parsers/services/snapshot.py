@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+# creating a parser works out a few things about its pattern (see Parser.__init__) by running it through sre_parse,
+# which is most of the time it takes to import parsers.sig - so those are kept in a snapshot file, by a hash of the
+# pattern, and read back the next time instead of being worked out again
+# a pattern that changed (i.e. a new entry in one of the normalize.py tables) has a different hash, so it's worked out
+# again, and the snapshot is rewritten without the old one
+# the snapshot is also keyed on the code that does the analysis (see CODE_FILES), so changing it never leaves old
+# results in use
+# NOTE: compiled patterns can't be kept - re has no serialized form for them (pickling one just compiles it again)
+#
+# the snapshot is off unless SIG_PARSER_SNAPSHOT_DIR sets where it goes (i.e. a writable layer of a serverless function
+# image) - the directory is created private to the user, and a snapshot in a directory (or file) that anyone else can
+# write to is never read or written, since a tampered one would silently change what the parsers match
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_DIR = os.environ.get('SIG_PARSER_SNAPSHOT_DIR', '')
+
+# the analysis (parsers/classes/parser.py), the tables the patterns are built from, and this file
+CODE_FILES = [
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'classes', 'parser.py'),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'normalize.py'),
+    os.path.abspath(__file__),
+]
+
+def get_code_hash(code_files=CODE_FILES):
+    code_hash = hashlib.sha1()
+    for code_file in code_files:
+        try:
+            with open(code_file, 'rb') as f:
+                code_hash.update(f.read())
+        except OSError:
+            # i.e. only the .pyc files were shipped - there's nothing to key the snapshot on, so it isn't used
+            return None
+    return code_hash.hexdigest()
+
+# True if only the current user can write to path (always True where there are no file owners, i.e. windows)
+def is_private(path):
+    if not hasattr(os, 'getuid'):
+        return True
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return False
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+# sre_parse can change between python versions, so each version gets its own snapshot
+def get_snapshot_file(snapshot_dir=None):
+    snapshot_dir = SNAPSHOT_DIR if snapshot_dir is None else snapshot_dir
+    if not snapshot_dir:
+        return None
+    return os.path.join(snapshot_dir, 'patterns-v%d-py%d.%d.json' % (SNAPSHOT_VERSION, sys.version_info[0], sys.version_info[1]))
+
+def get_pattern_key(pattern):
+    return hashlib.sha1(('%d:%s' % (pattern.flags, pattern.pattern)).encode('utf-8', 'surrogatepass')).hexdigest()
+
+# (template_safe, prefilter, batch_safe) <-> json
+def encode_pattern_info(info):
+    template_safe, prefilter, batch_safe = info
+    return [template_safe, [prefilter[0], sorted(prefilter[1])] if prefilter else None, batch_safe]
+
+def decode_pattern_info(value):
+    template_safe, prefilter, batch_safe = value
+    return template_safe, (prefilter[0], frozenset(prefilter[1])) if prefilter else None, batch_safe
+
+class PatternSnapshot:
+    def __init__(self, snapshot_file=None, code_hash=None):
+        self.snapshot_file = snapshot_file
+        self.code_hash = get_code_hash() if code_hash is None and snapshot_file else code_hash
+        self.entries = self.load()
+        # entries used since the snapshot was loaded - only these are saved, so old patterns drop out
+        self.used = {}
+        self.changed = False
+
+    def load(self):
+        if not self.snapshot_file or not self.code_hash:
+            return {}
+        if not is_private(os.path.dirname(self.snapshot_file)) or not is_private(self.snapshot_file):
+            return {}
+        try:
+            with open(self.snapshot_file, encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('code') != self.code_hash:
+            return {}
+        return snapshot.get('patterns', {})
+
+    # info for a compiled pattern, from the snapshot if it's there, or from get_info(pattern) if it isn't
+    def get(self, pattern, get_info):
+        key = get_pattern_key(pattern)
+        value = self.entries.get(key)
+        if value is not None:
+            try:
+                info = decode_pattern_info(value)
+            except (TypeError, ValueError):
+                value = None
+        if value is None:
+            info = get_info(pattern)
+            value = encode_pattern_info(info)
+            self.changed = True
+        self.used[key] = value
+        return info
+
+    # writes the snapshot if anything had to be worked out - a snapshot that can't be written is just skipped
+    def save(self):
+        if not self.changed or not self.snapshot_file or not self.code_hash:
+            return False
+        self.entries = dict(self.used)
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_file), mode=0o700, exist_ok=True)
+            if not is_private(os.path.dirname(self.snapshot_file)):
+                return False
+            # written to a temporary file first, so another process never reads half of it
+            fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(self.snapshot_file), suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump({'version': SNAPSHOT_VERSION, 'code': self.code_hash, 'patterns': self.entries}, f)
+                os.replace(temp_file, self.snapshot_file)
+            except BaseException:
+                os.remove(temp_file)
+                raise
+        except OSError:
+            return False
+        self.changed = False
+        return True
+
+pattern_snapshot = PatternSnapshot(get_snapshot_file())
@@ -1,6 +1,24 @@
 from parsers.classes.parser import *
 from parsers import method, dose, strength, route, frequency, when, duration, indication, max as max_parser, additional_info
+from parsers.services.lexer import normalize_sig_text, tokenize, has_digits, get_digit_spans
+from parsers.services import mdd
+from parsers.services.records import ResultRecords
+from parsers.services.snapshot import pattern_snapshot
 import csv
+import time
+
+# every parser module has created its parsers by now, so anything new about their patterns can go in the snapshot
+# (only if SIG_PARSER_SNAPSHOT_DIR turned it on, see snapshot.py)
+pattern_snapshot.save()
+
+# separators between the steps of a multi-step sig, and a change of dose at the start of a step (see get_sequence_spans)
+SEQUENCE_SEPARATOR_PATTERN = re.compile(r'\s*\b(?:and\s+then|then|followed\s+by)\b\s*', re.I)
+SEQUENCE_CHANGE_PATTERN = re.compile(r'\b(?:increas|decreas|reduc|taper|titrat)\w*\s+(?:(?:the\s+)?dose\s+)?to\s+', re.I)
+
+# slow sig log defaults (see SigParser slow_ms) - a sig that takes longer than SLOW_MS to parse, and at most SLOW_LIMIT
+# of them per parser
+SLOW_MS = 100
+SLOW_LIMIT = 100
 
 # TODO: need to move all this to the main app and re-purpose the sig.py parser
 
@@ -28,18 +46,161 @@ class SigParser(Parser):
     OUTPUT_KEYS = ['original_sig_text', 'sig_text', 'sig_readable', 'max_dose_per_day', 'dose', 'frequency', 'dose_unit', 'strength_unit', 'strength', 'Is_Sig_Parsable']
     match_keys = OUTPUT_KEYS
     parser_type = 'sig'
+    # parser types whose matches feed the guardrails and max_dose_per_day
+    # NOTE: every output field except the ones below is nulled when Is_Sig_Parsable is False, so they all depend on these
+    GUARDRAIL_PARSER_TYPES = ['dose', 'strength', 'frequency', 'max']
+    # output fields that are returned even when the sig is unparsable and don't need any component parsers
+    UNGUARDED_KEYS = ['original_sig_text', 'sig_text']
+    # the guardrails that can mark a sig unparsable - verbose output lists the ones that did in unparsable_reasons
+    # (error is a sig that raised an exception, see get_unparsable)
+    UNPARSABLE_REASONS = ['titration', 'daily_with_days', 'repeated_fraction', 'joined_day_names', 'daily_every_morning', 'once_a_day_days', 'ambiguous_dose_mapping', 'multiple_doses', 'ambiguous', 'uncovered_digits', 'no_max_dose', 'error']
+    # parser types whose matches only cover the numbers in them for the uncovered digits guardrail when they don't
+    # overlap another component match - an indication is free text that can run on past a duration into a number that
+    # belongs to something else (i.e. the 0.5 in "for one week 0.5"), but "over 200" in "for blood sugar over 200" is its own
+    UNCOVERING_PARSER_TYPES = ['indication']
+    # the frequency fields of each pair of a compound sig in verbose output (see get_pair_frequencies)
+    PAIR_FREQUENCY_KEYS = ['frequency', 'frequency_max', 'period', 'period_max', 'period_unit', 'day_of_week', 'time_of_day']
 
+    # template_cache_size > 0 turns on the template cache (see get_template_matches)
+    # excluded_dose_units overrides EXCLUDED_MDD_DOSE_UNITS (dose units that don't get a max_dose_per_day)
+    # slow_ms turns on the slow sig log - a sig that takes longer than that to parse is profiled and kept in slow_sigs,
+    # up to slow_limit of them (see check_slow_sig)
+    def __init__(self, template_cache_size=0, excluded_dose_units=None, slow_ms=None, slow_limit=SLOW_LIMIT):
+        super().__init__()
+        self.excluded_dose_units = EXCLUDED_MDD_DOSE_UNITS if excluded_dose_units is None else excluded_dose_units
+        self.template_cache_size = template_cache_size
+        self.template_cache = collections.OrderedDict()
+        self.slow_ms = slow_ms
+        self.slow_limit = slow_limit
+        self.slow_count = 0
+        self.slow_sigs = []
+        self.parse_orders = {}
+
+    # lower case, punctuation, white space and typo fixes (see lexer.py)
     def get_normalized_sig_text(self, sig_text):
-        # standardize to lower case
-        sig_text = sig_text.lower()
-        # remove:
-        # . if not bordered by a number (i.e. don't want to convert 2.5 to 25 or 0.5 to 05)
-        # : if not bordered by a number (i.e. not 5:00 or 1:10000)
-        # , ; # * " ' ( ) \t [ ] :
-        sig_text = re.sub(r'(?:(?<![0-9])\.(?![0-9])|,|;|#|\*|\"|\'|\(|\)|\t|\[|\]|(?<![0-9]):(?![0-9]))', '', sig_text)
-        # remove duplicate spaces, and in doing so, also trim whitespaces from around sig
-        sig_text = ' '.join(sig_text.split())
-        return sig_text
+        return normalize_sig_text(sig_text)
+
+    # works out what a set of requested output fields depends on
+    # returns the parser types to run, whether the guardrails are needed, and whether sig_readable is needed
+    def get_projection(self, fields=None):
+        if fields is None:
+            return list(self.parsers.keys()), True, True
+        for field in fields:
+            if field not in self.OUTPUT_KEYS:
+                raise ValueError(field + ' is not a valid output field for the ' + self.parser_type + ' parser')
+        if 'sig_readable' in fields:
+            return list(self.parsers.keys()), True, True
+        guardrails = any(field not in self.UNGUARDED_KEYS for field in fields)
+        parser_types = [t for t in self.parsers if t in self.GUARDRAIL_PARSER_TYPES] if guardrails else []
+        return parser_types, guardrails, False
+
+    # the order to parse parser_types in - the anchor types of a parser (see Parser.anchor_types) come before it, even
+    # when they aren't in parser_types (their matches are only used as anchors then, parse_preprocessed only looks at
+    # parser_types)
+    def get_parse_order(self, parser_types):
+        key = tuple(parser_types)
+        if key not in self.parse_orders:
+            anchor_types = set(t for parser_type in parser_types for parser in self.parsers[parser_type] for t in parser.anchor_types)
+            self.parse_orders[key] = [t for t in self.parsers if t in anchor_types] + [t for t in parser_types if t not in anchor_types]
+        return self.parse_orders[key]
+
+    # template cache key - the sig with every digit replaced by # (normalized sigs never contain a #)
+    def get_template(self, sig_text, tokens=None):
+        if tokens is None:
+            tokens = tokenize(sig_text)
+        template = list(sig_text)
+        for start, end in get_digit_spans(tokens):
+            template[start:end] = '#' * (end - start)
+        return ''.join(template)
+
+    # component matches for a sig, reusing the matches of an earlier sig with the same template
+    # (i.e. "take 2 tablets every 6 hours" for "take 1 tablets every 4 hours") when there is one
+    # template safe parsers (see Parser.parse_from_spans) only re-match the spans with a changed number,
+    # the rest are parsed in full - so the matches are always the same as parse_component
+    def get_template_matches(self, sig_text, parser_types, tokens):
+        key = (self.get_template(sig_text, tokens), tuple(parser_types))
+        template = self.template_cache.get(key)
+        if template is None:
+            template = (sig_text, {})
+            self.template_cache[key] = template
+            if len(self.template_cache) > self.template_cache_size:
+                self.template_cache.popitem(last=False)
+        else:
+            self.template_cache.move_to_end(key)
+        template_sig_text, template_spans = template
+        changed = [i for start, end in get_digit_spans(tokens) for i in range(start, end) if sig_text[i] != template_sig_text[i]]
+        sig_has_digit = has_digits(tokens)
+        component_matches = {}
+        for parser_type in self.get_parse_order(parser_types):
+            matches = []
+            for i, parser in enumerate(self.parsers[parser_type]):
+                if not parser.may_match(sig_text, sig_has_digit):
+                    continue
+                if parser.anchor_types:
+                    matches += parser.parse_anchored(sig_text, component_matches, tokens)
+                    continue
+                if not parser.template_safe:
+                    matches += parser.parse(sig_text)
+                    continue
+                if (parser_type, i) not in template_spans:
+                    template_spans[(parser_type, i)] = parser.parse_spans(template_sig_text)
+                matches += parser.parse_from_spans(sig_text, template_spans[(parser_type, i)], changed)
+            component_matches[parser_type] = matches
+        return component_matches
+
+    # tokens lets us skip parsers that can't match the sig (see Parser.may_match)
+    # component_matches has the matches of the parser types already parsed, for parsers that need them (see
+    # get_parse_order) - without it those parsers find their own
+    def parse_component(self, sig_text, parser_type, tokens=None, component_matches=None):
+        sig_has_digit = tokens is None or has_digits(tokens)
+        matches = []
+        for parser in self.parsers[parser_type]:
+            if tokens is not None and not parser.may_match(sig_text, sig_has_digit):
+                continue
+            if parser.anchor_types and component_matches is not None:
+                match = parser.parse_anchored(sig_text, component_matches, tokens)
+            else:
+                match = parser.parse(sig_text)
+            if match:
+                matches += match
+        return matches
+
+    # (start, end) of each number in the sig that isn't covered by one of the matches
+    def get_uncovered_digits(self, tokens, all_matches):
+        covered_indices = set()
+        uncovering_spans = []
+        for key, matches in all_matches.items():
+             if matches and isinstance(matches, list):
+                  for m in matches:
+                       # Infer keys based on parser name convention (e.g. dose_text_start)
+                       s_key = f"{key}_text_start"
+                       e_key = f"{key}_text_end"
+                       start = m.get(s_key)
+                       end = m.get(e_key)
+                       if start is not None and end is not None:
+                            if key in self.UNCOVERING_PARSER_TYPES:
+                                 uncovering_spans.append((start, end))
+                            else:
+                                 covered_indices.update(range(start, end))
+        # an indication only covers its numbers when no other component was found inside it
+        for start, end in uncovering_spans:
+             if covered_indices.isdisjoint(range(start, end)):
+                  covered_indices.update(range(start, end))
+
+        # Check all digits in the normalized text
+        uncovered = []
+        for start, end in get_digit_spans(tokens):
+             # Check if the entire number span is covered
+             # (range end is exclusive, but set check needs index check)
+             span_indices = set(range(start, end))
+             if not span_indices.issubset(covered_indices):
+                  # Found a number that wasn't parsed!
+                  uncovered.append((start, end))
+        return uncovered
+
+    # returns True if any number in the sig isn't covered by one of the matches
+    def has_uncovered_digits(self, tokens, all_matches):
+        return bool(self.get_uncovered_digits(tokens, all_matches))
 
     def get_readable(self, match_dict, inferred_method=None, inferred_route=None, inferred_dose_unit=None):
         method = match_dict.get('method_readable') or inferred_method or ''
@@ -73,20 +234,8 @@ class SigParser(Parser):
         return readable
 
     def get_period_per_day(self, period, period_unit):
-        if not period:
-            return None
+        return mdd.get_period_per_day(period, period_unit)
 
-        if period_unit == 'hour':
-            return 24 / period
-        elif period_unit == 'day':
-            return 1 / period
-        elif period_unit == 'week':
-            return 1 / (7 * period)
-        elif period_unit == 'month':
-            return 1 / (30 * period)
-        else:
-            return None
-        
     def filter_matches(self, matches, start_key, end_key):
         if not matches: return []
         # Sort by start_key ASC, then end_key DESC (longest first)
@@ -122,168 +271,366 @@ class SigParser(Parser):
                          return True
         return False
 
-    def get_max_dose_per_day(self, match_dict, all_matches=None):
-        # Helper to calculate single component max dose
-        def calculate_component(d_match, f_match, ignore_exclusion=False):
-            frequency = f_match.get('frequency_max') or f_match.get('frequency')
-            period = f_match.get('period')
-            period_unit_raw = f_match.get('period_unit')
-            period_unit = get_normalized(PERIOD_UNIT, period_unit_raw) if period_unit_raw else period_unit_raw
-            period_per_day = self.get_period_per_day(period, period_unit)
-
-            dose = d_match.get('dose_max') or d_match.get('dose')
-            # Check ignored units
-            dose_unit = d_match.get('dose_unit')
-            if not ignore_exclusion and dose_unit in EXCLUDED_MDD_DOSE_UNITS:
-                return None
-
-            if frequency and period_per_day and dose:
-                return frequency * period_per_day * dose
-            return None
+    # everything max_dose_per_day depends on, as plain lists (see mdd.py)
+    # the (dose match, frequency match) pairs that add up to a compound sig's max_dose_per_day
+    # returns (pairs, ignore_exclusion, ambiguous) - ignore_exclusion is True if the pairs use strengths as doses
+    def get_pair_matches(self, sig_text, all_matches):
+        ignore_exclusion = False
+        doses = self.filter_matches(all_matches.get('dose', []), 'dose_text_start', 'dose_text_end')
+
+        if not doses:
+            strengths = self.filter_matches(all_matches.get('strength', []), 'strength_text_start', 'strength_text_end')
+            if strengths:
+                ignore_exclusion = True
+                for s in strengths:
+                    d = s.to_dict()
+                    d['dose'] = s.get('strength')
+                    d['dose_max'] = s.get('strength_max')
+                    d['dose_unit'] = s.get('strength_unit')
+                    doses.append(d)
+
+        frequencies = self.filter_matches(all_matches.get('frequency', []), 'frequency_text_start', 'frequency_text_end')
+
+        # Scenario 1: N doses, N frequencies (1:1 mapping)
+        if len(doses) == len(frequencies) and len(doses) > 0:
+            # "OR" between elements is ambiguous -> no max dose per day
+            if self._check_ambiguity(sig_text, frequencies) or self._check_ambiguity(sig_text, doses):
+                return [], ignore_exclusion, True
+            return list(zip(doses, frequencies)), ignore_exclusion, False
+
+        # Scenario 2: 1 dose, N frequencies ("1 tablet morning and evening")
+        elif len(doses) == 1 and len(frequencies) > 1:
+            if self._check_ambiguity(sig_text, frequencies):
+                return [], ignore_exclusion, True
+            return [(doses[0], f) for f in frequencies], ignore_exclusion, False
+
+        return [], ignore_exclusion, False
+
+    def get_mdd_components(self, match_dict, all_matches=None):
+        def get_component(d_match, f_match):
+            period_unit = f_match.get('period_unit')
+            period_unit = get_normalized(PERIOD_UNIT, period_unit) if period_unit else period_unit
+            return [d_match.get('dose'), d_match.get('dose_max'), d_match.get('dose_unit'), f_match.get('frequency'), f_match.get('frequency_max'), f_match.get('period'), period_unit]
+
+        components = {
+            'ambiguous': False,
+            'pairs': [],
+            'ignore_exclusion': False,
+            # fallback to single match_dict calculation if complex calculation fails or isn't applicable
+            'fallback': get_component(match_dict, match_dict),
+            # explicit "max dose" fields (e.g. "max 3 per day") from the 'max' parser - global for the sig, not per instruction
+            'max': [match_dict.get('max_numerator_value'), match_dict.get('max_denominator_value'), match_dict.get('max_denominator_unit')],
+        }
 
-        # Helper to calculate from explicit "max dose" fields (e.g. "max 3 per day")
-        # usually stored in the 'max' parser results.
-        # This is usually global for the sig, not per instruction.
-        # We rely on match_dict handling this from the 'max' parser.
-        def calculate_explicit_max(m_dict):
-             frequency_max = 1
-             period_max = m_dict.get('max_denominator_value')
-             period_unit_max = m_dict.get('max_denominator_unit')
-             period_per_day_max = self.get_period_per_day(period_max, period_unit_max)
-             dose_max = m_dict.get('max_numerator_value')
-             if frequency_max and period_per_day_max and dose_max:
-                return frequency_max * period_per_day_max * dose_max
-             return None
-
-        # Calculate using all_matches if available
-        calculated_max_dose = None
-        
         sig_text = match_dict.get('sig_text', '').lower()
-        
+
         if all_matches:
-            doses = self.filter_matches(all_matches.get('dose', []), 'dose_text_start', 'dose_text_end')
-
-            strengths_as_doses = False
-            if not doses:
-                strengths = self.filter_matches(all_matches.get('strength', []), 'strength_text_start', 'strength_text_end')
-                if strengths:
-                    strengths_as_doses = True
-                    for s in strengths:
-                        d = s.copy()
-                        d['dose'] = s.get('strength')
-                        d['dose_max'] = s.get('strength_max')
-                        d['dose_unit'] = s.get('strength_unit')
-                        doses.append(d)
-
-            frequencies = self.filter_matches(all_matches.get('frequency', []), 'frequency_text_start', 'frequency_text_end')
-
-            # Scenario 1: N doses, N frequencies (1:1 mapping)
-            if len(doses) == len(frequencies) and len(doses) > 0:
-                total = 0
-                valid = True
-                
-                # Check for "OR" ambiguity between elements
-                if self._check_ambiguity(sig_text, frequencies) or self._check_ambiguity(sig_text, doses):
-                    # AMBIGUOUS -> Return None immediately
-                    return None
-                    
-                else:
-                    for d, f in zip(doses, frequencies):
-                        val = calculate_component(d, f, ignore_exclusion=strengths_as_doses)
-                        if val is None:
-                            valid = False
-                            break
-                        total += val
-                
-                if valid:
-                    calculated_max_dose = total
-            
-            # Scenario 2: 1 dose, N frequencies ("1 tablet morning and evening")
-            elif len(doses) == 1 and len(frequencies) > 1:
-                total = 0
-                valid = True
-                
-                if self._check_ambiguity(sig_text, frequencies):
-                    return None
+            pair_matches, components['ignore_exclusion'], components['ambiguous'] = self.get_pair_matches(sig_text, all_matches)
+            components['pairs'] = [get_component(d, f) for d, f in pair_matches]
+
+        return components
+
+    # the timing of each pair in mdd_components, as it's written in the sig (verbose output only, see fhir.get_pairs)
+    # the pairs' frequencies have the days of week folded in for max_dose_per_day, so this has the frequency from before
+    # that (raw_frequencies, by frequency_text_start), and the days of week themselves
+    # a day of week that none of the pairs have their own of (i.e. "... on monday wednesday friday") applies to all of them
+    def get_pair_frequencies(self, match_dict, all_matches, raw_frequencies):
+        pair_matches = self.get_pair_matches(match_dict.get('sig_text', '').lower(), all_matches)[0]
+        when_matches = [m for m in all_matches.get('when', []) if m.get('when')]
+        pair_frequencies = []
+        for _, f in pair_matches:
+            pair_frequency = {k: f.get(k) for k in self.PAIR_FREQUENCY_KEYS}
+            pair_frequency['frequency'] = raw_frequencies.get(f['frequency_text_start'], f.get('frequency'))
+            # the when that overlaps the frequency (i.e. "with breakfast"), or the one in the frequency (i.e. "in the evening")
+            start, end = f['frequency_text_start'], f['frequency_text_end']
+            whens = [m for m in when_matches if m['when_text_start'] < end and m['when_text_end'] > start] or [m for m in self.parse_component(f['frequency_text'], 'when') if m.get('when')]
+            pair_frequency['when'] = whens[0]['when'] if whens else None
+            pair_frequencies.append(pair_frequency)
+        if not any(pair_frequency['day_of_week'] for pair_frequency in pair_frequencies):
+            for pair_frequency in pair_frequencies:
+                pair_frequency['day_of_week'] = match_dict.get('day_of_week')
+        return pair_frequencies
+
+    def get_max_dose_per_day(self, match_dict, all_matches=None):
+        return mdd.calculate_max_dose_per_day(self.get_mdd_components(match_dict, all_matches), self.excluded_dose_units)
+
+    # recalculates max_dose_per_day for a list of verbose parse results from their mdd_components
+    # i.e. to see what changing the excluded dose units does to a whole file of sigs without parsing it again
+    # (mdd.get_mdd_columns keeps them as numpy columns, for recalculating many times)
+    def get_max_doses_per_day(self, parsed_sigs, excluded_dose_units=None):
+        if excluded_dose_units is None:
+            excluded_dose_units = self.excluded_dose_units
+        return mdd.calculate_max_doses_per_day([parsed_sig['mdd_components'] for parsed_sig in parsed_sigs], excluded_dose_units)
+
+    # fields limits the (non-verbose) output to a subset of OUTPUT_KEYS, and only the component parsers,
+    # guardrails and readable text those fields depend on are computed
+    # NOTE: verbose output is the full match dict, so fields is ignored when verbose is True
+    def parse(self, sig_text, verbose=False, fields=None):
+        start = time.perf_counter() if self.is_timing() else None
+        normalized_sig_text = self.get_normalized_sig_text(sig_text)
+        tokens = tokenize(normalized_sig_text)
+        result = None
+        if self.template_cache_size > 0:
+            parser_types, guardrails, readable = self.get_projection(None if verbose else fields)
+            if guardrails:
+                result = self.parse_preprocessed(normalized_sig_text, verbose, fields, self.get_template_matches(normalized_sig_text, parser_types, tokens), tokens)
+        if result is None:
+            result = self.parse_preprocessed(normalized_sig_text, verbose, fields, tokens=tokens)
+        if start is not None:
+            self.check_slow_sig(sig_text, seconds=time.perf_counter() - start)
+        return result
+
+    # parse an iterable of sigs into a ResultRecords (one typed column per output field, see records.py) instead of a
+    # list of dicts - only batch_size parse results are held as dicts at a time
+    def parse_records(self, sig_texts, fields=None, batch_size=1000):
+        records = ResultRecords()
+        batch = []
+        for sig_text in sig_texts:
+            batch.append(sig_text)
+            if len(batch) == batch_size:
+                records.extend(self.parse_batch(batch, fields=fields))
+                batch = []
+        if batch:
+            records.extend(self.parse_batch(batch, fields=fields))
+        if records.fields is None:
+            records.fields = list(fields if fields is not None else self.OUTPUT_KEYS)
+        return records
+
+    # result for a sig that couldn't be parsed at all (i.e. a parser raised an exception on it)
+    # same shape as an unparsable sig, so bulk output stays one row per sig
+    def get_unparsable(self, sig_text, verbose=False, fields=None):
+        match_dict = dict(self.match_dict)
+        match_dict['sig_text'] = self.get_normalized_sig_text(sig_text)
+        match_dict['Is_Sig_Parsable'] = False
+        match_dict['unparsable_reasons'] = ['error']
+        if verbose:
+            return match_dict
+        return {k: match_dict.get(k) for k in (fields if fields is not None else self.OUTPUT_KEYS)}
+
+    # parse a list of sigs - same output as parse() on each sig, but every component parser
+    # scans all of the sigs at once (see Parser.parse_batch)
+    def parse_batch(self, sig_texts, verbose=False, fields=None):
+        if verbose:
+            fields = None
+        parser_types, guardrails, readable = self.get_projection(fields)
+        original_sig_texts = sig_texts
+        sig_texts = [self.get_normalized_sig_text(sig_text) for sig_text in sig_texts]
+        if not guardrails:
+            return [self.parse_preprocessed(sig_text, verbose, fields) for sig_text in sig_texts]
+        # an upper bound on the time each sig takes (see Parser.parse_batch) - only sigs over slow_ms are timed again
+        sig_seconds = [0.0] * len(sig_texts) if self.is_timing() else None
+        starts = []
+        ends = []
+        position = 0
+        for sig_text in sig_texts:
+            starts.append(position)
+            position += len(sig_text)
+            ends.append(position)
+            position += len(BATCH_SEPARATOR)
+        buffer = BATCH_SEPARATOR.join(sig_texts)
+        sig_tokens = [tokenize(sig_text) for sig_text in sig_texts]
+        parse_order = self.get_parse_order(parser_types)
+        component_matches = [{parser_type: [] for parser_type in parse_order} for sig_text in sig_texts]
+        for parser_type in parse_order:
+            for parser in self.parsers[parser_type]:
+                if parser.anchor_types:
+                    # the anchors are different in each sig, so these are parsed one sig at a time
+                    for i, sig_text in enumerate(sig_texts):
+                        start = time.perf_counter() if sig_seconds is not None else None
+                        component_matches[i][parser_type] += parser.parse_anchored(sig_text, component_matches[i], sig_tokens[i])
+                        if start is not None:
+                            sig_seconds[i] += time.perf_counter() - start
+                    continue
+                for i, matches in enumerate(parser.parse_batch(buffer, starts, ends, sig_seconds)):
+                    component_matches[i][parser_type] += matches
+        if sig_seconds is None:
+            return [self.parse_preprocessed(sig_text, verbose, fields, matches, tokens) for sig_text, matches, tokens in zip(sig_texts, component_matches, sig_tokens)]
+        results = []
+        for i, (sig_text, matches, tokens) in enumerate(zip(sig_texts, component_matches, sig_tokens)):
+            start = time.perf_counter()
+            results.append(self.parse_preprocessed(sig_text, verbose, fields, matches, tokens))
+            sig_seconds[i] += time.perf_counter() - start
+        for i, seconds in enumerate(sig_seconds):
+            if seconds * 1000 > self.slow_ms:
+                self.check_slow_sig(original_sig_texts[i], i)
+        return results
+
+    # slow sig log
+    # with slow_ms set, parse / parse_batch time each sig, and any that took longer than slow_ms is parsed again on its
+    # own with each component parser timed, so a rare input that makes a pattern backtrack shows up along with the
+    # parser it's in - without profiling a whole run
+    # timing a batch is only a few clock reads per match, and it stops once slow_limit sigs have been kept
+
+    def is_timing(self):
+        return self.slow_ms is not None and self.slow_count < self.slow_limit
+
+    # keeps a profile of sig_text in slow_sigs if it took longer than slow_ms to parse: the end to end time in ms, and
+    # the time each component parser took in ms, slowest first ('sig' is the guardrails and the rest of the parse)
+    # seconds is the time it took to parse, or None to parse it again on its own (i.e. when it was parsed in a batch)
+    # index is where it was in the batch
+    def check_slow_sig(self, sig_text, index=None, seconds=None):
+        normalized_sig_text = self.get_normalized_sig_text(sig_text)
+        if seconds is None:
+            start = time.perf_counter()
+            self.parse_preprocessed(normalized_sig_text)
+            seconds = time.perf_counter() - start
+        if seconds * 1000 <= self.slow_ms or self.slow_count >= self.slow_limit:
+            return
+        parser_seconds = {}
+        component_matches = {}
+        for parser_type in self.get_parse_order(list(self.parsers)):
+            component_matches[parser_type] = []
+            for parser in self.parsers[parser_type]:
+                start = time.perf_counter()
+                if parser.anchor_types:
+                    component_matches[parser_type] += parser.parse_anchored(normalized_sig_text, component_matches)
                 else:
-                    d = doses[0]
-                    for f in frequencies:
-                        val = calculate_component(d, f, ignore_exclusion=strengths_as_doses)
-                        if val is None:
-                            valid = False
-                            break
-                        total += val
-                if valid:
-                    calculated_max_dose = total
-        
-        # Fallback to single match_dict calculation if complex calculation failed or wasn't applicable
-        if calculated_max_dose is None:
-             calculated_max_dose = calculate_component(match_dict, match_dict)
-             
-        # Check explicit max dose constraint
-        max_constraint = calculate_explicit_max(match_dict)
-        
-        if max_constraint and calculated_max_dose:
-             # Prefer the higher value based on previous logic "always prefer max over sig"? 
-             # Wait, code said: "requirements changed to always prefer max over sig"
-             # which implies return max_constraint if present?
-             # actually line 121: max = max_constraint OR calculated.
-             # but line 117 condition was complex.
-             # existing logic: if (calc or max) and (units match ...): return max or calc.
-             # assuming unit check passes (we don't have unit for explicit max easily available here except strings)
-             return max_constraint or calculated_max_dose
-             
-        return max_constraint or calculated_max_dose
+                    component_matches[parser_type] += parser.parse(normalized_sig_text)
+                parser_seconds[parser_type + '.' + type(parser).__name__] = time.perf_counter() - start
+        # the rest of the parse (guardrails, max_dose_per_day, ...)
+        start = time.perf_counter()
+        self.parse_preprocessed(normalized_sig_text, component_matches=component_matches)
+        parser_seconds[self.parser_type] = time.perf_counter() - start
+        self.slow_count += 1
+        self.slow_sigs.append({
+            'index': index,
+            'sig': sig_text,
+            'ms': round(seconds * 1000, 3),
+            'parsers': {name: round(seconds * 1000, 3) for name, seconds in sorted(parser_seconds.items(), key=lambda item: -item[1])},
+        })
+
+    # the slow sigs kept since the last call
+    def get_slow_sigs(self):
+        slow_sigs = self.slow_sigs
+        self.slow_sigs = []
+        return slow_sigs
+
+    # where a multi-step sig (tapers, titrations - i.e. "take 2 tablets daily for 7 days then 1 tablet daily") splits
+    # into steps - (start, end) of each step in the normalized sig, with no empty steps (so none for an empty sig)
+    # steps are split on SEQUENCE_SEPARATOR_PATTERN, and each of those pieces can be more than one step:
+    # - a change to an amount (i.e. "... for 7 days increase to 2 tablets daily") starts a step at the amount
+    # - a dose with its own duration right after a duration (i.e. "take 2 tablets daily for 7 days 1 tablet daily for
+    #   7 days") starts a step - normalizing the sig drops the commas, so this is how comma separated steps are split
+    # a change by an amount (i.e. "taper by 10 mg") depends on the step before it, so it's left in and the step is
+    # unparsable
+    # NOTE: anything else (i.e. "2 tablets daily on week 1 and 1 tablet daily on week 2") stays one step
+    def get_sequence_spans(self, sig_text):
+        spans = []
+        start = 0
+        for separator in list(SEQUENCE_SEPARATOR_PATTERN.finditer(sig_text)) + [None]:
+            end = separator.start() if separator else len(sig_text)
+            for change in list(SEQUENCE_CHANGE_PATTERN.finditer(sig_text, start, end)) + [None]:
+                change_start = change.start() if change else end
+                spans += self.get_duration_spans(sig_text, start, change_start)
+                start = change.end() if change else end
+            start = separator.end() if separator else end
+        return spans
+
+    # splits sig_text[start:end] after each duration that's followed by a dose with a duration of its own, as long as
+    # the step before it has a dose too (see get_sequence_spans)
+    def get_duration_spans(self, sig_text, start, end):
+        while start < end and sig_text[start] == ' ':
+            start += 1
+        while end > start and sig_text[end - 1] == ' ':
+            end -= 1
+        if start == end:
+            return []
+        step_text = sig_text[start:end]
+        duration_ends = sorted(m['duration_text_end'] for m in self.parse_component(step_text, 'duration') if m['duration'] is not None)
+        if len(duration_ends) < 2:
+            return [(start, end)]
+        dose_starts = [m['dose_text_start'] for m in self.parse_component(step_text, 'dose') if m['dose'] is not None]
+        spans = []
+        step_start = 0
+        for duration_end, next_duration_end in zip(duration_ends, duration_ends[1:]):
+            if any(step_start <= i < duration_end for i in dose_starts) and any(duration_end <= i < next_duration_end for i in dose_starts):
+                spans.append((start + step_start, start + duration_end))
+                step_start = duration_end
+                while step_text[step_start:step_start + 1] == ' ':
+                    step_start += 1
+        spans.append((start + step_start, end))
+        return spans
 
-    def parse(self, sig_text, verbose=False):
+    # parse a multi-step sig one step at a time (see get_sequence_spans) - each step is a full parse() result (with its
+    # own max_dose_per_day), along with its step number and where it is in the normalized sig
+    # the sig is only parsable if every step is, and then its max_dose_per_day is the highest of its steps' - a sig with
+    # no steps (i.e. "" or "then") isn't parsable
+    def parse_sequence(self, sig_text, verbose=False, fields=None):
+        return self.parse_sequences([sig_text], verbose, fields)[0]
+
+    # parse_sequence for a list of sigs - the steps of all of the sigs are parsed together with parse_batch
+    def parse_sequences(self, sig_texts, verbose=False, fields=None):
+        if verbose:
+            fields = None
+        sig_texts = [self.get_normalized_sig_text(sig_text) for sig_text in sig_texts]
+        sig_spans = [self.get_sequence_spans(sig_text) for sig_text in sig_texts]
+        step_results = iter(self.parse_batch([sig_text[start:end] for sig_text, spans in zip(sig_texts, sig_spans) for start, end in spans], verbose, fields))
+        results = []
+        for sig_text, spans in zip(sig_texts, sig_spans):
+            steps = []
+            for i, (start, end) in enumerate(spans):
+                step = dict(next(step_results))
+                step.update({'step': i + 1, 'step_text_start': start, 'step_text_end': end})
+                steps.append(step)
+            # NOTE: a projection without Is_Sig_Parsable counts every step as parsable, and one without dose counts every step as doseless
+            is_sig_parsable = bool(steps) and all(step.get('Is_Sig_Parsable', True) for step in steps)
+            max_doses_per_day = [step.get('max_dose_per_day') for step in steps if step.get('dose') is not None or step.get('max_dose_per_day') is not None]
+            # a step with a dose but no max_dose_per_day (i.e. "take 2 tablets on day 1") could be the largest, so the sig doesn't get one either
+            max_dose_per_day = max(max_doses_per_day) if max_doses_per_day and None not in max_doses_per_day and is_sig_parsable else None
+            results.append({
+                'sig_text': sig_text,
+                'max_dose_per_day': max_dose_per_day,
+                'Is_Sig_Parsable': is_sig_parsable,
+                'steps': steps,
+            })
+        return results
+
+    # component_matches optionally has the matches for each parser type already parsed from sig_text (see parse_batch)
+    # tokens are the lexer tokens for sig_text, if they've already been worked out
+    def parse_preprocessed(self, sig_text, verbose=False, fields=None, component_matches=None, tokens=None):
+        if verbose:
+            fields = None
+        parser_types, guardrails, readable = self.get_projection(fields)
         match_dict = dict(self.match_dict)
         #match_dict['original_sig_text'] = sig_text
-        sig_text = self.get_normalized_sig_text(sig_text)
-        
-        # Preprocess: Replace @ symbol with 'at' for better parsing
-        sig_text = re.sub(r'@', ' at ', sig_text)
-        sig_text = re.sub(r'\s+', ' ', sig_text).strip()  # Clean up extra spaces
-        
-        # Preprocess: "one and a half" -> 1.5
-        sig_text = re.sub(r'\bone\s+and\s+a\s+half\b', '1.5', sig_text, flags=re.I)
-        # Preprocess: Typo "tablet1" -> "tablet 1"
-        sig_text = re.sub(r'(tablet|capsule|pill)(\d+)', r'\1 \2', sig_text, flags=re.I)
-        # Preprocess: Typo "half a day" -> "0.5 tablet" (likely OCR error for half a tab)
-        sig_text = re.sub(r'\bhalf\s+a\s+day\b', '0.5 tablet', sig_text, flags=re.I)
-        
         match_dict['sig_text'] = sig_text
+        if not guardrails:
+            return {k: match_dict.get(k) for k in fields}
         match_dict['Is_Sig_Parsable'] = True # Default
+        match_dict['unparsable_reasons'] = []
         
         # Guardrail: "increasing nature" (titration, "then", "increase")
         # Now includes "and then" as titration indicator
         titration_pattern = re.compile(r'\b(and\s+then|then|titrat[e|i]\w*|increas[e|i]\w*|taper)\b', re.I)
         if titration_pattern.search(sig_text):
-            match_dict['Is_Sig_Parsable'] = False
+            self.set_unparsable(match_dict, 'titration')
         
         # Guardrail: Contradicting "daily" with specific days (Mon/Wed/Fri)
         # "daily every monday wednesday friday" is contradictory
         if re.search(r'\bdaily\b.*\b(monday|tuesday|wednesday|thursday|friday|saturday|sunday|mon\b|tue\b|wed\b|thu\b|fri\b|sat\b|sun\b)', sig_text, re.I):
             if re.search(r'\bevery\s+(monday|mon|tuesday|tue|wednesday|wed|thursday|thu|friday|fri)', sig_text, re.I):
-                match_dict['Is_Sig_Parsable'] = False
+                self.set_unparsable(match_dict, 'daily_with_days')
         
         # Guardrail: Redundant/contradicting fraction notation "1/2 one-half" or "one-half 1/2"
         if re.search(r'1/2\s+one[- ]?half|one[- ]?half\s+1/2', sig_text, re.I):
-            match_dict['Is_Sig_Parsable'] = False
+            self.set_unparsable(match_dict, 'repeated_fraction')
         
         # Guardrail: Typo in day names (concatenated without spaces)
         if re.search(r'(sunday|monday|tuesday|wednesday|thursday|friday|saturday){2,}', sig_text, re.I):
-            match_dict['Is_Sig_Parsable'] = False
+            self.set_unparsable(match_dict, 'joined_day_names')
 
         # Guardrail: Redundant "daily" + "every morning" (conflicting/redundant instruction)
         if re.search(r'\bdaily\b.*\bevery\s+morning\b|\bevery\s+morning\b.*\bdaily\b', sig_text, re.I):
-            match_dict['Is_Sig_Parsable'] = False
+            self.set_unparsable(match_dict, 'daily_every_morning')
         
         # Guardrail: Ambiguous "once a day [day names]" without "on" prefix
         # e.g., "once a day monday wednesday friday" is unclear - should be "once a day ON monday..."
         if re.search(r'\b(once|one time)\s+(a|per|each)\s+day\s+(monday|tuesday|wednesday|thursday|friday|saturday|sunday)', sig_text, re.I):
-            match_dict['Is_Sig_Parsable'] = False
+            self.set_unparsable(match_dict, 'once_a_day_days')
 
         all_matches = {}
+        if tokens is None:
+            tokens = tokenize(sig_text)
 
         # Common patterns for frequency refinement
         # Only match "true" generic daily frequencies. exclude multi-daily (bid, twice daily) and "every"
@@ -305,13 +652,13 @@ class SigParser(Parser):
                     return seg
             return None
 
-        for parser_type, parsers in self.parsers.items():
-            matches = []
-            
-            for parser in parsers:
-                match = parser.parse(sig_text)
-                if match:
-                    matches += match
+        if component_matches is None:
+            component_matches = {}
+            for parser_type in self.get_parse_order(parser_types):
+                component_matches[parser_type] = self.parse_component(sig_text, parser_type, tokens, component_matches)
+
+        for parser_type in parser_types:
+            matches = component_matches[parser_type]
             
             all_matches[parser_type] = matches
             
@@ -382,6 +729,8 @@ class SigParser(Parser):
         # Days of week factor will be applied AFTER refinement
         # to avoid double-counting with generic frequencies like "each week"
         days_factor = 1.0
+        # the frequencies from before the factor is applied (see get_pair_frequencies)
+        raw_frequencies = {}
         days_of_week_matches = [f for f in frequencies if f.get('day_of_week')]
         if days_of_week_matches:
             found_days = set()
@@ -486,6 +835,7 @@ class SigParser(Parser):
             
             # Only apply factor if days are the primary frequency indicator
             if not has_explicit_count:
+                raw_frequencies = {f['frequency_text_start']: f.get('frequency') for f in frequencies}
                 for f in frequencies:
                      if f.get('frequency') is not None:
                          try:
@@ -629,15 +979,14 @@ class SigParser(Parser):
                       else:
                            # Ambiguous mapping (e.g. 2 doses for 3 frequencies).
                            # Safer to mark unparsable
-                           match_dict['Is_Sig_Parsable'] = False
+                           self.set_unparsable(match_dict, 'ambiguous_dose_mapping')
                            is_compound = False
              elif len(frequencies) == 1:
                   # Merged to single frequency
                   is_compound = False
-                  match = doses[0]
-                  match.update(frequencies[0])
-                  for k, v in match.items():
-                      match_dict[k] = v
+                  for match in (doses[0], frequencies[0]):
+                      for k, v in match.items():
+                          match_dict[k] = v
                   match_dict['frequency'] = frequencies[0].get('frequency')
              else:
                   # All frequencies filtered out - use dose only
@@ -682,6 +1031,8 @@ class SigParser(Parser):
                     # Optimization: If dose text is identical in consequent parts, maybe omit it?
                     # But for safety, repeat it: "1 tab morning and 1 tab evening" is clear.
                     
+                    if not readable:
+                        continue
                     f_text = f.get('frequency_readable', '')
                     # Avoid redundant "at bedtime" if frequency has it (redundancy logic from standard path)
                     # Note: We don't have 'when' match here easily detached, assuming f_text covers it.
@@ -691,6 +1042,7 @@ class SigParser(Parser):
 
                 match_dict['frequency'] = total_freq
                 
+            if valid_pairs and readable:
                 # Reconstruct sig_readable
                 method = match_dict.get('method_readable') or ''
                 route = match_dict.get('route_readable') or ''
@@ -705,9 +1057,10 @@ class SigParser(Parser):
                 pieces = [method, combined_parts, route, duration, indication, additional_info]
                 match_dict['sig_readable'] = ' '.join([p for p in pieces if p])
                 match_dict['sig_readable'] = ' '.join(match_dict['sig_readable'].split()) # Clean spaces
-        if not is_compound:
+        if readable and not is_compound:
             match_dict['sig_readable'] = self.get_readable(match_dict)
-        match_dict ['max_dose_per_day'] = self.get_max_dose_per_day(match_dict, all_matches)
+        mdd_components = self.get_mdd_components(match_dict, all_matches)
+        match_dict ['max_dose_per_day'] = mdd.calculate_max_dose_per_day(mdd_components, self.excluded_dose_units)
 
 
         # Final Guardrails
@@ -727,7 +1080,7 @@ class SigParser(Parser):
 
         # Check for multiple unhandled doses
         if len(doses) > 1 and not is_compound:
-             match_dict['Is_Sig_Parsable'] = False
+             self.set_unparsable(match_dict, 'multiple_doses')
              
         # Check if max_dose calculation detected ambiguity (it returned None)
         # But wait, max_dose can be None for valid topical sigs.
@@ -735,48 +1088,43 @@ class SigParser(Parser):
         # get_max_dose_per_day is stateless.
         # Let's re-run ambiguity check just for the flag if we have matches.
         if all_matches and (self._check_ambiguity(sig_text, frequencies) or self._check_ambiguity(sig_text, doses)):
-             match_dict['Is_Sig_Parsable'] = False
+             self.set_unparsable(match_dict, 'ambiguous')
 
         if titration_pattern.search(sig_text):
-             match_dict['Is_Sig_Parsable'] = False
+             self.set_unparsable(match_dict, 'titration')
 
         # Guardrail: Check for unparsed digits (safety against missed doses/times/strengths)
         # If there are numbers in the text that weren't captured by any parser, we might be missing critical info.
         if match_dict.get('Is_Sig_Parsable'):
-             covered_indices = set()
-             for key, matches in matches_for_guardrail.items():
-                  if matches and isinstance(matches, list):
-                       for m in matches:
-                            # Infer keys based on parser name convention (e.g. dose_text_start)
-                            s_key = f"{key}_text_start"
-                            e_key = f"{key}_text_end"
-                            start = m.get(s_key)
-                            end = m.get(e_key)
-                            if start is not None and end is not None:
-                                 covered_indices.update(range(start, end))
-             
-             # Check all digits in the normalized text
-             for m in re.finditer(r'\d+', sig_text):
-                  start, end = m.span()
-                  # Check if the entire number span is covered
-                  # (range end is exclusive, but set check needs index check)
-                  span_indices = set(range(start, end))
-                  if not span_indices.issubset(covered_indices):
-                       # Found a number that wasn't parsed!
-                       match_dict['Is_Sig_Parsable'] = False
-                       break
+             uncovered_digits = self.get_uncovered_digits(tokens, matches_for_guardrail)
+             if uncovered_digits:
+                  # components skipped by a field projection can still cover a number, so only parse them when it matters
+                  skipped_types = [t for t in self.parsers if t not in matches_for_guardrail]
+                  for parser_type in skipped_types:
+                       matches_for_guardrail[parser_type] = self.parse_component(sig_text, parser_type, tokens)
+                  if skipped_types:
+                       uncovered_digits = self.get_uncovered_digits(tokens, matches_for_guardrail)
+                  if uncovered_digits:
+                       self.set_unparsable(match_dict, 'uncovered_digits')
+                       # (start, end) of the numbers in sig_text that no parser matched (verbose output only)
+                       match_dict['uncovered_digits'] = uncovered_digits
 
         # Safeguard: If we have Dose and Frequency matches, but Max Dose is None, mark Unparsable
         # This catches cases like conflicting frequencies leading to calculation failure
         if match_dict.get('Is_Sig_Parsable') and match_dict.get('max_dose_per_day') is None:
              if match_dict.get('dose') and match_dict.get('frequency'):
-                  match_dict['Is_Sig_Parsable'] = False
+                  self.set_unparsable(match_dict, 'no_max_dose')
 
         if not verbose:
+            output_keys = fields if fields is not None else self.OUTPUT_KEYS
             if not match_dict.get('Is_Sig_Parsable', True):
                 # Return all None except flag and sig_text
-                return {k: (match_dict.get(k) if k in ['sig_text', 'original_sig_text', 'Is_Sig_Parsable'] else None) for k in self.OUTPUT_KEYS}
-            return {k: match_dict.get(k) for k in self.OUTPUT_KEYS}
+                return {k: (match_dict.get(k) if k in self.UNGUARDED_KEYS + ['Is_Sig_Parsable'] else None) for k in output_keys}
+            return {k: match_dict.get(k) for k in output_keys}
+
+        # kept so max_dose_per_day can be recalculated without parsing the sig again (see get_max_doses_per_day)
+        match_dict['mdd_components'] = mdd_components
+        match_dict['pair_frequencies'] = self.get_pair_frequencies(match_dict, all_matches, raw_frequencies)
 
         # calculate admin instructions based on leftover pieces of sig
         # would need to calculate overlap in each of the match_dicts
@@ -784,6 +1132,12 @@ class SigParser(Parser):
         # i.e. 0,4|5,12|18,24
         return match_dict
 
+    # marks a sig unparsable, and records which guardrail did (see UNPARSABLE_REASONS)
+    def set_unparsable(self, match_dict, reason):
+        match_dict['Is_Sig_Parsable'] = False
+        if reason not in match_dict['unparsable_reasons']:
+            match_dict['unparsable_reasons'].append(reason)
+
     # infer method, dose_unit, and route from NDC or RXCUI
     def infer(self, match_dict, ndc=None, rxcui=None):
         sig_elements = ['method', 'dose_unit', 'route']
@@ -795,12 +1149,16 @@ class SigParser(Parser):
         return inferred
 
     # parse a csv
-    def parse_sig_csv(self, input_file='input.csv', output_file='output.csv'):
+    # fields limits the output columns (and the work done per sig) to a subset of OUTPUT_KEYS
+    # batch_size > 0 parses that many sigs at a time with parse_batch
+    # columnar=True collects the parsed sigs in a ResultRecords instead of a list of dicts (see parse_records)
+    def parse_sig_csv(self, input_file='input.csv', output_file='output.csv', fields=None, batch_size=0, columnar=False):
         input_folder = 'csv/'
         output_folder = input_folder + 'output/'
-        csv_columns = self.match_keys
+        csv_columns = fields if fields is not None else self.match_keys
         # create an empty list to collect the data
-        parsed_sigs = []
+        parsed_sigs = ResultRecords() if columnar else []
+        errors = []
         # open the file and read through it line by line
         try:
             input_file_path = input_folder + input_file
@@ -812,12 +1170,24 @@ class SigParser(Parser):
                 # reset csv file to beginning
                 csv_file.seek(0)
                 csv_reader = csv.reader(csv_file, delimiter=',')
+                batch = []
                 for row in csv_reader:
                     row_count += 1
-                    print_progress_bar(row_count, row_total)
                     sig = row[0]
-                    parsed_sig = self.parse(sig)
-                    parsed_sigs.append(parsed_sig.copy())
+                    if batch_size > 0:
+                        batch.append(sig)
+                        if len(batch) == batch_size or row_count == row_total:
+                            try:
+                                parsed_sigs.extend(self.parse_batch(batch, fields=fields))
+                            except Exception:
+                                # parse one at a time to find the sig(s) that raised
+                                for batch_row, batch_sig in enumerate(batch, row_count - len(batch) + 1):
+                                    parsed_sigs.append(self.parse_isolated(batch_sig, batch_row, fields, errors))
+                            batch = []
+                            print_progress_bar(row_count, row_total)
+                        continue
+                    print_progress_bar(row_count, row_total)
+                    parsed_sigs.append(self.parse_isolated(sig, row_count, fields, errors))
         except Exception as e:
             print(f"Error reading CSV: {e}")
             import traceback
@@ -835,8 +1205,22 @@ class SigParser(Parser):
             import traceback
             traceback.print_exc()
 
+        if errors:
+            print(f"{len(errors)} sig(s) couldn't be parsed:")
+            for row, sig, error in errors:
+                print(f"  row {row}: {sig} ({error})")
+
         return parsed_sigs
 
+    # parse() for one row of a csv - a sig that raises is reported in errors as (row, sig, error) and written as
+    # unparsable, so one bad sig doesn't stop the rest of the file
+    def parse_isolated(self, sig_text, row, fields, errors):
+        try:
+            return self.parse(sig_text, fields=fields).copy()
+        except Exception as e:
+            errors.append((row, sig_text, type(e).__name__ + ': ' + str(e)))
+            return self.get_unparsable(sig_text, fields=fields)
+
 def print_progress_bar (iteration, total, prefix = 'Progress:', suffix = 'complete', decimals = 1, length = 50, fill = '#', print_end = "\r"):
     percent = ("{0:." + str(decimals) + "f}").format(100 * (iteration / float(total)))
     filled_length = int(length * iteration // total)
@@ -0,0 +1,62 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.classes.parser import Parser, BATCH_SEPARATOR
+from parsers.sig import SigParser
+
+class NumberParser(Parser):
+    parser_type = 'number'
+    match_keys = ['number', 'number_text_start', 'number_text_end']
+    # \s* runs over the separator, so these matches have to be re-parsed per sig
+    pattern = r'(?P<number>\d+)\s*'
+    def normalize_match(self, match):
+        return self.generate_match({'number': match.group('number'), 'number_text_start': match.start(), 'number_text_end': match.end()})
+
+class TestBatchParse(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = [
+            "take 1-2 tab po qid x7d prn pain",
+            "take 2 tablets in the morning and 1 at night",
+            "take 1 tablet by mouth on monday wednesdays and Fridays",
+            "apply topically to affected area twice daily for 7 days",
+            "apply to affected areas of back and hand bid, do not cover",
+            "inhale 2 puffs every 4 hours as needed for shortness of breath",
+            "instill 1 drop in each eye twice daily",
+            "take 1 tablet by mouth every 6 hours as needed for pain max 4 tablets per day",
+            "take one tablet by mouth twice daily at 9am-5p",
+            "take 1 tablet by mouth once daily for 7 days then 2 tablets once daily",
+            "take 0.5 tablets by mouth 2 times daily 1/2 tab bid",
+            "2",
+            "",
+            "use as directed",
+        ]
+
+    def test_batch_matches_per_sig_parse(self):
+        sigs = self.sigs + list(reversed(self.sigs))
+        for verbose in (False, True):
+            expected = [self.parser.parse(sig, verbose=verbose) for sig in sigs]
+            for sig, res, expected_res in zip(sigs, self.parser.parse_batch(sigs, verbose=verbose), expected):
+                with self.subTest(sig=sig, verbose=verbose):
+                    self.assertEqual(res, expected_res)
+
+    def test_batch_with_fields(self):
+        fields = ['max_dose_per_day', 'Is_Sig_Parsable']
+        expected = [self.parser.parse(sig, fields=fields) for sig in self.sigs]
+        self.assertEqual(self.parser.parse_batch(self.sigs, fields=fields), expected)
+
+    def test_match_across_separator(self):
+        parser = NumberParser()
+        sigs = ['take 2', '3 tabs 4 times', 'take 5']
+        starts = [0, 7, 22]
+        ends = [6, 21, 28]
+        buffer = BATCH_SEPARATOR.join(sigs)
+        self.assertEqual(buffer[starts[2]:ends[2]], 'take 5')
+        self.assertEqual(parser.parse_batch(buffer, starts, ends), [parser.parse(sig) for sig in sigs])
+
+if __name__ == '__main__':
+    unittest.main()
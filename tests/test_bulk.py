@@ -0,0 +1,182 @@
+import unittest
+import sys
+import os
+import csv
+import json
+import tempfile
+import io
+import gzip
+from unittest import mock
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services.bulk import parse_file, parse_chunks, parse_stream, get_checkpoint_file, read_checkpoint, get_dead_letter_file, split_input
+from parsers.sig import SigParser
+
+# raises on any sig containing 'fail', like a sig that trips up one of the parsers
+class FailingSigParser(SigParser):
+    def parse(self, sig_text, verbose=False, fields=None):
+        if 'fail' in sig_text:
+            raise RuntimeError('parse failed')
+        return super().parse(sig_text, verbose, fields)
+
+    def parse_batch(self, sig_texts, verbose=False, fields=None):
+        if any('fail' in sig_text for sig_text in sig_texts):
+            raise RuntimeError('parse failed')
+        return super().parse_batch(sig_texts, verbose, fields)
+
+# stands in for the progress bar to kill a run part of the way through (after the chunk's checkpoint is written)
+def crash_at(rows):
+    def print_progress_bar(row_count, row_total):
+        if row_count >= rows:
+            raise RuntimeError('run killed')
+    return print_progress_bar
+
+class TestBulkParse(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = ["take 1-2 tab po qid x7d prn pain", "use as directed", "", "take 1 tablet at bedtime", "take 2 tablets in the morning and 1 at night"] * 3
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get_path(self, file_name):
+        return os.path.join(self.tmp.name, file_name)
+
+    def write_ndjson(self, file_name, records):
+        with open(self.get_path(file_name), 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + '\n')
+
+    def read_ndjson(self, file_name):
+        with open(self.get_path(file_name)) as f:
+            return [json.loads(line) for line in f]
+
+    def test_parse_chunks(self):
+        chunks = list(parse_chunks(self.sigs, self.parser, chunk_size=4))
+        self.assertEqual([len(chunk) for chunk, results, errors in chunks], [4, 4, 4, 3])
+        self.assertEqual([result for chunk, results, errors in chunks for result in results], [self.parser.parse(sig) for sig in self.sigs])
+        self.assertEqual([errors for chunk, results, errors in chunks], [[]] * 4)
+
+    def test_ndjson_passthrough(self):
+        self.write_ndjson('input.ndjson', [{'id': i, 'sig': sig, 'meta': {'source': 'test'}} for i, sig in enumerate(self.sigs)])
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                self.assertEqual(parse_file(self.get_path('input.ndjson'), self.get_path('output.jsonl'), chunk_size=4, workers=workers, progress=False), {'rows': len(self.sigs), 'errors': 0, 'dead_letter_file': None})
+                self.assertFalse(os.path.exists(get_dead_letter_file(self.get_path('output.jsonl'))))
+                output = self.read_ndjson('output.jsonl')
+                self.assertEqual([record['id'] for record in output], list(range(len(self.sigs))))
+                self.assertEqual(output[0]['meta'], {'source': 'test'})
+                self.assertEqual([record['parsed'] for record in output], [self.parser.parse(sig) for sig in self.sigs])
+
+    def test_verbose_and_sig_field(self):
+        self.write_ndjson('input.ndjson', [{'text': sig} for sig in self.sigs[:3]])
+        parse_file(self.get_path('input.ndjson'), self.get_path('output.ndjson'), verbose=True, sig_field='text', progress=False)
+        expected = json.loads(json.dumps([self.parser.parse(sig, verbose=True) for sig in self.sigs[:3]], default=str))
+        self.assertEqual([record['parsed'] for record in self.read_ndjson('output.ndjson')], expected)
+
+    def test_csv_to_csv(self):
+        with open(self.get_path('input.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            for sig in self.sigs:
+                writer.writerow([sig])
+        fields = ['sig_text', 'max_dose_per_day']
+        parse_file(self.get_path('input.csv'), self.get_path('output.csv'), fields=fields, progress=False)
+        with open(self.get_path('output.csv'), newline='') as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([row['max_dose_per_day'] for row in rows], [str(self.parser.parse(sig, fields=fields)['max_dose_per_day'] or '') for sig in self.sigs])
+
+    def test_text_stream(self):
+        # one sig per line, blank lines included, so output lines up with input
+        in_file = io.StringIO('\n'.join(self.sigs) + '\n')
+        out_file = io.StringIO()
+        self.assertEqual(parse_stream(in_file, out_file, 'text', 'ndjson', self.parser, chunk_size=4), {'rows': len(self.sigs), 'errors': 0})
+        self.assertEqual([json.loads(line) for line in out_file.getvalue().splitlines()], [self.parser.parse(sig) for sig in self.sigs])
+        with self.assertRaises(ValueError):
+            parse_stream(io.StringIO(''), io.StringIO(), 'text', 'fhir')
+
+    def test_checkpoint_resume(self):
+        sigs = self.sigs + ['fail'] + self.sigs
+        for input_file, output_file in (('input.csv', 'output.csv'), ('input.ndjson', 'output.ndjson')):
+            for workers in (0, 2):
+                with self.subTest(input_file=input_file, workers=workers):
+                    if input_file.endswith('.csv'):
+                        with open(self.get_path(input_file), 'w', newline='') as f:
+                            writer = csv.writer(f)
+                            for sig in sigs:
+                                writer.writerow([sig])
+                    else:
+                        self.write_ndjson(input_file, [{'sig': sig, 'id': i} for i, sig in enumerate(sigs)])
+                    parse_file(self.get_path(input_file), self.get_path('expected_' + output_file), progress=False)
+                    with mock.patch('parsers.services.bulk.print_progress_bar', crash_at(12)), self.assertRaises(RuntimeError):
+                        parse_file(self.get_path(input_file), self.get_path(output_file), chunk_size=4, workers=workers, checkpoint=True)
+                    checkpoint = read_checkpoint(get_checkpoint_file(self.get_path(output_file)))
+                    self.assertEqual(checkpoint['rows'], 12)
+                    self.assertEqual(parse_file(self.get_path(input_file), self.get_path(output_file), chunk_size=4, resume=True, progress=False)['rows'], len(sigs))
+                    self.assertFalse(os.path.exists(get_checkpoint_file(self.get_path(output_file))))
+                    with open(self.get_path(output_file), 'rb') as f, open(self.get_path('expected_' + output_file), 'rb') as expected:
+                        self.assertEqual(f.read(), expected.read())
+
+    def test_dead_letter(self):
+        sigs = self.sigs[:5] + ['fail'] + self.sigs[5:9] + ['fail again']
+        self.write_ndjson('input.ndjson', [{'sig': sig, 'id': i} for i, sig in enumerate(sigs)])
+        for workers in (0, 2):
+            with self.subTest(workers=workers):
+                summary = parse_file(self.get_path('input.ndjson'), self.get_path('output.ndjson'), FailingSigParser(), chunk_size=4, workers=workers, progress=False)
+                self.assertEqual(summary, {'rows': len(sigs), 'errors': 2, 'dead_letter_file': get_dead_letter_file(self.get_path('output.ndjson'))})
+                # the failed sigs are still in the output, as unparsable
+                output = self.read_ndjson('output.ndjson')
+                self.assertEqual([record['id'] for record in output], list(range(len(sigs))))
+                self.assertEqual(output[5]['parsed'], self.parser.get_unparsable('fail'))
+                self.assertFalse(output[5]['parsed']['Is_Sig_Parsable'])
+                self.assertEqual([record['parsed'] for record in output[:5] + output[6:10]], [self.parser.parse(sig) for sig in sigs[:5] + sigs[6:10]])
+                errors = self.read_ndjson('output.ndjson.errors.ndjson')
+                self.assertEqual([(error['row'], error['sig'], error['error'], error['record']) for error in errors], [(6, 'fail', 'RuntimeError: parse failed', {'sig': 'fail', 'id': 5}), (11, 'fail again', 'RuntimeError: parse failed', {'sig': 'fail again', 'id': 10})])
+                self.assertIn('RuntimeError', errors[0]['traceback'])
+        # errors from before a resume are kept and counted
+        with mock.patch('parsers.services.bulk.print_progress_bar', crash_at(8)), self.assertRaises(RuntimeError):
+            parse_file(self.get_path('input.ndjson'), self.get_path('output.ndjson'), FailingSigParser(), chunk_size=4, checkpoint=True)
+        summary = parse_file(self.get_path('input.ndjson'), self.get_path('output.ndjson'), FailingSigParser(), chunk_size=4, resume=True, progress=False)
+        self.assertEqual(summary['errors'], 2)
+        self.assertEqual([error['row'] for error in self.read_ndjson('output.ndjson.errors.ndjson')], [6, 11])
+
+    def test_byte_ranges(self):
+        # quoted csv fields with newlines have to stay in one range
+        sigs = self.sigs + ['take 1 tablet\nby mouth "daily"', 'fail'] + self.sigs * 2
+        with open(self.get_path('input.csv'), 'w', newline='') as f:
+            writer = csv.writer(f)
+            for sig in sigs:
+                writer.writerow([sig])
+        self.write_ndjson('input.ndjson', [{'sig': sig, 'id': i} for i, sig in enumerate(sigs)])
+        with mock.patch('parsers.services.bulk.MIN_RANGE_SIZE', 64):
+            for input_file, output_file in (('input.csv', 'output.csv'), ('input.ndjson', 'output.ndjson')):
+                with self.subTest(input_file=input_file):
+                    input_format = os.path.splitext(input_file)[1][1:]
+                    self.assertGreater(len(split_input(self.get_path(input_file), input_format, 2)), 2)
+                    parse_file(self.get_path(input_file), self.get_path('expected_' + output_file), FailingSigParser(), chunk_size=4, progress=False)
+                    summary = parse_file(self.get_path(input_file), self.get_path(output_file), FailingSigParser(), chunk_size=4, workers=2, progress=False)
+                    self.assertEqual((summary['rows'], summary['errors']), (len(sigs), 1))
+                    for file_name in (output_file, output_file + '.errors.ndjson'):
+                        with open(self.get_path(file_name), 'rb') as f, open(self.get_path('expected_' + file_name), 'rb') as expected:
+                            self.assertEqual(f.read(), expected.read())
+            # compressed input is read as a stream
+            with gzip.open(self.get_path('input.ndjson.gz'), 'wb') as f, open(self.get_path('input.ndjson'), 'rb') as input_file:
+                f.write(input_file.read())
+            self.assertIsNone(split_input(self.get_path('input.ndjson.gz'), 'ndjson', 2))
+
+    def test_invalid_files(self):
+        self.write_ndjson('input.ndjson', [{'sig': 'take 1 tab po bid'}])
+        with self.assertRaises(ValueError):
+            parse_file(self.get_path('input.ndjson'), self.get_path('output.txt'), progress=False)
+        with self.assertRaises(ValueError):
+            parse_file(self.get_path('input.ndjson'), self.get_path('output.csv'), verbose=True, progress=False)
+        self.write_ndjson('bad.ndjson', ['take 1 tab po bid'])
+        with self.assertRaises(ValueError):
+            parse_file(self.get_path('bad.ndjson'), self.get_path('output.ndjson'), progress=False)
+        with self.assertRaises(ValueError):
+            parse_file(self.get_path('input.ndjson'), self.get_path('output.ndjson.gz'), checkpoint=True, progress=False)
+
+if __name__ == '__main__':
+    unittest.main()
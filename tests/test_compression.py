@@ -0,0 +1,78 @@
+import unittest
+import sys
+import os
+import io
+import gzip
+import json
+import tempfile
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services import compression
+from parsers.services.compression import open_input, open_output, open_text_output, split_compression
+from parsers.services.bulk import parse_file, get_file_format
+
+class TestCompression(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.text = ''.join('take ' + str(i) + ' tablets by mouth daily\n' for i in range(20000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get_path(self, file_name):
+        return os.path.join(self.tmp.name, file_name)
+
+    def test_split_compression(self):
+        self.assertEqual(split_compression('input.ndjson.gz'), ('input.ndjson', 'gzip'))
+        self.assertEqual(split_compression('input.csv.zst'), ('input.csv', 'zstd'))
+        self.assertEqual(split_compression('input.csv'), ('input.csv', None))
+        self.assertEqual(get_file_format('input.jsonl.gz'), 'ndjson')
+
+    def test_gzip_round_trip(self):
+        with open_output(self.get_path('sigs.txt.gz')) as f:
+            f.write(self.text)
+        with gzip.open(self.get_path('sigs.txt.gz'), 'rt') as f:
+            self.assertEqual(f.read(), self.text)
+        # detected by magic bytes, not extension
+        os.rename(self.get_path('sigs.txt.gz'), self.get_path('sigs.txt'))
+        with open_input(self.get_path('sigs.txt')) as f:
+            self.assertEqual(f.read(), self.text)
+
+    @unittest.skipUnless(compression.zstandard, 'zstandard not installed')
+    def test_zstd_round_trip(self):
+        with open_output(self.get_path('sigs.txt.zst')) as f:
+            f.write(self.text)
+        with open_input(self.get_path('sigs.txt.zst')) as f:
+            self.assertEqual(f.read(), self.text)
+
+    def test_unclosed_output(self):
+        stream = io.BytesIO()
+        f = open_text_output(stream, 'gzip', closefd=False)
+        f.write(self.text)
+        f.close()
+        self.assertFalse(stream.closed)
+        self.assertEqual(gzip.decompress(stream.getvalue()).decode('utf-8'), self.text)
+
+    def test_corrupt_input(self):
+        with open(self.get_path('bad.gz'), 'wb') as f:
+            f.write(b'\x1f\x8b' + b'x' * 100)
+        with self.assertRaises(OSError):
+            with open_input(self.get_path('bad.gz')) as f:
+                f.read()
+
+    def test_compressed_parse_file(self):
+        sigs = ["take 1-2 tab po qid x7d prn pain", "use as directed", "take 1 tablet at bedtime"] * 4
+        with gzip.open(self.get_path('input.ndjson.gz'), 'wt') as f:
+            for sig in sigs:
+                f.write(json.dumps({'sig': sig}) + '\n')
+        parse_file(self.get_path('input.ndjson.gz'), self.get_path('plain.ndjson'), chunk_size=5, progress=False)
+        parse_file(self.get_path('input.ndjson.gz'), self.get_path('output.ndjson'), chunk_size=5, progress=False, compression='gzip')
+        with open(self.get_path('plain.ndjson'), 'rb') as plain, gzip.open(self.get_path('output.ndjson'), 'rb') as compressed:
+            self.assertEqual(compressed.read(), plain.read())
+        with self.assertRaises(ValueError):
+            parse_file(self.get_path('input.ndjson.gz'), self.get_path('output.ndjson'), progress=False, compression='bz2')
+
+if __name__ == '__main__':
+    unittest.main()
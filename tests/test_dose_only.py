@@ -0,0 +1,68 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import dose
+from parsers.sig import SigParser
+
+class TestDoseOnly(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.dose_only = [parser for parser in dose.parsers if isinstance(parser, dose.DoseOnlyParser)][0]
+
+    def test_anchored(self):
+        cases = [
+            ("take 1 po qd", ['1']),
+            ("one by mouth daily", ['one']),
+            ("take 2 every 4 hours", ['2']),
+            ("1.5", ['1.5']),
+            # a method right before the number is an anchor too
+            ("take 2", ['2']),
+            ("take 5 daily", ['5']),
+            # "day 1" and "4-6 hours" aren't doses
+            ("take 2 tablets by mouth on day 1 then 1 tablet daily", ['2', '1']),
+            ("take 1 tablet by mouth every 4-6 hours", ['1']),
+        ]
+        for sig, doses in cases:
+            with self.subTest(sig=sig):
+                self.assertEqual([match['dose_text'] for match in self.dose_only.parse(sig)], doses)
+
+    def test_sigs(self):
+        result = self.parser.parse("take 1 tablet by mouth every 4-6 hours as needed for moderate to severe pain")
+        self.assertEqual(result['dose'], 1)
+        self.assertTrue(result['Is_Sig_Parsable'])
+        result = self.parser.parse("take 1 po qd")
+        self.assertEqual((result['dose'], result['frequency']), (1, 1))
+        for sig in ("take 2", "take 5"):
+            with self.subTest(sig=sig):
+                self.assertTrue(self.parser.parse(sig)['Is_Sig_Parsable'])
+
+    def test_uncovered(self):
+        # the 0.5 isn't a dose, and the indication ("for one week 0.5") runs over the duration so it doesn't cover it
+        result = self.parser.parse("take 1-2 tabs at 9am on mon for one week 0.5", verbose=True)
+        self.assertFalse(result['Is_Sig_Parsable'])
+        self.assertEqual(result['unparsable_reasons'], ['uncovered_digits'])
+        self.assertIsNone(self.parser.parse("take 1-2 tabs at 9am on mon for one week 0.5")['max_dose_per_day'])
+
+    def test_indication_covers_own_numbers(self):
+        # an indication still covers its numbers when nothing else was found inside it, and "for 1 week" is a duration
+        for sig in ("take 1 tablet by mouth daily for 1 week", "take 1 capsule at bedtime for 1 week", "use 1 patch every 72 hours for 1 week", "take 1 tablet daily for 1 month", "inject 2 units as needed for blood sugar over 200"):
+            with self.subTest(sig=sig):
+                result = self.parser.parse(sig, verbose=True)
+                self.assertTrue(result['Is_Sig_Parsable'])
+                self.assertEqual(result['unparsable_reasons'], [])
+        self.assertEqual(self.parser.parse("take 1 tablet by mouth daily for 1 week", verbose=True)['duration_readable'], 'for 1 week')
+        self.assertEqual(self.parser.parse("take 1 tablet daily for 1 month", verbose=True)['duration_readable'], 'for 1 month')
+
+    def test_sig_parser_anchors(self):
+        # the anchors SigParser passes in are the same as the ones the parser finds on its own
+        for sig in ("take 1 po qd", "take 2 every 4 hours", "take 2 tablets by mouth on day 1 then 1 tablet daily", "one or two by mouth at bedtime"):
+            with self.subTest(sig=sig):
+                component_matches = {parser_type: self.parser.parse_component(sig, parser_type) for parser_type in self.dose_only.anchor_types}
+                self.assertEqual(self.dose_only.parse_anchored(sig, component_matches), self.dose_only.parse(sig))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import csv
+import json
+import tempfile
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services.fhir import get_dosage, get_dosage_instruction, get_days_of_week, export_dosage_ndjson
+from parsers.sig import SigParser
+
+class TestFhirDosage(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+
+    def get_dosage(self, sig):
+        return get_dosage(self.parser.parse(sig, verbose=True))
+
+    def test_dosage(self):
+        dosage = self.get_dosage("take 1-2 tab po qid x7d prn pain")
+        self.assertEqual(dosage['text'], "take 1-2 tab po qid x7d prn pain")
+        self.assertEqual(dosage['timing'], {'repeat': {'frequency': 4, 'period': 1, 'periodUnit': 'd', 'boundsDuration': {'value': 7, 'unit': 'day', 'system': 'http://unitsofmeasure.org', 'code': 'd'}}})
+        self.assertEqual(dosage['asNeededCodeableConcept'], {'text': 'pain'})
+        self.assertEqual(dosage['route'], {'text': 'by mouth'})
+        self.assertEqual(dosage['method'], {'text': 'take'})
+        self.assertEqual(dosage['doseAndRate'], [{'doseRange': {'low': {'value': 1, 'unit': 'tablet'}, 'high': {'value': 2, 'unit': 'tablet'}}}])
+
+    def test_strength_as_dose(self):
+        dosage = self.get_dosage("take 500 mg by mouth twice daily with food")
+        self.assertEqual(dosage['doseAndRate'], [{'doseQuantity': {'value': 500, 'unit': 'mg', 'system': 'http://unitsofmeasure.org', 'code': 'mg'}}])
+        self.assertEqual(dosage['timing']['repeat']['when'], ['C'])
+        self.assertNotIn('asNeededBoolean', dosage)
+
+    def test_days_of_week(self):
+        self.assertEqual(self.get_dosage("take 1 tablet by mouth on monday wednesdays and Fridays")['timing']['repeat']['dayOfWeek'], ['mon', 'wed', 'fri'])
+        self.assertEqual(get_days_of_week('mwf'), ['mon', 'wed', 'fri'])
+        self.assertEqual(get_days_of_week('tu, th'), ['tue', 'thu'])
+
+    def test_unparsable(self):
+        self.assertEqual(self.get_dosage("take 1 tablet daily then increase to 2 tablets daily"), {'text': "take 1 tablet daily then increase to 2 tablets daily"})
+
+    def test_compound(self):
+        result = self.parser.parse("take 1 tab in the morning and 2 tabs at bedtime", verbose=True)
+        dosages = get_dosage_instruction(result)
+        self.assertEqual([dosage['doseAndRate'] for dosage in dosages], [[{'doseQuantity': {'value': 1, 'unit': 'tablet'}}], [{'doseQuantity': {'value': 2, 'unit': 'tablet'}}]])
+        self.assertEqual([dosage['timing'] for dosage in dosages], [{'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'when': ['MORN']}}, {'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'when': ['HS']}}])
+        # taken at the same time, so they have the same sequence
+        self.assertEqual([dosage['sequence'] for dosage in dosages], [1, 1])
+        # it can't be one Dosage
+        self.assertEqual(get_dosage(result), {'text': "take 1 tab in the morning and 2 tabs at bedtime"})
+        self.assertEqual(get_dosage_instruction(self.parser.parse("take 1 tab po bid", verbose=True)), [self.get_dosage("take 1 tab po bid")])
+
+    def test_compound_days_of_week(self):
+        # each pair keeps its frequency as written (not spread over the week) and gets the days of week
+        dosages = get_dosage_instruction(self.parser.parse("take 1 tablet in the morning and 2 tablets in the evening on monday wednesday friday", verbose=True))
+        self.assertEqual([dosage['timing'] for dosage in dosages], [
+            {'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'dayOfWeek': ['mon', 'wed', 'fri'], 'when': ['MORN']}},
+            {'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'dayOfWeek': ['mon', 'wed', 'fri'], 'when': ['EVE']}},
+        ])
+        dosages = get_dosage_instruction(self.parser.parse("take 2 tablets every monday and 1 tablet every friday", verbose=True))
+        self.assertEqual([dosage['doseAndRate'] for dosage in dosages], [[{'doseQuantity': {'value': 2, 'unit': 'tablet'}}], [{'doseQuantity': {'value': 1, 'unit': 'tablet'}}]])
+        self.assertEqual([dosage['timing'] for dosage in dosages], [
+            {'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'dayOfWeek': ['mon']}},
+            {'repeat': {'frequency': 1, 'period': 1, 'periodUnit': 'd', 'dayOfWeek': ['fri']}},
+        ])
+
+    def test_original_text(self):
+        result = self.parser.parse("Take 1 tab PO BID", verbose=True)
+        self.assertEqual(get_dosage(result)['text'], "take 1 tab po bid")
+        result['original_sig_text'] = "Take 1 tab PO BID"
+        self.assertEqual(get_dosage(result)['text'], "Take 1 tab PO BID")
+
+    def test_export_ndjson(self):
+        sigs = ["take 1-2 tab po qid x7d prn pain", "Use as directed", "", "take 1 tablet at bedtime", "take 1 tab in the morning and 2 tabs at bedtime", "inhale 2 puffs every 4 hours as needed"] * 5
+        with tempfile.TemporaryDirectory() as tmp:
+            input_file = os.path.join(tmp, 'input.csv')
+            with open(input_file, 'w', newline='') as f:
+                writer = csv.writer(f)
+                for sig in sigs:
+                    writer.writerow([sig])
+            expected = []
+            for sig in sigs:
+                result = self.parser.parse(sig, verbose=True)
+                result['original_sig_text'] = sig
+                expected.append(get_dosage_instruction(result))
+            self.assertEqual(expected[1][0]['text'], "Use as directed")
+            for workers in (0, 2):
+                with self.subTest(workers=workers):
+                    output_file = os.path.join(tmp, 'output.ndjson')
+                    self.assertEqual(export_dosage_ndjson(input_file, output_file, chunk_size=3, workers=workers, progress=False)['rows'], len(sigs))
+                    with open(output_file) as f:
+                        self.assertEqual([json.loads(line) for line in f], expected)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.sig import SigParser
+
+class TestFieldProjection(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = [
+            "take 2 tablets in the morning and 1 at night",
+            "take 1 tablet by mouth on monday wednesdays and Fridays",
+            "take 1 tablet by mouth every 6 hours as needed for pain max 4 tablets per day",
+            "apply topically to affected area twice daily for 7 days",
+            "take 0.5 tablets by mouth 2 times daily 1/2 tab bid",
+            "take 1 tablet by mouth once daily for 7 days then 2 tablets once daily",
+        ]
+
+    def test_projection_matches_full_parse(self):
+        # every projected field has to match the same field from a full parse
+        for sig in self.sigs:
+            full = self.parser.parse(sig)
+            for field in self.parser.OUTPUT_KEYS:
+                with self.subTest(sig=sig, field=field):
+                    self.assertEqual(self.parser.parse(sig, fields=[field]), {field: full[field]})
+
+    def test_projection_keeps_field_order(self):
+        res = self.parser.parse("take 1 bid", fields=['max_dose_per_day', 'Is_Sig_Parsable'])
+        self.assertEqual(list(res.keys()), ['max_dose_per_day', 'Is_Sig_Parsable'])
+        self.assertEqual(res['max_dose_per_day'], 2.0)
+        self.assertTrue(res['Is_Sig_Parsable'])
+
+    def test_invalid_field(self):
+        with self.assertRaises(ValueError):
+            self.parser.parse("take 1 bid", fields=['not_a_field'])
+
+    def test_verbose_ignores_fields(self):
+        res = self.parser.parse("take 1 bid", verbose=True, fields=['sig_text'])
+        self.assertIn('frequency_readable', res)
+
+if __name__ == '__main__':
+    unittest.main()
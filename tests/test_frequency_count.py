@@ -0,0 +1,45 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import frequency
+from parsers.classes.parser import BATCH_SEPARATOR
+
+class TestFrequencyCount(unittest.TestCase):
+    def setUp(self):
+        self.parsers = [parser for parser in frequency.parsers if isinstance(parser, frequency.FrequencyCountParser)]
+        self.sigs = [
+            "take 1-2 tablets 3 times a day",
+            "take 1 tablet twice daily and once weekly",
+            "take one to two tablets 2x per day",
+            "take 1 or 2 tablets 1 or 2 times per day",
+            "take 1 tablet daily",
+            "use 2 sprays each nostril 2 x per d",
+            "apply 3 times/day for 10 days",
+            "take 1 tablet by mouth at bedtime",
+            "xone time per day",
+            "TAKE 2 TIMES DAILY",
+            "take 1 tablet twice K day",
+            "",
+        ]
+
+    def test_same_matches_as_pattern(self):
+        for parser in self.parsers:
+            for sig in self.sigs:
+                with self.subTest(parser=type(parser).__name__, sig=sig):
+                    self.assertEqual([m.span() for m in parser.finditer(parser.pattern, sig)], [m.span() for m in parser.pattern.finditer(sig)])
+            buffer = BATCH_SEPARATOR.join(self.sigs)
+            with self.subTest(parser=type(parser).__name__, batch=True):
+                self.assertEqual([m.span() for m in parser.finditer(parser.batch_pattern, buffer)], [m.span() for m in parser.batch_pattern.finditer(buffer)])
+
+    def test_scanner(self):
+        scanner = frequency.FrequencyCountScanner()
+        self.assertEqual(scanner.get_starts("take 1 tablet by mouth at bedtime"), [])
+        self.assertEqual(scanner.get_starts("take 2 tablets twice daily"), [15])
+        self.assertEqual(scanner.get_starts("take 2 times a day or twice weekly"), [5, 22])
+
+if __name__ == '__main__':
+    unittest.main()
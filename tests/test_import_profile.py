@@ -0,0 +1,30 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services.import_profile import profile_imports
+
+class TestImportProfile(unittest.TestCase):
+    def test_profile_imports(self):
+        steps = ['parsers.services.normalize', 'parsers.services.infer', 'parsers.classes.parser', 'parsers.method', 'parsers.route']
+        profile = profile_imports(repeat=1, steps=steps)
+        self.assertFalse(profile['snapshot'])
+        self.assertEqual([result['step'] for result in profile['steps']], steps)
+        for result in profile['steps']:
+            with self.subTest(step=result['step']):
+                self.assertGreaterEqual(result['seconds'], 0)
+                self.assertIn('allocated_bytes', result)
+                self.assertIn('peak_bytes', result)
+        by_step = {result['step']: result for result in profile['steps']}
+        self.assertEqual(by_step['parsers.route']['parsers'], 6)
+        self.assertGreater(by_step['parsers.route']['pattern_bytes'], 0)
+        # the normalize.py patterns star imported into the parser modules are only counted once
+        self.assertGreater(by_step['parsers.services.normalize']['patterns'], 0)
+        self.assertEqual(by_step['parsers.classes.parser']['patterns'], 0)
+        self.assertAlmostEqual(profile['seconds'], sum(result['seconds'] for result in profile['steps']), places=5)
+
+if __name__ == '__main__':
+    unittest.main()
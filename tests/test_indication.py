@@ -0,0 +1,41 @@
+import unittest
+import re
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services.normalize import INDICATIONS, INDICATION_PATTERN, get_first_char, get_indexed_alternation, get_indication
+
+class TestIndication(unittest.TestCase):
+    def setUp(self):
+        self.texts = [
+            "pain for up to 5 days for fever or for headache, take with food for stomach upset, use for anxiety",
+            "UTI and Cold sores",
+            "xuti or sob",
+            "bladder spasms, cough and congestion",
+            "chest pain",
+            "",
+        ]
+
+    def test_same_matches_as_alternation(self):
+        pattern = re.compile(r'(?P<indication>' + r'|'.join(v for p in INDICATIONS.values() for v in p) + r')', flags = re.I)
+        for text in self.texts:
+            with self.subTest(text=text):
+                self.assertEqual([(m.span(), m.group('indication')) for m in INDICATION_PATTERN.finditer(text)], [(m.span(), m.group('indication')) for m in pattern.finditer(text)])
+
+    def test_indexed_alternation(self):
+        self.assertEqual(get_first_char(r'\buti'), 'u')
+        self.assertIsNone(get_first_char('a?b'))
+        self.assertIsNone(get_first_char('ab|cd'))
+        # earlier patterns still win at the same position
+        pattern = re.compile(get_indexed_alternation(['cold', 'cold sore', r'[cs]ore', 'sore'], re.I), flags = re.I)
+        self.assertEqual(pattern.findall('Cold sore'), ['Cold', 'sore'])
+
+    def test_get_indication(self):
+        self.assertEqual(get_indication("pain for up to 5 days for fever"), 'pain,fever')
+        self.assertIsNone(get_indication("up to 5 days"))
+
+if __name__ == '__main__':
+    unittest.main()
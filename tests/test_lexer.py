@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services.lexer import normalize_sig_text, tokenize, has_digits, get_digit_spans
+from parsers.sig import SigParser
+
+class TestLexer(unittest.TestCase):
+    def test_normalize_sig_text(self):
+        test_cases = [
+            ("Take 1 Tab. PO (daily); @ 5:00 pm", "take 1 tab po daily at 5:00 pm"),
+            ("take one and a half tablet1 by mouth", "take 1.5 tablet 1 by mouth"),
+            ("take half a day   2.5 mg", "take 0.5 tablet 2.5 mg"),
+        ]
+        for sig, expected in test_cases:
+            with self.subTest(sig=sig):
+                self.assertEqual(normalize_sig_text(sig), expected)
+
+    def test_tokenize(self):
+        tokens = tokenize("take 1-2 tabs at 9am on mon for one week 0.5")
+        self.assertEqual([(t.kind, t.text) for t in tokens], [
+            ('WORD', 'take'), ('RANGE', '1-2'), ('WORD', 'tabs'), ('WORD', 'at'), ('TIME', '9am'),
+            ('WORD', 'on'), ('DAY', 'mon'), ('WORD', 'for'), ('NUMBER', 'one'), ('WORD', 'week'), ('NUMBER', '0.5'),
+        ])
+        self.assertEqual(tokens[1].start, 5)
+        self.assertEqual(tokens[1].end, 8)
+
+    def test_digits(self):
+        tokens = tokenize("take 1.5 tabs x7d at 10:30")
+        self.assertTrue(has_digits(tokens))
+        self.assertEqual(get_digit_spans(tokens), [(5, 6), (7, 8), (15, 16), (21, 23), (24, 26)])
+        self.assertFalse(has_digits(tokenize("take one tab daily")))
+
+    def test_prefilter(self):
+        # a parser can only be skipped if its pattern can't match the sig
+        parser = SigParser()
+        sig = "apply topically to affected area daily"
+        for parser_type, parsers in parser.parsers.items():
+            for p in parsers:
+                if not p.may_match(sig, False):
+                    with self.subTest(parser=type(p).__name__):
+                        self.assertIsNone(p.pattern.search(sig))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.classes.match import Match
+from parsers.dose import parsers as dose_parsers
+from parsers.sig import SigParser
+
+class TestMatch(unittest.TestCase):
+    def setUp(self):
+        self.parser = dose_parsers[0]
+
+    def test_generate_match(self):
+        match = self.parser.generate_match({'dose': 2, 'dose_unit': 'tablet'})
+        self.assertIsInstance(match, Match)
+        self.assertEqual(match['dose'], 2)
+        self.assertEqual(match.get('dose_unit'), 'tablet')
+        # keys that weren't passed default to None, same as the parser's match dict
+        self.assertEqual(match.keys(), list(self.parser.match_dict.keys()))
+        self.assertIsNone(match['dose_max'])
+        self.assertEqual(match.to_dict(), dict(self.parser.match_dict, dose=2, dose_unit='tablet'))
+
+    def test_invalid_key(self):
+        with self.assertRaises(ValueError):
+            self.parser.generate_match({'frequency': 2})
+        match = self.parser.generate_match({'dose': 2})
+        with self.assertRaises(KeyError):
+            match['frequency'] = 2
+        self.assertIsNone(match.get('frequency'))
+        self.assertNotIn('frequency', match)
+
+    def test_copy(self):
+        match = self.parser.generate_match({'dose': 2})
+        match_copy = match.copy()
+        match_copy['dose'] = 3
+        self.assertEqual(match['dose'], 2)
+        self.assertEqual(match_copy['dose'], 3)
+
+    def test_output_is_plain_dict(self):
+        res = SigParser().parse("take 1 tablet by mouth twice daily", verbose=True)
+        self.assertIs(type(res), dict)
+        self.assertFalse(any(isinstance(v, Match) for v in res.values()))
+
+if __name__ == '__main__':
+    unittest.main()
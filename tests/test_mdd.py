@@ -0,0 +1,70 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services import mdd
+from parsers.sig import SigParser
+
+class TestMaxDosePerDay(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = [
+            "take 1 tab po bid",
+            "take 1-2 tab po qid x7d prn pain",
+            "take 2 tablets in the morning and 1 at night",
+            "take 1 tablet by mouth morning and evening",
+            "take 1 tablet by mouth every 6 hours as needed for pain max 4 tablets per day",
+            "take 1 tablet in the morning or 2 tablets at night",
+            "take 500 mg by mouth twice daily",
+            "inhale 2 puffs every 4 hours as needed",
+            "instill 1 drop in each eye twice daily",
+            "apply topically to affected area twice daily",
+            "take 1 tablet every other week",
+            "use as directed",
+        ]
+        self.parsed_sigs = [self.parser.parse(sig, verbose=True) for sig in self.sigs]
+
+    def test_components_match_parse(self):
+        for parsed_sig in self.parsed_sigs:
+            with self.subTest(sig=parsed_sig['sig_text']):
+                self.assertEqual(mdd.calculate_max_dose_per_day(parsed_sig['mdd_components'], self.parser.excluded_dose_units), parsed_sig['max_dose_per_day'])
+
+    def test_get_max_doses_per_day(self):
+        self.assertEqual(self.parser.get_max_doses_per_day(self.parsed_sigs), [parsed_sig['max_dose_per_day'] for parsed_sig in self.parsed_sigs])
+
+    @unittest.skipUnless(mdd.np, 'numpy not installed')
+    def test_columns_match_scalar(self):
+        components_list = [parsed_sig['mdd_components'] for parsed_sig in self.parsed_sigs]
+        # the columns are built once and recalculated for each list of excluded dose units
+        columns = mdd.get_mdd_columns(components_list)
+        self.assertEqual(len(columns['pair_sig']), sum(len(components['pairs']) for components in components_list))
+        for excluded_dose_units in ([], ['puff', 'drop'], ['tablet'], self.parser.excluded_dose_units):
+            with self.subTest(excluded_dose_units=excluded_dose_units):
+                expected = [mdd.calculate_max_dose_per_day(components, excluded_dose_units) for components in components_list]
+                self.assertEqual(mdd.get_max_dose_list(mdd.calculate_max_doses_per_day_columns(columns, excluded_dose_units)), expected)
+        self.assertEqual(len(mdd.calculate_max_doses_per_day_columns(mdd.get_mdd_columns([]))), 0)
+
+    @unittest.skipIf(mdd.np, 'numpy installed')
+    def test_columns_without_numpy(self):
+        with self.assertRaises(ImportError):
+            mdd.get_mdd_columns([parsed_sig['mdd_components'] for parsed_sig in self.parsed_sigs])
+        with self.assertRaises(ImportError):
+            mdd.calculate_max_doses_per_day_columns({})
+
+    def test_excluded_dose_units(self):
+        parser = SigParser(excluded_dose_units=['tablet'])
+        self.assertIsNone(parser.parse("take 1 tab po bid", verbose=True)['max_dose_per_day'])
+        self.assertEqual(self.parser.parse("take 1 tab po bid")['max_dose_per_day'], 2.0)
+        self.assertEqual(self.parser.get_max_doses_per_day(self.parsed_sigs[:1], ['tablet']), [None])
+
+    def test_period_per_day(self):
+        self.assertEqual(mdd.get_period_per_day(6, 'hour'), 4)
+        self.assertEqual(mdd.get_period_per_day(2, 'week'), 1 / 14)
+        self.assertIsNone(mdd.get_period_per_day(None, 'day'))
+        self.assertIsNone(mdd.get_period_per_day(1, 'year'))
+
+if __name__ == '__main__':
+    unittest.main()
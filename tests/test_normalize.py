@@ -0,0 +1,35 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services import normalize
+from parsers.services.normalize import DOSE_UNITS, PERIOD_UNIT, get_normalized, get_normalized_text
+
+class TestNormalize(unittest.TestCase):
+    def test_cached_normalized(self):
+        for patterns, texts in ((DOSE_UNITS, ['tabs', 'Tablet', 'caps', ' puffs ', 'not a unit']), (PERIOD_UNIT, ['hrs', 'd', 'wk', 'days'])):
+            for text in texts:
+                with self.subTest(text=text):
+                    self.assertEqual(get_normalized(patterns, text), get_normalized_text(patterns, text))
+                    # second time is from the cache
+                    self.assertEqual(get_normalized(patterns, text), get_normalized_text(patterns, text))
+        self.assertEqual(get_normalized(DOSE_UNITS, 'tabs'), 'tablet')
+
+    def test_cache_per_patterns(self):
+        patterns = {'day': ['d', 'days']}
+        self.assertEqual(get_normalized(patterns, 'days'), 'day')
+        self.assertEqual(get_normalized({'daily': ['days']}, 'days'), 'daily')
+        self.assertIs(normalize.normalized_cache[id(patterns)][0], patterns)
+
+    def test_cached_none(self):
+        # a cached None is a hit, not a miss
+        patterns = {'day': ['d', 'days']}
+        get_normalized(patterns, 'days')
+        normalize.normalized_cache[id(patterns)][1]['days'] = None
+        self.assertIsNone(get_normalized(patterns, 'days'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.services import records as records_module
+from parsers.services.records import ResultRecords, encode_records, from_shared_memory
+from parsers.sig import SigParser
+
+class TestResultRecords(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = ["take 1-2 tab po qid x7d prn pain", "use as directed", "", "take 1.5 tablets at bedtime", "take 500 mg by mouth twice daily", "tome 1 tableta por día ½"]
+
+    def test_round_trip(self):
+        for fields in (None, ['dose', 'dose_unit', 'Is_Sig_Parsable'], ['sig_readable']):
+            with self.subTest(fields=fields):
+                results = [self.parser.parse(sig, fields=fields) for sig in self.sigs]
+                records = encode_records(results)
+                self.assertEqual(len(records), len(results))
+                self.assertEqual(list(records), results)
+                shared = from_shared_memory(records.to_shared_memory())
+                self.assertEqual(list(shared), results)
+                # ints stay ints (i.e. "1" in csv output, not "1.0")
+                self.assertEqual([type(value) for row in shared.rows() for value in row], [type(value) for result in results for value in result.values()])
+
+    def test_parse_records(self):
+        sigs = self.sigs * 3
+        records = self.parser.parse_records(sigs, batch_size=4)
+        expected = [self.parser.parse(sig) for sig in sigs]
+        self.assertEqual(len(records), len(sigs))
+        self.assertEqual(list(records), expected)
+        self.assertEqual(records[3], expected[3])
+        self.assertEqual(records[-1], expected[-1])
+        self.assertEqual(records.get_column('dose_unit'), [result['dose_unit'] for result in expected])
+        self.assertEqual(sorted(records.get_categories('dose_unit')), sorted(set(result['dose_unit'] for result in expected) - {None}))
+        with self.assertRaises(IndexError):
+            records[len(sigs)]
+        self.assertEqual(len(self.parser.parse_records([], fields=['dose'])), 0)
+
+    def test_extend_is_atomic(self):
+        records = ResultRecords().extend([{'dose': 1, 'dose_unit': 'tablet', 'sig_text': 'take 1 tablet'}])
+        with self.assertRaises(TypeError):
+            records.extend([{'dose': 2, 'dose_unit': 'capsule', 'sig_text': None}, {'dose': 2, 'dose_unit': 'capsule', 'sig_text': 3}])
+        self.assertEqual(list(records), [{'dose': 1, 'dose_unit': 'tablet', 'sig_text': 'take 1 tablet'}])
+        records.append({'dose': 0.5, 'dose_unit': None, 'sig_text': ''})
+        self.assertEqual(list(records), [{'dose': 1, 'dose_unit': 'tablet', 'sig_text': 'take 1 tablet'}, {'dose': 0.5, 'dose_unit': None, 'sig_text': ''}])
+
+    @unittest.skipUnless(records_module.np, 'numpy not installed')
+    def test_to_numpy(self):
+        np = records_module.np
+        records = self.parser.parse_records(self.sigs)
+        arrays = records.to_numpy()
+        self.assertEqual(arrays['dose'].dtype, np.float64)
+        self.assertTrue(np.isnan(arrays['dose'][1]))
+        self.assertEqual(arrays['dose'][0], records[0]['dose'])
+        self.assertEqual([records.get_categories('dose_unit')[code] if code >= 0 else None for code in arrays['dose_unit']], records.get_column('dose_unit'))
+        self.assertEqual(arrays['Is_Sig_Parsable'].tolist(), records.get_column('Is_Sig_Parsable'))
+        self.assertEqual(arrays['sig_text'].tolist(), records.get_column('sig_text'))
+
+    @unittest.skipUnless(records_module.pd, 'pandas not installed')
+    def test_to_pandas(self):
+        records = self.parser.parse_records(self.sigs)
+        frame = records.to_pandas()
+        self.assertEqual(list(frame.columns), records.fields)
+        self.assertEqual(len(frame), len(self.sigs))
+        self.assertEqual([None if value != value else value for value in frame['dose_unit'].astype(object)], records.get_column('dose_unit'))
+
+    def test_unsupported_results(self):
+        with self.assertRaises(TypeError):
+            encode_records([self.parser.parse(self.sigs[0], verbose=True)])
+        with self.assertRaises(TypeError):
+            encode_records([{'dose': '1/2'}])
+        with self.assertRaises(TypeError):
+            encode_records([{'dose': 1}, {'frequency': 1}])
+        with self.assertRaises(TypeError):
+            encode_records([])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import unittest
+import sys
+import os
+import tempfile
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.sig import SigParser
+from parsers.services.report import CountMinSketch, HeavyHitters, CorpusReport, get_frequency_shape, get_report_record, report_file, report_sigs
+
+class TestCorpusReport(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+
+    def test_unparsable_reasons(self):
+        cases = [
+            ("take 1 tab po bid", []),
+            # a sig can be caught by more than one guardrail
+            ("take 2 tabs daily then 1 tab daily", ['titration', 'multiple_doses']),
+            ("take 1 tab po qd and 2 tabs po qhs", ['multiple_doses']),
+            ("take 1 tab po daily lot 4453 exp", ['uncovered_digits']),
+        ]
+        for sig, reasons in cases:
+            with self.subTest(sig=sig):
+                result = self.parser.parse(sig, verbose=True)
+                self.assertEqual(result['unparsable_reasons'], reasons)
+                self.assertEqual(result['Is_Sig_Parsable'], not reasons)
+        result = self.parser.parse("take 1 tab po daily lot 4453 exp", verbose=True)
+        self.assertEqual([result['sig_text'][start:end] for start, end in result['uncovered_digits']], ['4453'])
+        self.assertEqual(get_report_record(result)['uncovered_tokens'], ['lot', 'exp'])
+        # the output fields don't change
+        self.assertNotIn('unparsable_reasons', self.parser.parse("take 2 tabs daily then 1 tab daily"))
+
+    def test_frequency_shape(self):
+        cases = [
+            ("take 1 tab po bid", '2/1 day'),
+            ("take 1 tab po q4-6h prn pain", '1/4-6 hour as needed'),
+            ("take 1 tab po every other day", '1/2 day'),
+            ("take 1 tab po", None),
+        ]
+        for sig, shape in cases:
+            with self.subTest(sig=sig):
+                self.assertEqual(get_frequency_shape(self.parser.parse(sig, verbose=True)), shape)
+
+    def test_sketch(self):
+        sketch = CountMinSketch(width=16, depth=3)
+        counts = {'key ' + str(i): i % 7 + 1 for i in range(100)}
+        for key, count in counts.items():
+            sketch.add(key, count)
+        # a narrow sketch overcounts, but never undercounts
+        for key, count in counts.items():
+            self.assertGreaterEqual(sketch.get(key), count)
+        self.assertEqual(sketch.total, sum(counts.values()))
+
+    def test_heavy_hitters(self):
+        heavy_hitters = HeavyHitters(size=3, width=256, depth=4)
+        for i in range(2000):
+            heavy_hitters.add('rare ' + str(i))
+            if i % 10 == 0:
+                heavy_hitters.add('common')
+            if i % 20 == 0:
+                heavy_hitters.add('less common')
+        top = heavy_hitters.most_common(2)
+        self.assertEqual([key for key, count in top], ['common', 'less common'])
+        self.assertGreaterEqual(top[0][1], 200)
+        self.assertEqual(len(heavy_hitters.top), 3)
+
+    def test_report(self):
+        sigs = ["take 1 tab po bid"] * 3 + ["take 2 tabs daily then 1 tab daily"] * 2 + ["take 1 tab po daily lot 4453 exp", "inhale 2 puffs q4h prn"]
+        report = report_sigs(sigs, self.parser, chunk_size=2).to_dict()
+        self.assertEqual(report['sigs'], 7)
+        self.assertEqual(report['unparsable'], 3)
+        self.assertEqual(report['unparsable_reasons']['titration'], {'sigs': 2, 'rate': round(2 / 7, 6)})
+        self.assertEqual(report['unparsable_reasons']['uncovered_digits']['sigs'], 1)
+        self.assertEqual(report['unparsable_reasons']['ambiguous']['sigs'], 0)
+        self.assertEqual(report['dose_units']['tablet'], 6)
+        self.assertEqual(report['frequency_shapes']['2/1 day'], 3)
+        self.assertEqual(report['unparsable_sigs'][0], {'sig_text': 'take 2 tabs daily then 1 tab daily', 'count': 2})
+        self.assertEqual([entry['token'] for entry in report['uncovered_tokens']], ['exp', 'lot'])
+        # the same as adding verbose results one at a time
+        report_by_result = CorpusReport()
+        for sig in sigs:
+            report_by_result.add_result(self.parser.parse(sig, verbose=True))
+        self.assertEqual(report_by_result.to_dict(), report)
+
+    def test_report_file(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            input_file = os.path.join(temp_dir, 'input.csv')
+            with open(input_file, 'w', encoding='utf-8') as f:
+                f.write("take 1 tab po bid\ntake 2 tabs daily then 1 tab daily\n")
+            report = report_file(input_file, self.parser, progress=False)
+        self.assertEqual(report['sigs'], 2)
+        self.assertEqual(report['unparsable_rate'], 0.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.sig import SigParser
+
+class TestSequence(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+
+    def get_steps(self, result):
+        return [result['sig_text'][step['step_text_start']:step['step_text_end']] for step in result['steps']]
+
+    def test_sequence_spans(self):
+        cases = [
+            ("take 2 tablets by mouth daily for 7 days then 1 tablet daily", ['take 2 tablets by mouth daily for 7 days', '1 tablet daily']),
+            ("take 1 capsule at bedtime for 1 week and then 2 capsules at bedtime", ['take 1 capsule at bedtime for 1 week', '2 capsules at bedtime']),
+            ("take 1 tablet daily for 7 days followed by increase to 2 tablets daily", ['take 1 tablet daily for 7 days', '2 tablets daily']),
+            ("take 40 mg daily x 5 days then taper by 10 mg every 3 days", ['take 40 mg daily x 5 days', 'taper by 10 mg every 3 days']),
+            ("then take 1 tablet daily", ['take 1 tablet daily']),
+            ("take 1 tablet daily", ['take 1 tablet daily']),
+            # a change to an amount after a comma (dropped when the sig is normalized)
+            ("take 1 tablet daily for 7 days, increase to 2 tablets daily", ['take 1 tablet daily for 7 days', '2 tablets daily']),
+            # comma separated steps that each have a dose and a duration
+            ("take 2 tablets daily for 7 days, 1 tablet daily for 7 days, then stop", ['take 2 tablets daily for 7 days', '1 tablet daily for 7 days', 'stop']),
+            # a singular duration unit
+            ("take 1 tablet daily for 1 week then 2 tablets daily", ['take 1 tablet daily for 1 week', '2 tablets daily']),
+            ("take 1 tablet daily for 7 days for a total of 7 tablets", ['take 1 tablet daily for 7 days for a total of 7 tablets']),
+            ("", []),
+            ("then", []),
+        ]
+        for sig, steps in cases:
+            with self.subTest(sig=sig):
+                self.assertEqual(self.get_steps(self.parser.parse_sequence(sig)), steps)
+
+    def test_steps(self):
+        result = self.parser.parse_sequence("Take 1 tablet by mouth daily for 7 days, then increase to 2 tablets twice daily")
+        self.assertEqual([step['step'] for step in result['steps']], [1, 2])
+        self.assertEqual([step['max_dose_per_day'] for step in result['steps']], [1, 4])
+        self.assertEqual(result['max_dose_per_day'], 4)
+        self.assertTrue(result['Is_Sig_Parsable'])
+        # each step is the same as parsing it on its own
+        for step, step_text in zip(result['steps'], self.get_steps(result)):
+            expected = self.parser.parse(step_text)
+            self.assertEqual({k: step[k] for k in expected}, expected)
+        # the whole sig is still unparsable as a single sig
+        self.assertFalse(self.parser.parse(result['sig_text'])['Is_Sig_Parsable'])
+
+    def test_unparsable_step(self):
+        result = self.parser.parse_sequence("take 40 mg daily x 5 days then taper by 10 mg every 3 days")
+        self.assertEqual([step['Is_Sig_Parsable'] for step in result['steps']], [True, False])
+        self.assertFalse(result['Is_Sig_Parsable'])
+        self.assertIsNone(result['max_dose_per_day'])
+
+    def test_step_without_max_dose(self):
+        # the one-off dose on day 1 has no max_dose_per_day, so the sig can't have one
+        result = self.parser.parse_sequence("take 2 tablets on day 1 then 1 tablet daily on days 2-5")
+        self.assertEqual([step['max_dose_per_day'] for step in result['steps']], [None, 1])
+        self.assertTrue(result['Is_Sig_Parsable'])
+        self.assertIsNone(result['max_dose_per_day'])
+        # a step without a dose doesn't count
+        self.assertEqual(self.parser.parse_sequence("take 2 tablets daily for 7 days, 1 tablet daily for 7 days, then stop")['max_dose_per_day'], 2)
+        result = self.parser.parse_sequence("take 1 tablet daily for 1 week then 2 tablets daily")
+        self.assertEqual([step['max_dose_per_day'] for step in result['steps']], [1, 2])
+        self.assertEqual(result['max_dose_per_day'], 2)
+
+    def test_no_steps(self):
+        for sig in ("", "then", " and then "):
+            with self.subTest(sig=sig):
+                result = self.parser.parse_sequence(sig)
+                self.assertEqual(result['steps'], [])
+                self.assertFalse(result['Is_Sig_Parsable'])
+                self.assertIsNone(result['max_dose_per_day'])
+
+    def test_sequences(self):
+        sigs = ["take 2 tablets daily for 7 days then 1 tablet daily", "take 1 tab po qd", "", "inhale 2 puffs q4h then 1 puff q6h"]
+        self.assertEqual(self.parser.parse_sequences(sigs), [self.parser.parse_sequence(sig) for sig in sigs])
+        verbose = self.parser.parse_sequence(sigs[3], verbose=True)
+        self.assertEqual([step['dose'] for step in verbose['steps']], [2, 1])
+        projected = self.parser.parse_sequence(sigs[0], fields=['dose', 'max_dose_per_day'])
+        self.assertEqual([step['dose'] for step in projected['steps']], [2, 1])
+        self.assertEqual(projected['max_dose_per_day'], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers import frequency, route
+from parsers.sig import SigParser
+from parsers.services.session import SigSession, get_common_ends
+
+class TestSigSession(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.sigs = [
+            "take 1 tablet by mouth every 4-6 hours as needed for moderate to severe pain",
+            "inhale 2 puffs every 4 hours max 8 puffs per day",
+            "take 1-2 tab po qid x7d prn pain, apply to affected area twice daily for 7 days",
+            "take 1 tablet by mouth once daily on monday wednesday and friday at bedtime",
+        ]
+
+    def test_typing_matches_full_parse(self):
+        session = SigSession(self.parser)
+        for sig in self.sigs:
+            session.reset()
+            for i in range(1, len(sig) + 1):
+                with self.subTest(sig_text=sig[:i]):
+                    self.assertEqual(session.parse(sig[:i]), self.parser.parse(sig[:i], verbose=True))
+
+    def test_edits_match_full_parse(self):
+        session = SigSession(self.parser)
+        sig = self.sigs[0]
+        edits = [
+            sig,
+            sig.replace('every 4-6 hours', 'every 6 hours'),
+            sig.replace('every 4-6 hours', 'every 6 hours').replace('tablet', 'capsule'),
+            sig.replace('every 4-6 hours', 'q6h').replace('tablet', 'capsule'),
+            'for pain ' + sig,
+            sig[:30],
+            sig,
+            '',
+            sig,
+        ]
+        for sig_text in edits:
+            with self.subTest(sig_text=sig_text):
+                self.assertEqual(session.parse(sig_text), self.parser.parse(sig_text, verbose=True))
+
+    def test_fields(self):
+        for fields in (['dose', 'frequency', 'sig_readable'], ['dose', 'Is_Sig_Parsable'], ['sig_text']):
+            session = SigSession(self.parser, verbose=False, fields=fields)
+            for sig_text in ("take 1 tab po", "take 1 tab po qd", "take 2 tab po qd", "take 2 tab po qd prn"):
+                with self.subTest(fields=fields, sig_text=sig_text):
+                    self.assertEqual(session.parse(sig_text), self.parser.parse(sig_text, fields=fields))
+
+    def test_parse_edit(self):
+        parser = [p for p in frequency.parsers if isinstance(p, frequency.FrequencyEveryXDay)][0]
+        filler = "with a full glass of water and food, " * 4
+        old_sig = "take 1 tablet every 6 hours " + filler + "then 2 tablets " + filler + "then 3 tablets every 12 hours"
+        sig = old_sig.replace('then 2 tablets', 'then 2 capsules')
+        old_spans = parser.parse_spans(old_sig)
+        prefix, suffix = get_common_ends(old_sig, sig)
+        spans = parser.parse_edit(sig, old_sig, old_spans, prefix, suffix)
+        self.assertEqual(spans, parser.parse_spans(sig))
+        self.assertEqual([sig[start:end] for start, end, normalized_match in spans], ['every 6 hour', 'every 12 hour'])
+        # the match before the edit is kept as it is, and the one after it is shifted
+        self.assertIs(spans[0], old_spans[0])
+        self.assertEqual(spans[1][2]['frequency_text_start'], old_spans[1][2]['frequency_text_start'] + 1)
+
+    def test_reach(self):
+        # (?:to)+ can only run as far as the longest run of t / o characters
+        parser = [p for p in route.parsers if type(p) is route.RouteParser][0]
+        self.assertNotIn('*', parser.get_edit_reach()[0])
+
+    def test_common_ends(self):
+        self.assertEqual(get_common_ends('take 1 tab', 'take 2 tab'), (5, 4))
+        self.assertEqual(get_common_ends('aaa', 'aaaa'), (3, 0))
+        self.assertEqual(get_common_ends('', 'take'), (0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+from unittest import mock
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.sig import SigParser
+from parsers.services.bulk import parse_file, parse_stream, get_slow_log_file
+
+# the guardrails backtrack over a long run of "daily" - hundreds of ms, against about 1 ms for a normal sig
+SLOW_SIG = 'daily ' * 400
+
+class TestSlowLog(unittest.TestCase):
+    def setUp(self):
+        self.sigs = ["take 1 tablet by mouth twice daily", "inhale 2 puffs every 4 hours as needed", SLOW_SIG, "take 2 tabs po qd"]
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parse_batch(self):
+        parser = SigParser(slow_ms=50)
+        results = parser.parse_batch(self.sigs)
+        self.assertEqual(results, SigParser().parse_batch(self.sigs))
+        slow_sigs = parser.get_slow_sigs()
+        self.assertEqual([(slow_sig['index'], slow_sig['sig']) for slow_sig in slow_sigs], [(2, SLOW_SIG)])
+        self.assertGreater(slow_sigs[0]['ms'], 50)
+        # every component parser is timed, slowest first ('sig' is the guardrails and the rest of the parse)
+        parser_ms = list(slow_sigs[0]['parsers'].values())
+        self.assertEqual(len(parser_ms), sum(len(parsers) for parsers in SigParser.parsers.values()) + 1)
+        self.assertEqual(parser_ms, sorted(parser_ms, reverse=True))
+        self.assertEqual(parser.get_slow_sigs(), [])
+
+    def test_parse(self):
+        parser = SigParser(slow_ms=50)
+        parser.parse(self.sigs[0])
+        self.assertEqual(parser.slow_sigs, [])
+        parser.parse(SLOW_SIG)
+        self.assertEqual([(slow_sig['index'], slow_sig['sig']) for slow_sig in parser.slow_sigs], [(None, SLOW_SIG)])
+
+    def test_limit(self):
+        parser = SigParser(slow_ms=0, slow_limit=2)
+        parser.parse_batch(self.sigs)
+        self.assertEqual([slow_sig['index'] for slow_sig in parser.get_slow_sigs()], [0, 1])
+        # nothing is timed once the limit is reached
+        self.assertFalse(parser.is_timing())
+
+    def test_parse_file(self):
+        input_file = os.path.join(self.temp_dir.name, 'input.ndjson')
+        output_file = os.path.join(self.temp_dir.name, 'output.ndjson')
+        with open(input_file, 'w', encoding='utf-8') as f:
+            for sig in self.sigs * 2:
+                f.write(json.dumps({'sig': sig}) + '\n')
+        for workers in (0, 2):
+            with self.subTest(workers=workers), mock.patch('parsers.services.bulk.MIN_RANGE_SIZE', 64):
+                summary = parse_file(input_file, output_file, SigParser(slow_ms=50), chunk_size=3, workers=workers, progress=False)
+                self.assertEqual((summary['slow'], summary['slow_log_file']), (2, get_slow_log_file(output_file)))
+                with open(summary['slow_log_file'], encoding='utf-8') as f:
+                    self.assertEqual([json.loads(line)['row'] for line in f], [3, 7])
+        # the limit is for the whole run, not each worker
+        summary = parse_file(input_file, output_file, SigParser(slow_ms=0, slow_limit=3), chunk_size=3, workers=2, progress=False)
+        self.assertEqual(summary['slow'], 3)
+        # an empty slow log is removed
+        summary = parse_file(input_file, output_file, SigParser(slow_ms=10000), chunk_size=3, progress=False)
+        self.assertEqual((summary['slow'], summary['slow_log_file']), (0, None))
+        self.assertFalse(os.path.exists(get_slow_log_file(output_file)))
+
+    def test_needs_slow_ms(self):
+        with open(os.devnull, 'w') as out_file, self.assertRaises(ValueError):
+            parse_stream([], out_file, 'text', 'ndjson', SigParser(), slow_log=out_file)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import re
+import sys
+import os
+import tempfile
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.classes.parser import get_template_safe, get_prefilter, get_batch_safe
+from parsers.services.snapshot import PatternSnapshot, CODE_FILES, get_code_hash, get_snapshot_file
+from parsers.sig import SigParser
+
+def get_info(pattern):
+    return get_template_safe(pattern), get_prefilter(pattern), get_batch_safe(pattern)
+
+class TestSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_file = get_snapshot_file(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_parsers_match_snapshot(self):
+        # parsers get their pattern info from the snapshot, so it has to be the same as working it out again
+        parser = SigParser()
+        for parser_type, parsers in parser.parsers.items():
+            for p in parsers:
+                with self.subTest(parser=type(p).__name__):
+                    template_safe, prefilter, batch_safe = get_info(p.pattern)
+                    self.assertEqual(p.prefilter, prefilter)
+                    # parsers can only turn these off (see DoseOnlyParser)
+                    self.assertTrue(template_safe or not p.template_safe)
+                    self.assertTrue(batch_safe or not p.batch_safe)
+                    self.assertEqual(p.batch_pattern is not None, p.batch_safe)
+
+    def test_save_and_load(self):
+        patterns = [re.compile(r'(?:every|each)\s?(?P<period>\d+)\s?hours?', flags = re.I), re.compile(r'(?<!\n)at bedtime', flags = re.I)]
+        snapshot = PatternSnapshot(self.snapshot_file)
+        infos = [snapshot.get(pattern, get_info) for pattern in patterns]
+        self.assertTrue(snapshot.save())
+        self.assertFalse(snapshot.save())
+
+        def fail(pattern):
+            raise AssertionError('pattern should come from the snapshot')
+        snapshot = PatternSnapshot(self.snapshot_file)
+        self.assertEqual([snapshot.get(pattern, fail) for pattern in patterns], infos)
+        self.assertFalse(snapshot.save())
+
+        # a changed pattern is worked out again, and the old one is dropped from the snapshot
+        changed = re.compile(patterns[1].pattern + r'|nightly', flags = re.I)
+        snapshot = PatternSnapshot(self.snapshot_file)
+        snapshot.get(patterns[0], fail)
+        self.assertEqual(snapshot.get(changed, get_info), get_info(changed))
+        self.assertTrue(snapshot.save())
+        self.assertEqual(len(PatternSnapshot(self.snapshot_file).entries), 2)
+
+    def test_unreadable_snapshot(self):
+        with open(self.snapshot_file, 'w') as f:
+            f.write('{not json')
+        snapshot = PatternSnapshot(self.snapshot_file)
+        self.assertEqual(snapshot.entries, {})
+        pattern = re.compile(r'daily', flags = re.I)
+        self.assertEqual(snapshot.get(pattern, get_info), get_info(pattern))
+        self.assertTrue(snapshot.save())
+        self.assertIsNone(get_snapshot_file(''))
+
+    def test_code_change(self):
+        # the analysis code is part of the key, so a snapshot from different code isn't used
+        pattern = re.compile(r'daily', flags = re.I)
+        snapshot = PatternSnapshot(self.snapshot_file, code_hash='old')
+        snapshot.get(pattern, get_info)
+        self.assertTrue(snapshot.save())
+        self.assertEqual(len(PatternSnapshot(self.snapshot_file, code_hash='old').entries), 1)
+        self.assertEqual(PatternSnapshot(self.snapshot_file, code_hash='new').entries, {})
+        self.assertEqual(get_code_hash(), get_code_hash())
+        self.assertNotEqual(get_code_hash(), get_code_hash(CODE_FILES[:1]))
+
+    @unittest.skipUnless(hasattr(os, 'getuid'), 'needs file owners')
+    def test_private_dir(self):
+        pattern = re.compile(r'daily', flags = re.I)
+        snapshot = PatternSnapshot(self.snapshot_file)
+        snapshot.get(pattern, get_info)
+        self.assertTrue(snapshot.save())
+        # created for the user only
+        new_dir = os.path.join(self.temp_dir.name, 'new')
+        snapshot = PatternSnapshot(get_snapshot_file(new_dir))
+        snapshot.get(pattern, get_info)
+        self.assertTrue(snapshot.save())
+        self.assertEqual(os.stat(new_dir).st_mode & 0o777, 0o700)
+        # a snapshot anyone can write to is never read or written
+        os.chmod(self.temp_dir.name, 0o777)
+        self.assertEqual(PatternSnapshot(self.snapshot_file).entries, {})
+        snapshot = PatternSnapshot(self.snapshot_file)
+        snapshot.get(pattern, get_info)
+        self.assertFalse(snapshot.save())
+        os.chmod(self.temp_dir.name, 0o700)
+        os.chmod(self.snapshot_file, 0o666)
+        self.assertEqual(PatternSnapshot(self.snapshot_file).entries, {})
+
+if __name__ == '__main__':
+    unittest.main()
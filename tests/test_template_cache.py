@@ -0,0 +1,40 @@
+import unittest
+import sys
+import os
+
+# Adjust path to import parsers
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsers.sig import SigParser
+
+class TestTemplateCache(unittest.TestCase):
+    def setUp(self):
+        self.parser = SigParser()
+        self.cached_parser = SigParser(template_cache_size=4)
+
+    def test_template_hits_match_full_parse(self):
+        # each group shares a template, so everything after the first sig in a group is a cache hit
+        sig_groups = [
+            ["take 1 tablet by mouth every 6 hours as needed for pain", "take 2 tablet by mouth every 4 hours as needed for pain", "take 1 tablet by mouth every 8 hours as needed for pain"],
+            ["take 1-2 tab po qid x7d prn pain", "take 2-3 tab po qid x5d prn pain"],
+            ["take 1 tablet by mouth at 9am and 5pm", "take 2 tablet by mouth at 8am and 4pm", "take 1 tablet by mouth at 1am and 1pm"],
+            ["take 1 tablet by mouth once daily for 7 days then 2 tablets once daily", "take 2 tablet by mouth once daily for 5 days then 1 tablets once daily"],
+            ["inhale 2 puffs every 4 hours max 8 puffs per day", "inhale 1 puffs every 6 hours max 4 puffs per day"],
+        ]
+        for sigs in sig_groups:
+            for sig in sigs:
+                for verbose in (False, True):
+                    with self.subTest(sig=sig, verbose=verbose):
+                        self.assertEqual(self.cached_parser.parse(sig, verbose=verbose), self.parser.parse(sig, verbose=verbose))
+
+    def test_template(self):
+        self.assertEqual(self.parser.get_template("take 1.5 tablets every 12 hours at 9am"), "take #.# tablets every ## hours at #am")
+
+    def test_cache_size(self):
+        for n in range(1, 8):
+            self.cached_parser.parse("take 1 tablet " + "every day " * n)
+        self.assertEqual(len(self.cached_parser.template_cache), 4)
+        self.assertEqual(len(self.parser.template_cache), 0)
+
+if __name__ == '__main__':
+    unittest.main()